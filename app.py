@@ -2,10 +2,23 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 import plotly.express as px
-import plotly.graph_objects as go
 import os
+import uuid
+from functools import partial
 
-from utils import GSCConnector, GA4Connector
+from utils import (
+    GSCConnector, GA4Connector, UrlIndex,
+    build_scatter, render_paginated_table, field, join_page_performance,
+    render_stream, cached_stream, get_cache, export_bytes, STREAM_BATCH_SIZE,
+    sorted_view, rounded_view, stripped_view, get_scheduler,
+    cached_figure, build_dual_axis, render_figure
+)
+
+# Los resultados en caché se comparten entre sesiones (share): con Copy-on-Write
+# una copia superficial no duplica datos y modificarla nunca altera el original.
+# En pandas >= 3 ya está siempre activo; con pandas 2 se activa aquí, una sola vez
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
 
 st.set_page_config(
     page_title="Dashboard SEO - Flokzu",
@@ -23,8 +36,116 @@ def init_gsc():
 def init_ga4():
     return GA4Connector()
 
+def approximate_caption(df: pd.DataFrame) -> str:
+    # Cota de sobreestimación de los sketches; CTR y posición vacíos donde no es confiable
+    text = "≈ Valores aproximados a partir de sketches diarios"
+    bounds = df.attrs.get('error_bounds')
+    if bounds:
+        text += f" (hasta +{bounds['clicks']:,} clicks y +{bounds['impressions']:,} impresiones por fila)"
+    if df.attrs.get('truncated'):
+        text += ". Algunos días superan el límite de filas por día de la API"
+    return text
+
+def preset_range(days: int):
+    end = datetime.now().date() - timedelta(days=1)
+    return end - timedelta(days=days-1), end
+
+def prefetch_queries(start: str, end: str, previous_start: str, previous_end: str, neighbours):
+    # Lo más probable después de elegir un período: activar la comparación
+    # o pasar a un preset vecino
+    tasks = []
+    if gsc_connector.service:
+        tasks.append(partial(init_gsc().get_search_analytics_by_type, start, end, dimensions=['date']))
+        tasks.append(partial(gsc_connector.compare_periods, start, end, previous_start, previous_end))
+    if ga4_connector.client:
+        tasks.append(partial(ga4_connector.compare_periods, start, end, previous_start, previous_end))
+    
+    for neighbour_start, neighbour_end in neighbours:
+        # La precarga especulativa no debe ocupar los turnos de consultas pesadas
+        if load_estimate(neighbour_start, neighbour_end).heavy:
+            continue
+        if gsc_connector.service:
+            tasks.append(partial(gsc_connector.get_metrics_summary, neighbour_start, neighbour_end))
+            tasks.append(partial(gsc_connector.get_daily_performance, neighbour_start, neighbour_end))
+            tasks.append(partial(gsc_connector.get_top_queries, neighbour_start, neighbour_end, limit=10))
+        if ga4_connector.client:
+            tasks.append(partial(ga4_connector.get_metrics_summary, neighbour_start, neighbour_end))
+    return tasks
+
+def load_estimate(start: str, end: str):
+    # Costo de las descargas principales del período: datos detallados, keywords y GA4
+    estimates = []
+    if gsc_connector.service:
+        estimates.append(gsc_connector.estimate_search_analytics(start, end, dimensions=['query', 'page']))
+        estimates.append(gsc_connector.estimate_search_analytics(start, end, dimensions=['query']))
+        estimates.append(gsc_connector.estimate_search_analytics(start, end, dimensions=['date']))
+    if ga4_connector.client:
+        estimates.append(ga4_connector.estimate_report(
+            start, end, ['landingPagePlusQueryString'],
+            ['sessions', 'totalUsers', 'bounceRate', 'averageSessionDuration'], limit=20
+        ))
+    return sum(estimates[1:], estimates[0]) if estimates else None
+
+# La vista en vivo se re-ejecuta sola; entre consultas a la API se sirve el buffer en memoria
+@st.fragment(run_every=60)
+def render_live_view():
+    st.subheader("🔴 En vivo: últimas 24 horas")
+    
+    realtime_users = ga4_connector.get_realtime_users() if ga4_connector.client else None
+    if realtime_users is not None:
+        st.metric("Usuarios activos (últimos 30 min)", f"{realtime_users:,}")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        if gsc_connector.service:
+            gsc_hours = gsc_connector.live.poll().tail(24)
+            if gsc_hours.empty:
+                st.info("Search Console todavía no tiene datos por hora")
+            else:
+                fig = cached_figure(
+                    gsc_hours, build_dual_axis,
+                    x='hour',
+                    y='clicks',
+                    y2='impressions',
+                    names={'clicks': 'Clicks', 'impressions': 'Impresiones'},
+                    colors={'clicks': 'blue', 'impressions': 'lightblue'},
+                    title='Search Console por hora (datos frescos)',
+                    height=350
+                )
+                render_figure(fig)
+    
+    with col2:
+        if ga4_connector.client:
+            ga4_hours = ga4_connector.live.poll().tail(24)
+            if not ga4_hours.empty:
+                fig = cached_figure(
+                    ga4_hours, build_dual_axis,
+                    x='hour',
+                    y='sessions',
+                    y2='screenPageViews',
+                    names={'sessions': 'Sesiones', 'screenPageViews': 'Vistas'},
+                    colors={'sessions': 'green', 'screenPageViews': 'lightgreen'},
+                    title='Analytics por hora (intradía)',
+                    height=350
+                )
+                render_figure(fig)
+    
+    live_stats = gsc_connector.live.stats() if gsc_connector.service else None
+    if live_stats and live_stats['watermark'] is not None:
+        st.caption(
+            f"Última hora recibida: {live_stats['watermark'].tz_convert(None).strftime('%d/%m %H:%M')} UTC · "
+            f"Actualizado hace {live_stats['age']:.0f}s · {live_stats['polls']} consultas incrementales"
+        )
+
+# Índice de URLs normalizadas compartido entre renders y sesiones
+@st.cache_resource
+def init_url_index():
+    return UrlIndex()
+
 gsc_connector = init_gsc()
 ga4_connector = init_ga4()
+url_index = init_url_index()
 
 st.title("📊 Dashboard SEO - Flokzu")
 st.markdown("---")
@@ -65,9 +186,7 @@ with st.sidebar:
                 value=datetime.now() - timedelta(days=1)
             )
     else:
-        days = period_options[selected_period]
-        end_date = datetime.now().date() - timedelta(days=1)
-        start_date = end_date - timedelta(days=days-1)
+        start_date, end_date = preset_range(period_options[selected_period])
         
         col1, col2 = st.columns(2)
         with col1:
@@ -83,24 +202,34 @@ with st.sidebar:
                 disabled=True
             )
     
+    # Superficie de búsqueda de GSC: todas las vistas de Search Console la respetan
+    search_types = {"Web": 'web', "Imágenes": 'image', "Videos": 'video', "Noticias": 'news'}
+    selected_search_type = st.selectbox("🔎 Superficie de búsqueda", options=list(search_types.keys()))
+    gsc_connector = gsc_connector.with_search_type(search_types[selected_search_type])
+    
     # Comparación de períodos
     st.markdown("---")
     enable_comparison = st.checkbox("📊 Comparar con período anterior")
     
+    # Se calcula siempre: si no está activa, se precarga en segundo plano
+    period_days = (end_date - start_date).days + 1
+    comparison_end = start_date - timedelta(days=1)
+    comparison_start = comparison_end - timedelta(days=period_days-1)
+    date_format_comparison_start = comparison_start.strftime('%Y-%m-%d')
+    date_format_comparison_end = comparison_end.strftime('%Y-%m-%d')
+    
     if enable_comparison:
-        period_days = (end_date - start_date).days + 1
-        comparison_end = start_date - timedelta(days=1)
-        comparison_start = comparison_end - timedelta(days=period_days-1)
-        
         st.caption(f"**Período anterior:**")
         st.caption(f"{comparison_start.strftime('%d/%m/%Y')} - {comparison_end.strftime('%d/%m/%Y')}")
-        
-        date_format_comparison_start = comparison_start.strftime('%Y-%m-%d')
-        date_format_comparison_end = comparison_end.strftime('%Y-%m-%d')
     
     date_format_start = start_date.strftime('%Y-%m-%d')
     date_format_end = end_date.strftime('%Y-%m-%d')
     
+    # Antes de una descarga grande se muestra su costo estimado
+    period_estimate = load_estimate(date_format_start, date_format_end)
+    if period_estimate is not None and (selected_period == "Personalizado" or period_estimate.heavy):
+        st.caption(f"📦 {period_estimate.describe()}")
+    
     st.subheader("🔗 Estado de Conexiones")
     
     if gsc_connector.service:
@@ -116,12 +245,60 @@ with st.sidebar:
         st.error("❌ GA4 no conectado")
         st.info("❌ Configurar credenciales GA4 en Streamlit Secrets")
     
+    with st.expander("🧠 Caché de Datos"):
+        cache_stats = get_cache().stats()
+        st.caption(
+            f"Memoria: {cache_stats['bytes'] / 1024 / 1024:.1f} / "
+            f"{cache_stats['max_bytes'] / 1024 / 1024:.0f} MB · {cache_stats['entries']} entradas"
+        )
+        st.caption(
+            f"Hits: {cache_stats['hits']} · Misses: {cache_stats['misses']} · "
+            f"Tasa de acierto: {cache_stats['hit_rate']:.0%}"
+        )
+        st.caption(f"Desalojos: {cache_stats['evictions']} · Vencidas: {cache_stats['expirations']}")
+        prefetch_stats = get_scheduler().stats()
+        st.caption(
+            f"Precarga: {prefetch_stats['completed']} listas · {prefetch_stats['queued']} en cola · "
+            f"{prefetch_stats['cancelled']} canceladas"
+        )
+        if gsc_connector.service:
+            admission_stats = gsc_connector.admission.stats()
+            st.caption(
+                f"Consultas GSC: {admission_stats['admitted']} admitidas · {admission_stats['queued']} en cola · "
+                f"{admission_stats['downgraded']} degradadas · {admission_stats['rejected']} rechazadas"
+            )
+        if ga4_connector.client:
+            ga4_quota = ga4_connector.admission.stats()
+            if ga4_quota['tokens_remaining_hour'] is not None:
+                st.caption(
+                    f"Tokens GA4 restantes: {ga4_quota['tokens_remaining_hour']:,} esta hora · "
+                    f"{ga4_quota['tokens_remaining_day']:,} hoy"
+                )
+    
     st.markdown("---")
     
     if st.button("🔄 Actualizar Datos", type="primary", use_container_width=True):
         st.cache_data.clear()
         st.cache_resource.clear()
+        get_cache().clear()
+        st.rerun()
+
+# Las descargas pesadas requieren confirmación una vez por rango de fechas
+confirmed_ranges = st.session_state.setdefault('confirmed_ranges', set())
+if period_estimate is not None and period_estimate.heavy and \
+        (date_format_start, date_format_end) not in confirmed_ranges:
+    st.warning(
+        f"⏳ El período seleccionado implica una descarga grande: {period_estimate.describe()}. "
+        "Puede tardar y consumir cuota de las APIs."
+    )
+    if st.button("Cargar datos del período", type="primary"):
+        confirmed_ranges.add((date_format_start, date_format_end))
         st.rerun()
+    st.stop()
+
+if selected_period == "Últimas 24 horas":
+    render_live_view()
+    st.markdown("---")
 
 tabs = st.tabs(["📊 Overview", "🔍 Search Console", "📈 Analytics", "🎯 Keywords", "📄 Páginas"])
 
@@ -129,14 +306,15 @@ with tabs[0]:
     st.header("Overview General")
     
     if gsc_connector.service:
-        metrics = gsc_connector.get_metrics_summary(date_format_start, date_format_end)
-        
-        # Obtener comparación si está habilitada
+        # Con comparación, una sola consulta cubre ambos períodos
         if enable_comparison:
             comparison = gsc_connector.compare_periods(
                 date_format_start, date_format_end,
                 date_format_comparison_start, date_format_comparison_end
             )
+            metrics = {metric: values['current'] for metric, values in comparison.items()}
+        else:
+            metrics = gsc_connector.get_metrics_summary(date_format_start, date_format_end)
         
         col1, col2, col3, col4 = st.columns(4)
         
@@ -203,46 +381,54 @@ with tabs[0]:
             daily_data = gsc_connector.get_daily_performance(date_format_start, date_format_end)
             
             if not daily_data.empty:
-                fig = go.Figure()
-                fig.add_trace(go.Scatter(
-                    x=daily_data['date'],
-                    y=daily_data['clicks'],
-                    mode='lines',
-                    name='Clicks',
-                    line=dict(color='blue', width=2)
-                ))
-                fig.add_trace(go.Scatter(
-                    x=daily_data['date'],
-                    y=daily_data['impressions'],
-                    mode='lines',
-                    name='Impresiones',
-                    line=dict(color='lightblue', width=2),
-                    yaxis='y2'
-                ))
-                
-                fig.update_layout(
-                    yaxis=dict(title='Clicks', side='left'),
-                    yaxis2=dict(title='Impresiones', overlaying='y', side='right'),
-                    hovermode='x unified',
-                    height=400
+                fig = cached_figure(
+                    daily_data, build_dual_axis,
+                    x='date',
+                    y='clicks',
+                    y2='impressions',
+                    names={'clicks': 'Clicks', 'impressions': 'Impresiones'},
+                    colors={'clicks': 'blue', 'impressions': 'lightblue'}
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                render_figure(fig)
         
         with col2:
             st.subheader("🎯 Top Keywords")
             top_queries = gsc_connector.get_top_queries(date_format_start, date_format_end, limit=10)
             
+            if gsc_connector.use_sketches(date_format_start, date_format_end):
+                st.caption(approximate_caption(top_queries))
+            
             if not top_queries.empty:
-                fig = px.bar(
-                    top_queries.head(10),
+                fig = cached_figure(
+                    top_queries.head(10), px.bar,
                     x='clicks',
                     y='query',
                     orientation='h',
                     title='Top 10 Keywords por Clicks',
-                    labels={'clicks': 'Clicks', 'query': 'Keyword'}
+                    labels={'clicks': 'Clicks', 'query': 'Keyword'},
+                    layout=dict(height=400)
                 )
-                fig.update_layout(height=400)
-                st.plotly_chart(fig, use_container_width=True)
+                render_figure(fig)
+        
+        st.markdown("---")
+        
+        st.subheader("📡 Clicks por Superficie de Búsqueda")
+        # Todas las superficies en paralelo; la precarga suele dejarlas en caché antes del render
+        by_search_type = init_gsc().get_search_analytics_by_type(
+            date_format_start, date_format_end, dimensions=['date']
+        )
+        
+        if not by_search_type.empty:
+            fig = cached_figure(
+                by_search_type, px.area,
+                x='date',
+                y='clicks',
+                color='search_type',
+                title='Clicks diarios por superficie',
+                labels={'date': 'Fecha', 'clicks': 'Clicks', 'search_type': 'Superficie'},
+                layout=dict(height=350)
+            )
+            render_figure(fig)
         
         st.markdown("---")
         
@@ -254,8 +440,8 @@ with tabs[0]:
             device_data = gsc_connector.get_performance_by_device(date_format_start, date_format_end)
             
             if not device_data.empty:
-                fig = px.scatter(
-                    device_data,
+                fig = cached_figure(
+                    device_data, build_scatter,
                     x='impressions',
                     y='clicks',
                     size='ctr',
@@ -264,57 +450,61 @@ with tabs[0]:
                     labels={'impressions': 'Impresiones', 'clicks': 'Clicks', 'ctr': 'CTR'},
                     hover_data=['position']
                 )
-                fig.update_layout(height=350)
-                st.plotly_chart(fig, use_container_width=True)
+                render_figure(fig)
         
         with col2:
             st.subheader("🌍 CTR vs Posición por País")
-            country_data = gsc_connector.get_performance_by_country(date_format_start, date_format_end, limit=15)
+            country_data = gsc_connector.get_performance_by_country(date_format_start, date_format_end, limit=250)
             
             if not country_data.empty:
-                fig = px.scatter(
-                    country_data,
+                fig = cached_figure(
+                    country_data, build_scatter,
                     x='position',
                     y='ctr',
                     size='clicks',
                     color='country',
                     title='CTR vs Posición Promedio',
-                    labels={'position': 'Posición Promedio', 'ctr': 'CTR', 'clicks': 'Clicks'}
+                    labels={'position': 'Posición Promedio', 'ctr': 'CTR', 'clicks': 'Clicks'},
+                    reverse_x=True  # Posición 1 es mejor
                 )
-                fig.update_layout(
-                    xaxis=dict(autorange="reversed"),  # Posición 1 es mejor
-                    height=350
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                render_figure(fig)
         
         with col3:
             st.subheader("📊 Keywords: Posición vs CTR")
-            keywords_scatter = gsc_connector.get_search_analytics(
-                date_format_start, 
-                date_format_end,
-                dimensions=['query'],
-                row_limit=100
-            )
+            keywords_placeholder = st.empty()
             
-            if not keywords_scatter.empty:
-                # Filtrar solo keywords con más de 50 impresiones para mejor visualización
-                keywords_filtered = keywords_scatter[keywords_scatter['impressions'] >= 50].head(30)
-                
-                fig = px.scatter(
-                    keywords_filtered,
+            # Todas las keywords: el helper pasa a WebGL o a densidad según el volumen
+            def render_keywords_scatter(keywords_scatter):
+                fig = cached_figure(
+                    keywords_scatter, build_scatter,
                     x='position',
                     y='ctr',
                     size='impressions',
                     color='clicks',
                     hover_name='query',
                     title='CTR vs Posición (Keywords)',
-                    labels={'position': 'Posición Promedio', 'ctr': 'CTR', 'impressions': 'Impresiones', 'clicks': 'Clicks'}
-                )
-                fig.update_layout(
-                    xaxis=dict(autorange="reversed"),
-                    height=350
+                    labels={'position': 'Posición Promedio', 'ctr': 'CTR', 'impressions': 'Impresiones', 'clicks': 'Clicks'},
+                    reverse_x=True
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                render_figure(fig, keywords_placeholder)
+            
+            # El gráfico se actualiza a medida que llegan los lotes
+            render_stream(
+                cached_stream(
+                    ('keywords_scatter', date_format_start, date_format_end),
+                    lambda: gsc_connector.iter_search_analytics(
+                        date_format_start,
+                        date_format_end,
+                        dimensions=['query'],
+                        row_limit=25000,
+                        batch_size=STREAM_BATCH_SIZE
+                    ),
+                    client=gsc_connector
+                ),
+                on_update=render_keywords_scatter,
+                expected_rows=25000,
+                label="Cargando keywords"
+            )
         
         st.markdown("---")
         
@@ -325,66 +515,50 @@ with tabs[0]:
             daily_perf = gsc_connector.get_daily_performance(date_format_start, date_format_end)
             
             if not daily_perf.empty:
-                fig = go.Figure()
-                
-                # CTR en eje Y izquierdo
-                fig.add_trace(go.Scatter(
-                    x=daily_perf['date'],
-                    y=daily_perf['ctr'],
-                    mode='lines+markers',
-                    name='CTR (%)',
-                    line=dict(color='blue', width=2),
-                    yaxis='y'
-                ))
-                
-                # Posición en eje Y derecho (invertido)
-                fig.add_trace(go.Scatter(
-                    x=daily_perf['date'],
-                    y=daily_perf['position'],
+                # CTR en el eje izquierdo, posición en el derecho (invertido)
+                fig = cached_figure(
+                    daily_perf, build_dual_axis,
+                    x='date',
+                    y='ctr',
+                    y2='position',
+                    names={'ctr': 'CTR (%)', 'position': 'Posición'},
+                    colors={'ctr': 'blue', 'position': 'red'},
                     mode='lines+markers',
-                    name='Posición',
-                    line=dict(color='red', width=2),
-                    yaxis='y2'
-                ))
-                
-                fig.update_layout(
                     title='Evolución CTR vs Posición Promedio',
-                    yaxis=dict(title='CTR (%)', side='left'),
-                    yaxis2=dict(title='Posición Promedio', overlaying='y', side='right', autorange='reversed'),
-                    hovermode='x unified',
-                    height=400
+                    reverse_y2=True,
+                    layout=dict(yaxis2_title='Posición Promedio')
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                render_figure(fig)
         
         with col2:
             st.subheader("🔥 Top Páginas por CTR")
-            top_pages_ctr = gsc_connector.get_search_analytics(
+            # Páginas con al menos 100 impresiones
+            top_pages_ctr = gsc_connector.filter_search_analytics(
                 date_format_start,
                 date_format_end,
                 dimensions=['page'],
+                where=field('impressions') >= 100,
                 row_limit=20
             )
             
             if not top_pages_ctr.empty:
-                # Filtrar páginas con al menos 100 impresiones y ordenar por CTR
-                top_pages_filtered = top_pages_ctr[top_pages_ctr['impressions'] >= 100].sort_values('ctr', ascending=False).head(10)
-                
-                # Limpiar URLs
-                top_pages_filtered['page_clean'] = top_pages_filtered['page'].str.replace(
-                    gsc_connector.property_url, '', regex=False
-                ).str[:30] + '...'
+                # Vista compartida: se ordena y se limpian las URLs una vez por dataset
+                top_pages_filtered = stripped_view(
+                    sorted_view(top_pages_ctr, 'ctr'),
+                    'page', gsc_connector.property_url, target='page_clean', width=30
+                ).head(10)
                 
-                fig = px.bar(
-                    top_pages_filtered,
+                fig = cached_figure(
+                    top_pages_filtered, px.bar,
                     x='ctr',
                     y='page_clean',
                     orientation='h',
                     color='clicks',
                     title='Top 10 Páginas por CTR (>100 imp.)',
-                    labels={'ctr': 'CTR (%)', 'page_clean': 'Página', 'clicks': 'Clicks'}
+                    labels={'ctr': 'CTR (%)', 'page_clean': 'Página', 'clicks': 'Clicks'},
+                    layout=dict(height=400)
                 )
-                fig.update_layout(height=400)
-                st.plotly_chart(fig, use_container_width=True)
+                render_figure(fig)
     else:
         st.warning("⚠️ Conecta Google Search Console para ver las métricas")
 
@@ -399,42 +573,73 @@ with tabs[1]:
             device_data = gsc_connector.get_performance_by_device(date_format_start, date_format_end)
             
             if not device_data.empty:
-                fig = px.pie(
-                    device_data,
+                fig = cached_figure(
+                    device_data, px.pie,
                     values='clicks',
                     names='device',
                     title='Distribución de Clicks por Dispositivo'
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                render_figure(fig)
         
         with col2:
             st.subheader("🌍 Métricas por País")
             country_data = gsc_connector.get_performance_by_country(date_format_start, date_format_end, limit=10)
             
             if not country_data.empty:
-                fig = px.bar(
-                    country_data.head(10),
+                fig = cached_figure(
+                    country_data.head(10), px.bar,
                     x='clicks',
                     y='country',
                     orientation='h',
                     title='Top 10 Países por Clicks'
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                render_figure(fig)
         
         st.markdown("---")
         st.subheader("📊 Datos Detallados")
         
-        detailed_data = gsc_connector.get_search_analytics(
-            date_format_start, 
-            date_format_end,
-            dimensions=['query', 'page'],
-            row_limit=100
+        detailed_preview = st.empty()
+        
+        # Mientras se descarga se muestra una vista previa de las primeras filas
+        detailed_data = render_stream(
+            cached_stream(
+                ('detailed_data', date_format_start, date_format_end),
+                lambda: gsc_connector.iter_search_analytics(
+                    date_format_start,
+                    date_format_end,
+                    dimensions=['query', 'page'],
+                    row_limit=25000,
+                    batch_size=STREAM_BATCH_SIZE
+                ),
+                client=gsc_connector
+            ),
+            on_update=lambda partial: detailed_preview.dataframe(partial.head(50).round(2), use_container_width=True),
+            expected_rows=25000,
+            label="Cargando datos detallados"
         )
+        detailed_preview.empty()
         
         if not detailed_data.empty:
-            st.dataframe(
-                detailed_data[['query', 'page', 'clicks', 'impressions', 'ctr', 'position']].round(2),
-                use_container_width=True
+            render_paginated_table(
+                detailed_data,
+                key='detailed_data',
+                columns=['query', 'page', 'clicks', 'impressions', 'ctr', 'position'],
+                sort_by='clicks'
+            )
+            
+            # El Parquet se genera recién al hacer clic (no en cada rerun)
+            st.download_button(
+                "⬇️ Descargar Parquet",
+                data=lambda data=detailed_data, start=date_format_start, end=date_format_end: export_bytes(
+                    data, format='parquet', metadata={
+                        'source': 'gsc',
+                        'start_date': start,
+                        'end_date': end,
+                        'dimensions': ['query', 'page']
+                    }
+                ),
+                file_name=f"gsc_{date_format_start}_{date_format_end}.parquet",
+                mime="application/vnd.apache.parquet"
             )
     else:
         st.warning("⚠️ Conecta tu cuenta de Google Search Console para ver métricas")
@@ -466,35 +671,72 @@ with tabs[2]:
             
             if not organic_data.empty:
                 # Ordenar por fecha para evitar líneas cruzadas
-                organic_data = organic_data.sort_values('date')
+                organic_data = sorted_view(organic_data, 'date', ascending=True)
                 
-                fig = px.line(
-                    organic_data,
+                fig = cached_figure(
+                    organic_data, px.line,
                     x='date',
                     y='sessions',
                     title='Sesiones de Tráfico Orgánico',
                     labels={'sessions': 'Sesiones', 'date': 'Fecha'},
-                    markers=True
+                    markers=True,
+                    traces=dict(line=dict(width=2)),
+                    layout=dict(xaxis_tickformat='%d %b', hovermode='x unified')
                 )
-                fig.update_traces(line=dict(width=2))
-                fig.update_layout(
-                    xaxis_tickformat='%d %b',
-                    hovermode='x unified'
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                render_figure(fig)
         
         with col2:
             st.subheader("📱 Tráfico por Dispositivo")
             device_data = ga4_connector.get_device_metrics(date_format_start, date_format_end)
             
             if not device_data.empty:
-                fig = px.pie(
-                    device_data,
+                fig = cached_figure(
+                    device_data, px.pie,
                     values='sessions',
                     names='deviceCategory',
                     title='Distribución por Tipo de Dispositivo'
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                render_figure(fig)
+        
+        st.markdown("---")
+        st.subheader("🔀 Cruces de Tráfico")
+        
+        # Un pivot report por cruce: ninguno se corta por el límite de países del otro
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            device_channel = ga4_connector.get_cross_tab(
+                date_format_start, date_format_end,
+                rows='sessionDefaultChannelGroup', columns='deviceCategory'
+            )
+            
+            if not device_channel.empty:
+                fig = cached_figure(
+                    device_channel, px.imshow,
+                    text_auto=True,
+                    aspect='auto',
+                    color_continuous_scale='Blues',
+                    title='Sesiones: Canal × Dispositivo',
+                    labels={'x': 'Dispositivo', 'y': 'Canal', 'color': 'Sesiones'}
+                )
+                render_figure(fig)
+        
+        with col2:
+            country_device = ga4_connector.get_cross_tab(
+                date_format_start, date_format_end,
+                rows='country', columns='deviceCategory'
+            )
+            
+            if not country_device.empty:
+                fig = cached_figure(
+                    country_device, px.imshow,
+                    text_auto=True,
+                    aspect='auto',
+                    color_continuous_scale='Blues',
+                    title='Sesiones: País × Dispositivo',
+                    labels={'x': 'Dispositivo', 'y': 'País', 'color': 'Sesiones'}
+                )
+                render_figure(fig)
         
         st.markdown("---")
         st.subheader("🎯 Top Landing Pages")
@@ -503,7 +745,7 @@ with tabs[2]:
         
         if not landing_pages.empty:
             st.dataframe(
-                landing_pages[['landingPagePlusQueryString', 'sessions', 'totalUsers', 'bounceRate']].round(2),
+                rounded_view(landing_pages, ['landingPagePlusQueryString', 'sessions', 'totalUsers', 'bounceRate']),
                 use_container_width=True
             )
     else:
@@ -513,11 +755,33 @@ with tabs[3]:
     st.header("Análisis de Keywords")
     
     if gsc_connector.service:
+        # En rangos largos se cuenta con HyperLogLog sobre los sketches diarios
+        if gsc_connector.use_sketches(date_format_start, date_format_end):
+            st.metric(
+                "Keywords posicionadas",
+                f"≈ {gsc_connector.count_distinct(date_format_start, date_format_end):,}",
+                help="Estimación con error típico menor al 2%"
+            )
+        else:
+            keyword_index = gsc_connector.get_keyword_index(date_format_start, date_format_end)
+            if keyword_index is not None:
+                st.metric(
+                    "Keywords posicionadas",
+                    f"{len(keyword_index):,}" + ("" if keyword_index.complete else "+")
+                )
+        
         col1, col2 = st.columns([2, 1])
         
         with col1:
             st.subheader("🔍 Búsqueda de Keywords")
             keyword_search = st.text_input("Buscar keyword", placeholder="Ingresa una keyword...")
+            search_modes = {
+                "Contiene": "substring",
+                "Empieza con": "prefix",
+                "Todas las palabras": "tokens",
+                "Expresión regular": "regex"
+            }
+            search_mode = st.radio("Tipo de búsqueda", options=list(search_modes.keys()), horizontal=True)
         
         with col2:
             st.subheader("Filtros")
@@ -530,7 +794,8 @@ with tabs[3]:
             search_results = gsc_connector.search_keywords(
                 keyword_search, 
                 date_format_start, 
-                date_format_end
+                date_format_end,
+                mode=search_modes[search_mode]
             )
             
             if not search_results.empty:
@@ -542,24 +807,127 @@ with tabs[3]:
                 st.info("No se encontraron resultados para esta keyword")
         else:
             st.subheader("📊 Todas las Keywords")
-            all_queries = gsc_connector.get_search_analytics(
+            filtered_queries = gsc_connector.filter_search_analytics(
                 date_format_start,
                 date_format_end,
                 dimensions=['query'],
-                row_limit=500
+                where=field('impressions') >= min_impressions,
+                row_limit=25000
             )
             
-            if not all_queries.empty:
-                filtered_queries = all_queries[all_queries['impressions'] >= min_impressions]
-                
+            if not filtered_queries.empty:
                 st.info(f"Mostrando {len(filtered_queries)} keywords con más de {min_impressions} impresiones")
                 
+                render_paginated_table(
+                    filtered_queries,
+                    key='all_keywords',
+                    columns=['query', 'clicks', 'impressions', 'ctr', 'position'],
+                    sort_by='clicks'
+                )
+        
+        st.markdown("---")
+        st.subheader("🧩 Clusters de Keywords")
+        # Variantes casi duplicadas de una keyword suman su demanda en un solo grupo
+        clusters = gsc_connector.get_cluster_summary(
+            date_format_start,
+            date_format_end,
+            min_impressions=min_impressions
+        )
+        
+        if not clusters.empty:
+            st.caption(
+                f"{len(clusters):,} clusters con más de {min_impressions} impresiones · "
+                "agrupa keywords que comparten la mayoría de sus palabras"
+            )
+            render_paginated_table(
+                clusters,
+                key='keyword_clusters',
+                columns=['keyword', 'queries', 'clicks', 'impressions', 'ctr', 'position'],
+                sort_by='clicks'
+            )
+            
+            top_clusters = clusters[clusters['queries'] > 1].head(50)
+            if not top_clusters.empty:
+                selected_cluster = st.selectbox(
+                    "Ver keywords del cluster",
+                    options=top_clusters['cluster'].tolist(),
+                    format_func=dict(zip(top_clusters['cluster'], top_clusters['keyword'])).get
+                )
+                cluster_keywords = gsc_connector.get_keyword_clusters(date_format_start, date_format_end)
                 st.dataframe(
-                    filtered_queries[['query', 'clicks', 'impressions', 'ctr', 'position']]
-                    .sort_values('clicks', ascending=False)
-                    .round(2),
+                    rounded_view(
+                        sorted_view(cluster_keywords[cluster_keywords['cluster'] == selected_cluster], 'clicks'),
+                        ['query', 'clicks', 'impressions', 'ctr', 'position']
+                    ),
                     use_container_width=True
                 )
+        
+        st.markdown("---")
+        st.subheader("🚨 Desvíos respecto de su Línea Base")
+        anomaly_dimension = st.radio(
+            "Analizar",
+            options=["Keywords", "Páginas"],
+            horizontal=True,
+            key="anomaly_dimension"
+        )
+        anomaly_key = 'query' if anomaly_dimension == "Keywords" else 'page'
+        # Independiente del período elegido: siempre el último día con datos finales
+        anomalies = gsc_connector.get_anomalies(anomaly_key, min_impressions=min_impressions)
+        
+        if anomalies is None:
+            st.info("⏳ Preparando la línea base de cada serie (primera carga de la historia diaria)...")
+        elif not anomalies.empty:
+            st.caption(
+                f"Datos del {anomalies['date'].iloc[0]:%d/%m/%Y} comparados con la media móvil "
+                "exponencial de cada serie (desvíos en sigmas)"
+            )
+            st.dataframe(
+                rounded_view(anomalies, [anomaly_key, 'metric', 'value', 'expected', 'score', 'direction']),
+                use_container_width=True
+            )
+        else:
+            st.info("Ninguna serie se desvía de su línea base en el último día con datos finales")
+        
+        if enable_comparison:
+            st.markdown("---")
+            st.subheader("🚀 Movimientos vs Período Anterior")
+            
+            movers_dimension = st.radio(
+                "Analizar",
+                options=["Keywords", "Páginas"],
+                horizontal=True,
+                key="movers_dimension"
+            )
+            movers = gsc_connector.get_movers(
+                date_format_start, date_format_end,
+                date_format_comparison_start, date_format_comparison_end,
+                dimension='query' if movers_dimension == "Keywords" else 'page',
+                min_impressions=min_impressions
+            )
+            
+            movers_columns = ['clicks_current', 'clicks_previous', 'clicks_change', 'clicks_change_pct',
+                              'position_current', 'position_change', 'significant']
+            key_column = 'query' if movers_dimension == "Keywords" else 'page'
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.markdown("**📈 Mayores subidas en clicks**")
+                st.dataframe(movers['gainers'][[key_column] + movers_columns], use_container_width=True)
+            
+            with col2:
+                st.markdown("**📉 Mayores caídas en clicks**")
+                st.dataframe(movers['losers'][[key_column] + movers_columns], use_container_width=True)
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.markdown("**⬆️ Mejoras de posición**")
+                st.dataframe(movers['position_gainers'][[key_column] + movers_columns], use_container_width=True)
+            
+            with col2:
+                st.markdown("**⬇️ Pérdidas de posición**")
+                st.dataframe(movers['position_losers'][[key_column] + movers_columns], use_container_width=True)
     else:
         st.warning("⚠️ Conecta Google Search Console para ver datos de keywords")
 
@@ -571,26 +939,98 @@ with tabs[4]:
         
         top_pages = gsc_connector.get_top_pages(date_format_start, date_format_end, limit=20)
         
+        if gsc_connector.use_sketches(date_format_start, date_format_end):
+            st.caption(approximate_caption(top_pages))
+        
         if not top_pages.empty:
-            fig = px.bar(
-                top_pages.head(10),
+            fig = cached_figure(
+                top_pages.head(10), px.bar,
                 x='clicks',
                 y='page',
                 orientation='h',
                 title='Top 10 Páginas por Clicks',
-                labels={'clicks': 'Clicks', 'page': 'Página'}
+                labels={'clicks': 'Clicks', 'page': 'Página'},
+                layout=dict(height=500)
             )
-            fig.update_layout(height=500)
-            st.plotly_chart(fig, use_container_width=True)
+            render_figure(fig)
             
             st.markdown("---")
             
             st.subheader("📊 Tabla Detallada de Páginas")
             st.dataframe(
-                top_pages[['page', 'clicks', 'impressions', 'ctr', 'position']].round(2),
+                rounded_view(top_pages, ['page', 'clicks', 'impressions', 'ctr', 'position']),
                 use_container_width=True
             )
         
+        st.markdown("---")
+        st.subheader("🗂️ Rendimiento por Sección")
+        
+        section_tree = gsc_connector.get_section_tree(date_format_start, date_format_end)
+        
+        if section_tree is not None:
+            ga4_tree = ga4_connector.get_section_tree(date_format_start, date_format_end) if ga4_connector.client else None
+            
+            current_section = st.session_state.get('current_section', '/')
+            if current_section not in section_tree:
+                current_section = '/'
+            
+            breadcrumb = section_tree.breadcrumb(current_section)
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.caption(" › ".join(breadcrumb))
+            with col2:
+                if current_section != '/' and st.button("⬆️ Subir un nivel", use_container_width=True):
+                    st.session_state['current_section'] = breadcrumb[-2]
+                    st.rerun()
+            
+            totals = section_tree.subtree(current_section)
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Clicks", f"{int(totals['clicks']):,}")
+            col2.metric("Impresiones", f"{int(totals['impressions']):,}")
+            col3.metric("Posición Promedio", f"{totals['position']:.1f}")
+            col4.metric("Páginas", f"{totals['pages']:,}")
+            
+            if ga4_tree is not None:
+                section_users = ga4_connector.get_section_users(date_format_start, date_format_end, current_section)
+                col1, col2, _ = st.columns([1, 1, 2])
+                col1.metric(
+                    "Vistas (GA4)",
+                    f"{int(ga4_tree.subtree(current_section)['screenPageViews']):,}" if current_section in ga4_tree else "0"
+                )
+                col2.metric("Usuarios (GA4)", f"{section_users:,}" if section_users is not None else "N/A")
+            
+            sections = section_tree.top_children(current_section, n=15)
+            
+            if not sections.empty:
+                sections = sections.assign(
+                    ctr=(sections['clicks'] / sections['impressions'].where(sections['impressions'] > 0)).fillna(0)
+                )
+                if ga4_tree is not None:
+                    sections['screenPageViews'] = [
+                        ga4_tree.subtree(node)['screenPageViews'] if node in ga4_tree else 0
+                        for node in sections['section']
+                    ]
+                
+                fig = cached_figure(
+                    sections, px.bar,
+                    x='clicks',
+                    y='section',
+                    orientation='h',
+                    title=f'Subsecciones de {current_section} por Clicks',
+                    labels={'clicks': 'Clicks', 'section': 'Sección'},
+                    layout=dict(height=400, yaxis=dict(autorange="reversed"))
+                )
+                render_figure(fig)
+                
+                st.dataframe(sections.drop(columns='has_children').round(2), use_container_width=True)
+                
+                drillable = sections.loc[sections['has_children'], 'section'].tolist()
+                if drillable:
+                    next_section = st.selectbox("Entrar en sección", options=[""] + drillable)
+                    if next_section:
+                        st.session_state['current_section'] = next_section
+                        st.rerun()
+        
         if ga4_connector.client:
             st.markdown("---")
             st.subheader("📈 Métricas de Páginas (GA4)")
@@ -599,11 +1039,51 @@ with tabs[4]:
             
             if not page_metrics.empty:
                 st.dataframe(
-                    page_metrics[['pagePath', 'screenPageViews', 'totalUsers', 'bounceRate']].round(2),
+                    rounded_view(page_metrics, ['pagePath', 'screenPageViews', 'totalUsers', 'bounceRate']),
                     use_container_width=True
                 )
+            
+            st.markdown("---")
+            st.subheader("🔗 Rendimiento Combinado (GSC + GA4)")
+            
+            page_performance = join_page_performance(
+                gsc_connector.get_top_pages(date_format_start, date_format_end, limit=25000, exact=True),
+                ga4_connector.get_page_metrics(date_format_start, date_format_end, limit=10000),
+                url_index
+            )
+            
+            if not page_performance.empty:
+                render_paginated_table(
+                    page_performance,
+                    key='page_performance',
+                    columns=['page', 'clicks', 'impressions', 'ctr', 'position',
+                             'screenPageViews', 'totalUsers', 'bounceRate'],
+                    sort_by='clicks'
+                )
     else:
         st.warning("⚠️ Conecta Google Search Console para ver datos de páginas")
 
+# Mientras la cuota está libre se precargan las selecciones probables; un cambio
+# de selección cancela la precarga pendiente de esta sesión
+presets = [label for label, days in period_options.items() if days]
+neighbours = []
+if selected_period in presets:
+    position = presets.index(selected_period)
+    for label in presets[max(position - 1, 0):position + 2]:
+        if label != selected_period:
+            neighbour_start, neighbour_end = preset_range(period_options[label])
+            neighbours.append((neighbour_start.strftime('%Y-%m-%d'), neighbour_end.strftime('%Y-%m-%d')))
+
+session_key = st.session_state.setdefault('session_key', uuid.uuid4().hex)
+get_scheduler().prefetch(
+    session_key,
+    (date_format_start, date_format_end),
+    prefetch_queries(
+        date_format_start, date_format_end,
+        date_format_comparison_start, date_format_comparison_end,
+        neighbours
+    )
+)
+
 st.markdown("---")
 st.caption("Dashboard SEO para Flokzu - Actualizado: " + datetime.now().strftime("%Y-%m-%d %H:%M"))
\ No newline at end of file
@@ -0,0 +1,581 @@
+"""Prueba de carga del dashboard con sesiones simuladas y backends falsos.
+
+Cada sesión es un navegador simulado que recorre un guion de interacciones (cambiar
+período, activar la comparación, buscar keywords, cambiar de superficie de búsqueda)
+contra GSC y GA4 falsos con latencia configurable. Todas las sesiones se conectan por
+websocket a un único servidor `streamlit run` (una réplica): comparten caché,
+precarga, admisión y GIL como en producción. El cliente habla el protocolo del
+navegador (BackMsg / ForwardMsg) sin navegador. La memoria por sesión es lo que
+crece el RSS del servidor durante el nivel.
+Las pestañas de st.tabs se renderizan completas en cada rerun: cambiar de pestaña
+no llega al servidor, por eso el guion no lo simula.
+
+    python load_test.py --sessions 1,4,8,16 --steps 6 --latency 0.05
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import urllib.request
+from datetime import date, timedelta
+from typing import Optional
+
+import numpy as np
+from google.analytics.data_v1beta.types import (
+    DimensionHeader,
+    DimensionValue,
+    MetricHeader,
+    MetricValue,
+    PropertyQuota,
+    QuotaStatus,
+    Row,
+    RunPivotReportResponse,
+    RunRealtimeReportResponse,
+    RunReportResponse
+)
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+FAKE_PROPERTY_URL = 'https://loadtest.example.com/'
+
+PERIODS = ["Últimos 7 días", "Últimos 28 días", "Últimos 3 meses"]
+SURFACES = ["Web", "Imágenes", "Videos"]
+
+
+class UpstreamCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = {}
+
+    def record(self, name: str):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.calls)
+
+
+def _cardinalities(start: str, end: str, queries: int):
+    days = (date.fromisoformat(end) - date.fromisoformat(start)).days + 1
+    return {
+        'date': days, 'hour': days * 24, 'query': queries, 'page': 200,
+        'country': 20, 'device': 3, 'searchAppearance': 3
+    }
+
+
+def _key(dimension: str, i: int, start: str) -> str:
+    if dimension == 'date':
+        return (date.fromisoformat(start) + timedelta(days=int(i))).isoformat()
+    if dimension == 'hour':
+        day = date.fromisoformat(start) + timedelta(days=int(i) // 24)
+        return f"{day.isoformat()}T{int(i) % 24:02d}:00:00-07:00"
+    if dimension == 'page':
+        return f"{FAKE_PROPERTY_URL}seccion-{i % 12}/pagina-{i}/"
+    if dimension == 'device':
+        return ['MOBILE', 'DESKTOP', 'TABLET'][i]
+    return f"{dimension}-{i}"
+
+
+class _SearchAnalyticsQuery:
+    def __init__(self, backend: 'FakeSearchConsole', body: dict):
+        self.backend = backend
+        self.body = body
+
+    def execute(self):
+        backend = self.backend
+        backend.counter.record(f"gsc:{self.body.get('type', 'web')}")
+        time.sleep(backend.latency)
+
+        body = self.body
+        dimensions = body.get('dimensions', [])
+        sizes = _cardinalities(body['startDate'], body['endDate'], backend.queries)
+        radix = [sizes.get(d, 10) for d in dimensions]
+        total = int(np.prod(radix)) if radix else 1
+        first = body.get('startRow', 0)
+        indices = np.arange(first, min(first + body.get('rowLimit', 1000), total))
+
+        rows = []
+        rng = np.random.default_rng(first + total)
+        clicks = rng.integers(0, 30, len(indices))
+        impressions = clicks + rng.integers(1, 400, len(indices))
+        positions = rng.uniform(1, 40, len(indices))
+        for n, index in enumerate(indices):
+            keys = []
+            remainder = int(index)
+            for dimension, size in zip(reversed(dimensions), reversed(radix)):
+                remainder, i = divmod(remainder, size)
+                keys.append(_key(dimension, i, body['startDate']))
+            rows.append({
+                'keys': keys[::-1],
+                'clicks': int(clicks[n]),
+                'impressions': int(impressions[n]),
+                'ctr': float(clicks[n] / impressions[n]),
+                'position': float(positions[n])
+            })
+        return {'rows': rows} if rows else {}
+
+
+class FakeSearchConsole:
+    # Imita service.searchanalytics().query(siteUrl=..., body=...).execute()
+    def __init__(self, counter: UpstreamCounter, latency: float, queries: int):
+        self.counter = counter
+        self.latency = latency
+        self.queries = queries
+
+    def searchanalytics(self):
+        return self
+
+    def query(self, siteUrl: str, body: dict):
+        return _SearchAnalyticsQuery(self, body)
+
+
+GA4_VALUES = {
+    'deviceCategory': ['mobile', 'desktop', 'tablet'],
+    'country': ['Argentina', 'Uruguay', 'Chile', 'España'],
+    'sessionDefaultChannelGroup': ['Organic Search', 'Direct', 'Referral', 'Paid Search'],
+    'sessionSource': ['google', '(direct)', 'bing'],
+    'sessionMedium': ['organic', '(none)', 'referral'],
+    'eventName': ['page_view', 'session_start', 'click'],
+    'pagePath': [f"/seccion-{i % 12}/pagina-{i}/" for i in range(60)],
+    'landingPagePlusQueryString': [f"/seccion-{i % 12}/pagina-{i}/" for i in range(40)]
+}
+
+
+def _ga4_values(dimension: str, date_range) -> list:
+    if dimension in ('date', 'dateHour'):
+        start = date.fromisoformat(date_range.start_date)
+        days = (date.fromisoformat(date_range.end_date) - start).days + 1
+        dates = [(start + timedelta(days=i)).strftime('%Y%m%d') for i in range(days)]
+        return dates if dimension == 'date' else [d + f"{h:02d}" for d in dates for h in range(24)]
+    return GA4_VALUES.get(dimension, ['(not set)'])
+
+
+def _quota():
+    return PropertyQuota(
+        tokens_per_hour=QuotaStatus(consumed=5, remaining=39000),
+        tokens_per_day=QuotaStatus(consumed=5, remaining=195000)
+    )
+
+
+class FakeAnalyticsClient:
+    # Imita BetaAnalyticsDataClient: run_report, run_pivot_report y run_realtime_report
+    def __init__(self, counter: UpstreamCounter, latency: float):
+        self.counter = counter
+        self.latency = latency
+
+    def _row(self, rng, values, metrics):
+        return Row(
+            dimension_values=[DimensionValue(value=v) for v in values],
+            metric_values=[MetricValue(value=str(float(rng.integers(1, 500)))) for _ in metrics]
+        )
+
+    def run_report(self, request):
+        self.counter.record('ga4:run_report')
+        time.sleep(self.latency)
+        rng = np.random.default_rng(len(self.counter.calls))
+        dimensions = [d.name for d in request.dimensions]
+        metrics = [m.name for m in request.metrics]
+        ranges = list(request.date_ranges)
+
+        rows = []
+        for i, date_range in enumerate(ranges):
+            label = [date_range.name or f"date_range_{i}"] if len(ranges) > 1 else []
+            combos = itertools.product(*[_ga4_values(d, date_range) for d in dimensions])
+            rows.extend(self._row(rng, list(c) + label, metrics) for c in combos)
+
+        total = len(rows)
+        offset = request.offset or 0
+        if request.limit:
+            rows = rows[offset:offset + request.limit]
+        headers = dimensions + (['dateRange'] if len(ranges) > 1 else [])
+        return RunReportResponse(
+            dimension_headers=[DimensionHeader(name=h) for h in headers],
+            metric_headers=[MetricHeader(name=m) for m in metrics],
+            rows=rows,
+            totals=[self._row(rng, [], metrics)] if request.metric_aggregations else [],
+            row_count=total,
+            property_quota=_quota() if request.return_property_quota else None
+        )
+
+    def run_pivot_report(self, request):
+        self.counter.record('ga4:run_pivot_report')
+        time.sleep(self.latency)
+        rng = np.random.default_rng(7)
+        dimensions = [d.name for d in request.dimensions]
+        metrics = [m.name for m in request.metrics]
+        combos = itertools.product(*[GA4_VALUES.get(d, ['(not set)']) for d in dimensions])
+        return RunPivotReportResponse(
+            dimension_headers=[DimensionHeader(name=d) for d in dimensions],
+            metric_headers=[MetricHeader(name=m) for m in metrics],
+            rows=[self._row(rng, list(c), metrics) for c in combos],
+            property_quota=_quota() if request.return_property_quota else None
+        )
+
+    def run_realtime_report(self, request):
+        self.counter.record('ga4:run_realtime_report')
+        time.sleep(self.latency)
+        return RunRealtimeReportResponse(rows=[Row(metric_values=[MetricValue(value='12')])])
+
+
+def install_fakes(latency: float, queries: int) -> UpstreamCounter:
+    # Reemplaza la construcción de clientes reales; el resto del código corre sin cambios
+    import utils
+
+    counter = UpstreamCounter()
+    search_console = FakeSearchConsole(counter, latency, queries)
+    analytics = FakeAnalyticsClient(counter, latency)
+    os.environ['GSC_PROPERTY_URL'] = FAKE_PROPERTY_URL
+    utils.GSCClient._build_service = lambda self: search_console
+    utils.GA4Client._build_client = lambda self, credentials: analytics
+    return counter
+
+
+def build_script(rng: random.Random, steps: int, queries: int):
+    # Guion realista: primer render y luego cambios de selección al azar
+    actions = [('open', None)]
+    choices = ['period', 'comparison', 'search', 'surface', 'rerun']
+    weights = [3, 2, 3, 1, 1]
+    for _ in range(steps):
+        action = rng.choices(choices, weights)[0]
+        if action == 'period':
+            actions.append((action, rng.choice(PERIODS)))
+        elif action == 'search':
+            actions.append((action, f"query-{rng.randrange(queries)}"[:rng.randint(4, 9)]))
+        elif action == 'surface':
+            actions.append((action, rng.choice(SURFACES)))
+        else:
+            actions.append((action, None))
+    return actions
+
+
+STATS_INTERVAL = 0.25
+
+
+def _write_stats(counter: UpstreamCounter, path: str):
+    # El servidor publica sus contadores en un archivo: el driver corre en otro proceso
+    from utils import get_cache
+
+    while True:
+        stats = {
+            'written_at': time.time(),
+            'calls': counter.snapshot(),
+            'rss_bytes': _rss_bytes(),
+            'cache_bytes': get_cache().stats()['bytes']
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as output:
+            json.dump(stats, output)
+        os.replace(tmp_path, path)
+        time.sleep(STATS_INTERVAL)
+
+
+def serve(port: int, latency: float, queries: int, stats_path: str):
+    # Servidor real de Streamlit (`streamlit run`) con los backends falsos instalados
+    from streamlit.web import bootstrap
+
+    counter = install_fakes(latency, queries)
+    threading.Thread(target=_write_stats, args=(counter, stats_path), daemon=True).start()
+    flags = {
+        'server_port': port,
+        'server_address': '127.0.0.1',
+        'server_headless': True,
+        'server_fileWatcherType': 'none',
+        'browser_gatherUsageStats': False,
+        'logger_level': 'error'
+    }
+    bootstrap.load_config_options(flags)
+    bootstrap.run(APP_PATH, False, [], flags)
+
+
+class Server:
+    # Un proceso `streamlit run` (réplica) compartido por todas las sesiones del nivel
+    def __init__(self, latency: float, queries: int):
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            self.port = probe.getsockname()[1]
+        fd, self.stats_path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        os.unlink(self.stats_path)
+        self.process = subprocess.Popen([
+            sys.executable, os.path.abspath(__file__), '--serve', str(self.port),
+            '--latency', str(latency), '--queries', str(queries), '--stats-file', self.stats_path
+        ], stdout=subprocess.DEVNULL)
+        self.url = f"ws://127.0.0.1:{self.port}/_stcore/stream"
+
+    def wait_ready(self, timeout: float = 60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"El servidor terminó al iniciar (código {self.process.returncode})")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/_stcore/health", timeout=1):
+                    pass
+                if os.path.exists(self.stats_path):
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise TimeoutError("El servidor no respondió a tiempo")
+
+    def stats(self, since: float = 0.0) -> dict:
+        # Espera una publicación posterior a since (contadores al cierre del nivel)
+        while True:
+            with open(self.stats_path) as source:
+                stats = json.load(source)
+            if stats['written_at'] > since:
+                return stats
+            time.sleep(STATS_INTERVAL / 2)
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        if os.path.exists(self.stats_path):
+            os.unlink(self.stats_path)
+
+
+class BrowserSession:
+    # Cliente headless del protocolo del navegador: envía BackMsg rerun_script con el
+    # estado de los widgets y lee ForwardMsg hasta el fin del script
+    WIDGETS = ('selectbox', 'checkbox', 'text_input', 'button')
+
+    def __init__(self, url: str, timeout: float):
+        self.url = url
+        self.timeout = timeout
+        self.socket = None
+        # Etiqueta -> id de los widgets dibujados en el último rerun
+        self.widgets = {}
+        # Valores que el "usuario" fijó; se reenvían en cada rerun como hace el navegador
+        self.values = {}
+
+    async def connect(self):
+        from websockets.asyncio.client import connect
+
+        self.socket = await connect(self.url, subprotocols=['streamlit'], max_size=None)
+
+    async def close(self):
+        if self.socket is not None:
+            await self.socket.close()
+
+    def set_value(self, label: str, field: str, value):
+        if label not in self.widgets:
+            raise LookupError(f"No se encontró el widget {label!r}")
+        state = WidgetState(id=self.widgets[label])
+        setattr(state, field, value)
+        self.values[label] = state
+
+    async def rerun(self, trigger: Optional[str] = None) -> int:
+        # Devuelve las excepciones que mostró la app en este rerun
+        states = list(self.values.values())
+        if trigger is not None:
+            if trigger not in self.widgets:
+                raise LookupError(f"No se encontró el widget {trigger!r}")
+            states.append(WidgetState(id=self.widgets[trigger], trigger_value=True))
+
+        message = BackMsg()
+        message.rerun_script.query_string = ''
+        message.rerun_script.widget_states.widgets.extend(states)
+        await self.socket.send(message.SerializeToString())
+        return await asyncio.wait_for(self._read_run(), self.timeout)
+
+    async def _read_run(self) -> int:
+        widgets = {}
+        exceptions = 0
+        # Mensajes de un rerun anterior interrumpido se descartan hasta el new_session
+        started = False
+        while True:
+            message = ForwardMsg()
+            message.ParseFromString(await self.socket.recv())
+            kind = message.WhichOneof('type')
+            if kind == 'new_session':
+                started = True
+                widgets, exceptions = {}, 0
+            elif not started:
+                continue
+            elif kind == 'delta' and message.delta.WhichOneof('type') == 'new_element':
+                element = message.delta.new_element
+                element_type = element.WhichOneof('type')
+                if element_type == 'exception':
+                    exceptions += 1
+                elif element_type in self.WIDGETS:
+                    widget = getattr(element, element_type)
+                    widgets[widget.label] = widget.id
+            elif kind == 'script_finished' and \
+                    message.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                self.widgets = widgets
+                return exceptions
+
+
+async def run_session(url: str, script, timeout: float) -> dict:
+    session = BrowserSession(url, timeout)
+    timings = []
+    errors = 0
+    failures = []
+    comparison = False
+
+    try:
+        await session.connect()
+    except Exception:
+        return {'timings': [], 'errors': 1, 'failures': [traceback.format_exc(limit=3)]}
+
+    try:
+        for action, value in script:
+            started = time.perf_counter()
+            # Un paso que falla (timeout, widget ausente) no corta la sesión
+            try:
+                if action == 'period':
+                    session.set_value("Seleccionar período", 'string_value', value)
+                elif action == 'surface':
+                    session.set_value("🔎 Superficie de búsqueda", 'string_value', value)
+                elif action == 'comparison':
+                    comparison = not comparison
+                    session.set_value("📊 Comparar con período anterior", 'bool_value', comparison)
+                elif action == 'search' and "Buscar keyword" in session.widgets:
+                    session.set_value("Buscar keyword", 'string_value', value)
+                errors += await session.rerun()
+
+                # Un período grande pide confirmación: se acepta como lo haría el usuario
+                if "Cargar datos del período" in session.widgets:
+                    errors += await session.rerun(trigger="Cargar datos del período")
+            except Exception:
+                errors += 1
+                failures.append(traceback.format_exc(limit=3))
+                continue
+            timings.append((action, time.perf_counter() - started))
+    finally:
+        await session.close()
+
+    return {'timings': timings, 'errors': errors, 'failures': failures}
+
+
+async def _run_sessions(url: str, scripts, timeout: float):
+    return await asyncio.gather(*(run_session(url, script, timeout) for script in scripts))
+
+
+def _rss_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # Sin /proc: pico de memoria del proceso (KB en Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_level(server: Server, sessions: int, steps: int, seed: int, queries: int, timeout: float):
+    scripts = [build_script(random.Random(seed + i), steps, queries) for i in range(sessions)]
+    before = server.stats()
+
+    started = time.perf_counter()
+    results = asyncio.run(_run_sessions(server.url, scripts, timeout))
+    elapsed = time.perf_counter() - started
+    # Las sesiones siguen abiertas hasta aquí: la memoria se mide antes de que el
+    # servidor libere su estado (los contadores se toman después del cierre)
+    after = server.stats(since=time.time())
+
+    latencies = np.array([seconds for result in results for _, seconds in result['timings']])
+    calls = {name: count - before['calls'].get(name, 0) for name, count in after['calls'].items()}
+    calls = {name: count for name, count in calls.items() if count}
+    growth = max(after['rss_bytes'] - before['rss_bytes'], 0)
+
+    return {
+        'sessions': sessions,
+        'reruns': int(len(latencies)),
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 1) if len(latencies) else None,
+        'p95_ms': round(float(np.percentile(latencies, 95)) * 1000, 1) if len(latencies) else None,
+        'p99_ms': round(float(np.percentile(latencies, 99)) * 1000, 1) if len(latencies) else None,
+        'exceptions': sum(result['errors'] for result in results),
+        'rss_mb': round(after['rss_bytes'] / 1024 / 1024, 1),
+        'mb_per_session': round(growth / sessions / 1024 / 1024, 2),
+        'cache_mb': round(after['cache_bytes'] / 1024 / 1024, 1),
+        'upstream_calls': sum(calls.values()),
+        'upstream_by_api': calls,
+        'failures': [failure for result in results for failure in result['failures']]
+    }
+
+
+def print_report(rows):
+    columns = ['sessions', 'reruns', 'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms',
+               'exceptions', 'rss_mb', 'mb_per_session', 'cache_mb', 'upstream_calls']
+    widths = [max(len(c), *(len(str(r[c])) for r in rows)) for c in columns]
+    print('  '.join(c.rjust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(str(row[c]).rjust(w) for c, w in zip(columns, widths)))
+    print()
+    for row in rows:
+        detail = ', '.join(f"{name}={count}" for name, count in sorted(row['upstream_by_api'].items()))
+        print(f"{row['sessions']:>4} sesiones: {detail}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del dashboard con backends falsos")
+    parser.add_argument('--sessions', default='1,2,4,8',
+                        help="niveles de concurrencia separados por coma (por defecto 1,2,4,8)")
+    parser.add_argument('--steps', type=int, default=6, help="interacciones por sesión después del primer render")
+    parser.add_argument('--latency', type=float, default=0.05, help="latencia simulada de cada llamada a la API (s)")
+    parser.add_argument('--queries', type=int, default=2000, help="keywords distintas en el GSC falso")
+    parser.add_argument('--timeout', type=float, default=300, help="tiempo máximo por rerun (s)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--warm', action='store_true',
+                        help="usar un mismo servidor (y su caché) para todos los niveles")
+    parser.add_argument('--json', dest='json_path', help="guardar los resultados en este archivo JSON")
+    parser.add_argument('--serve', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    parser.add_argument('--stats-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.latency, args.queries, args.stats_file)
+        return
+
+    levels = [int(level) for level in args.sessions.split(',') if level.strip()]
+
+    rows = []
+    warm_server = Server(args.latency, args.queries) if args.warm else None
+    try:
+        if warm_server is not None:
+            warm_server.wait_ready()
+        for sessions in levels:
+            # En frío cada nivel arranca un servidor nuevo, con las cachés vacías
+            server = warm_server or Server(args.latency, args.queries)
+            try:
+                if server is not warm_server:
+                    server.wait_ready()
+                row = run_level(server, sessions, args.steps, args.seed, args.queries, args.timeout)
+            finally:
+                if server is not warm_server:
+                    server.stop()
+            rows.append(row)
+            print(f"{sessions} sesiones: p95 {row['p95_ms']} ms · {row['throughput_rps']} reruns/s", flush=True)
+            # Primer error de cada nivel, para no tener que reproducirlo a mano
+            if row['failures']:
+                print(row['failures'][0], flush=True)
+    finally:
+        if warm_server is not None:
+            warm_server.stop()
+
+    print()
+    print_report(rows)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as output:
+            json.dump(rows, output, indent=2, default=str)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,64 @@
-from .gsc_connector import GSCConnector
-from .ga4_connector import GA4Connector
+import importlib
 
-__all__ = ['GSCConnector', 'GA4Connector']
\ No newline at end of file
+from .config import ConnectorConfig
+from .errors import (
+    ConnectorError, ConfigurationError, AuthenticationError, PermissionDeniedError,
+    NotFoundError, QuotaExceededError, QueryError
+)
+from .gsc_client import GSCClient
+from .ga4_client import GA4Client
+from .charts import build_scatter, build_dual_axis
+from .figures import FigureSpec, cached_figure
+from .filters import field, plan_filters, FilterPlan
+from .urls import UrlIndex, normalize_urls, join_page_performance
+from .cache import CacheBackend, BoundedCache, NullCache, get_cache, cached, Uncached
+from .pagination import PageStream, rechunk
+from .export import write_dataset, read_dataset, read_frame, export_bytes
+from .views import sorted_view, rounded_view, stripped_view
+from .scheduler import QueryScheduler, get_scheduler, checkpoint, speculative
+from .admission import CostEstimate, AdmissionController, get_admission
+from .sketches import CountMinSketch, TopCandidates, HyperLogLog, DimensionSketch
+from .live import HourlyRingBuffer, LivePoller, get_poller
+from .ratelimit import RateLimiter, get_rate_limiter
+from .clusters import KeywordClusterer, aggregate_clusters, assign_clusters, get_clusterer
+from .anomalies import SeriesState, AnomalyDetector, get_detector
+
+# Los adaptadores y helpers de Streamlit se importan al usarlos: el núcleo (clientes,
+# caché, pool de procesos) se puede importar en procesos y scripts sin cargar streamlit
+_STREAMLIT_EXPORTS = {
+    'GSCConnector': 'gsc_connector',
+    'GA4Connector': 'ga4_connector',
+    'PaginatedTable': 'tables',
+    'render_paginated_table': 'tables',
+    'render_stream': 'streaming',
+    'cached_stream': 'streaming',
+    'render_figure': 'render',
+    'STREAM_BATCH_SIZE': 'streaming'
+}
+
+
+def __getattr__(name):
+    if name in _STREAMLIT_EXPORTS:
+        return getattr(importlib.import_module(f'.{_STREAMLIT_EXPORTS[name]}', __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ['ConnectorConfig', 'ConnectorError', 'ConfigurationError', 'AuthenticationError',
+           'PermissionDeniedError', 'NotFoundError', 'QuotaExceededError', 'QueryError',
+           'GSCClient', 'GA4Client', 'GSCConnector', 'GA4Connector',
+           'build_scatter', 'build_dual_axis', 'cached_figure', 'FigureSpec', 'render_figure',
+           'PaginatedTable', 'render_paginated_table',
+           'field', 'plan_filters', 'FilterPlan',
+           'UrlIndex', 'normalize_urls', 'join_page_performance',
+           'render_stream', 'cached_stream', 'STREAM_BATCH_SIZE',
+           'CacheBackend', 'BoundedCache', 'NullCache', 'get_cache', 'cached', 'Uncached',
+           'PageStream', 'rechunk',
+           'write_dataset', 'read_dataset', 'read_frame', 'export_bytes',
+           'sorted_view', 'rounded_view', 'stripped_view',
+           'QueryScheduler', 'get_scheduler', 'checkpoint', 'speculative',
+           'CostEstimate', 'AdmissionController', 'get_admission',
+           'CountMinSketch', 'TopCandidates', 'HyperLogLog', 'DimensionSketch',
+           'HourlyRingBuffer', 'LivePoller', 'get_poller',
+           'RateLimiter', 'get_rate_limiter',
+           'KeywordClusterer', 'aggregate_clusters', 'assign_clusters', 'get_clusterer',
+           'SeriesState', 'AnomalyDetector', 'get_detector']
\ No newline at end of file
@@ -0,0 +1,277 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .errors import QuotaExceededError
+
+# Por encima de estas filas estimadas una consulta se considera pesada
+LARGE_PULL_ROWS = int(os.getenv('DASHBOARD_LARGE_PULL_ROWS', 100000))
+# Consultas pesadas simultáneas por propiedad; las demás esperan en cola
+MAX_HEAVY_REQUESTS = int(os.getenv('DASHBOARD_MAX_HEAVY_REQUESTS', 2))
+# Segundos máximos de espera en la cola antes de rechazar
+ADMISSION_TIMEOUT = float(os.getenv('DASHBOARD_ADMISSION_TIMEOUT', 30))
+# Tokens de GA4 estimados a partir de los cuales una consulta se considera pesada
+LARGE_PULL_TOKENS = int(os.getenv('DASHBOARD_LARGE_PULL_TOKENS', 2000))
+# Rangos más largos que esto agrupando por query/page son costosos para GSC
+LONG_RANGE_DAYS = int(os.getenv('DASHBOARD_LONG_RANGE_DAYS', 180))
+# Segundos durante los que vale la última lectura de la cuota de GA4
+QUOTA_READING_SECONDS = float(os.getenv('DASHBOARD_QUOTA_READING_SECONDS', 300))
+# Consultas completas recordadas como posibles superconjuntos para degradar
+MAX_REMEMBERED_PULLS = 256
+
+# Cardinalidad diaria supuesta por dimensión mientras no hay observaciones reales
+DEFAULT_DAILY_CARDINALITY = {
+    'date': 1,
+    'device': 3,
+    'deviceCategory': 3,
+    'country': 40,
+    'searchAppearance': 5,
+    'query': 400,
+    'page': 80,
+    'pagePath': 80,
+    'landingPagePlusQueryString': 80,
+    'sessionSource': 20,
+    'sessionMedium': 8,
+    'sessionDefaultChannelGroup': 10,
+    'eventName': 15,
+    # Reportes de comparación: los días ya cubren la unión de ambos períodos
+    'dateRange': 1
+}
+# Costo en tokens de GA4 sin observaciones: base por request + por cada 1000 filas
+DEFAULT_TOKENS_PER_REQUEST = 10
+DEFAULT_TOKENS_PER_1000_ROWS = 5
+# Peso de la observación nueva en el promedio móvil
+SMOOTHING = 0.3
+
+
+def days_between(start_date: str, end_date: str) -> int:
+    return max((date.fromisoformat(end_date) - date.fromisoformat(start_date)).days + 1, 1)
+
+
+class CostEstimate:
+    def __init__(self, source: str, rows: int, pages: int,
+                 tokens: Optional[int] = None, cached: bool = False, observed: bool = False,
+                 expensive: bool = False):
+        self.source = source
+        self.rows = rows
+        self.pages = pages
+        self.tokens = tokens
+        self.cached = cached
+        # Costosa para la API aunque devuelva pocas filas (rango largo, muchos tokens)
+        self.expensive = expensive
+        # False: se usaron cardinalidades por defecto, no datos de la propiedad
+        self.observed = observed
+
+    def __add__(self, other: 'CostEstimate') -> 'CostEstimate':
+        tokens = None
+        if self.tokens is not None or other.tokens is not None:
+            tokens = (self.tokens or 0) + (other.tokens or 0)
+        return CostEstimate(
+            self.source if self.source == other.source else 'mixed',
+            self.rows + other.rows,
+            self.pages + other.pages,
+            tokens,
+            cached=self.cached and other.cached,
+            observed=self.observed and other.observed,
+            expensive=(self.expensive and not self.cached) or (other.expensive and not other.cached)
+        )
+
+    @property
+    def heavy(self) -> bool:
+        return not self.cached and (self.rows > LARGE_PULL_ROWS or self.expensive)
+
+    def describe(self) -> str:
+        if self.cached:
+            return "Datos en caché: no consume cuota"
+        text = f"~{self.rows:,} filas en {self.pages:,} requests"
+        if self.tokens is not None:
+            text += f" · ~{self.tokens:,} tokens de GA4"
+        if not self.observed:
+            text += " (estimación preliminar)"
+        return text
+
+    def __repr__(self) -> str:
+        return f"CostEstimate({self.source!r}, rows={self.rows}, pages={self.pages}, tokens={self.tokens})"
+
+
+class CostModel:
+    # Aprende filas por día de cada combinación de dimensiones y tokens de GA4
+    # por request a partir de las consultas ya resueltas
+    def __init__(self):
+        self._rows_per_day = {}
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self.tokens_remaining_hour = None
+        self.tokens_remaining_day = None
+        self.quota_updated_at = None
+        # Hora del reloj en que se leyó la cuota: la cuota horaria se renueva al cambiar
+        self.quota_hour = None
+
+    @staticmethod
+    def _key(dimensions: List[str], metrics: Optional[List[str]] = None) -> Tuple:
+        return tuple(sorted(dimensions)), tuple(sorted(metrics or []))
+
+    def _update(self, table: Dict, key: Tuple, value: float):
+        with self._lock:
+            previous = table.get(key)
+            table[key] = value if previous is None else previous + SMOOTHING * (value - previous)
+
+    def observe_rows(self, dimensions: List[str], days: int, rows: int, truncated: bool):
+        # Un resultado truncado por row_limit solo da una cota inferior
+        key = self._key(dimensions)
+        rate = rows / days
+        if truncated:
+            with self._lock:
+                current = self._rows_per_day.get(key, 0.0)
+            if rate <= current:
+                return
+        self._update(self._rows_per_day, key, rate)
+
+    def observe_tokens(self, dimensions: List[str], metrics: List[str], rows: int, consumed: int):
+        # Tokens por cada 1000 filas devueltas (mínimo una unidad por request)
+        self._update(self._tokens, self._key(dimensions, metrics), consumed / max(rows / 1000, 1))
+
+    def observe_quota(self, remaining_hour: Optional[int], remaining_day: Optional[int]):
+        with self._lock:
+            self.tokens_remaining_hour = remaining_hour
+            self.tokens_remaining_day = remaining_day
+            self.quota_updated_at = time.monotonic()
+            self.quota_hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+
+    def remaining_quota(self) -> Tuple[Optional[int], Optional[int]]:
+        # Tokens restantes (hora, día) según la última respuesta de GA4. Una lectura vieja
+        # no se usa: otras aplicaciones consumen la misma cuota y la hora se renueva
+        with self._lock:
+            if self.quota_updated_at is None or time.monotonic() - self.quota_updated_at > QUOTA_READING_SECONDS:
+                return None, None
+            hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+            if hour != self.quota_hour:
+                remaining_day = self.tokens_remaining_day if hour.date() == self.quota_hour.date() else None
+                return None, remaining_day
+            return self.tokens_remaining_hour, self.tokens_remaining_day
+
+    def expected_rows(self, dimensions: List[str], days: int, limit: int) -> Tuple[int, bool]:
+        with self._lock:
+            rate = self._rows_per_day.get(self._key(dimensions))
+        observed = rate is not None
+        if rate is None:
+            rate = 1.0
+            for dimension in dimensions:
+                rate *= DEFAULT_DAILY_CARDINALITY.get(dimension, 10)
+        return int(min(rate * days, limit)), observed
+
+    def expected_tokens(self, dimensions: List[str], metrics: List[str], rows: int) -> Tuple[int, bool]:
+        with self._lock:
+            per_1000 = self._tokens.get(self._key(dimensions, metrics))
+        if per_1000 is None:
+            return int(DEFAULT_TOKENS_PER_REQUEST + DEFAULT_TOKENS_PER_1000_ROWS * rows / 1000), False
+        return int(per_1000 * max(rows / 1000, 1)), True
+
+
+class AdmissionController:
+    def __init__(self, max_heavy: int = MAX_HEAVY_REQUESTS, timeout: float = ADMISSION_TIMEOUT):
+        self.model = CostModel()
+        self.timeout = timeout
+        self._heavy = threading.BoundedSemaphore(max_heavy)
+        self._lock = threading.Lock()
+        self._pulls = OrderedDict()
+        self.admitted = 0
+        self.queued = 0
+        self.downgraded = 0
+        self.rejected = 0
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def record_downgrade(self):
+        self._count('downgraded')
+
+    def record_pull(self, start_date: str, end_date: str, dimensions: List[str], row_limit: int,
+                    scope: Any = None):
+        # Solo consultas sin filtros que trajeron todas las filas sirven de superconjunto;
+        # scope separa datos distintos de la misma propiedad (p. ej. el tipo de búsqueda)
+        key = (scope, start_date, end_date, tuple(dimensions), row_limit)
+        with self._lock:
+            self._pulls[key] = None
+            self._pulls.move_to_end(key)
+            while len(self._pulls) > MAX_REMEMBERED_PULLS:
+                self._pulls.popitem(last=False)
+
+    def supersets(self, start_date: str, end_date: str, dimensions: List[str],
+                  scope: Any = None) -> List[Tuple[List[str], int]]:
+        wanted = set(dimensions)
+        with self._lock:
+            candidates = [
+                (list(dims), row_limit) for (pull_scope, start, end, dims, row_limit) in reversed(self._pulls)
+                if pull_scope == scope and start == start_date and end == end_date and wanted < set(dims)
+            ]
+        # Primero el superconjunto con menos dimensiones extra (menos filas a agregar)
+        return sorted(candidates, key=lambda c: len(c[0]))
+
+    def check_quota(self, estimate: CostEstimate):
+        remaining, _ = self.model.remaining_quota()
+        if estimate.tokens is not None and remaining is not None and estimate.tokens > remaining:
+            self._count('rejected')
+            raise QuotaExceededError(
+                f"La consulta necesita ~{estimate.tokens:,} tokens de GA4 y quedan {remaining:,} en esta hora. "
+                "Reduce el rango de fechas o inténtalo más tarde.",
+                source=estimate.source, status=429
+            )
+
+    def admit(self, estimate: CostEstimate):
+        # Una vez por consulta, antes de la primera llamada a la API
+        self.check_quota(estimate)
+        self._count('admitted')
+
+    @contextmanager
+    def slot(self, estimate: CostEstimate) -> Iterator[None]:
+        # Alrededor de cada llamada a la API, no de toda la paginación: el turno no
+        # queda tomado mientras quien consume las páginas las procesa o se detiene
+        if not estimate.heavy:
+            yield
+            return
+
+        # Consulta pesada: espera turno para no agotar la cuota compartida
+        if not self._heavy.acquire(blocking=False):
+            self._count('queued')
+            if not self._heavy.acquire(timeout=self.timeout):
+                self._count('rejected')
+                raise QuotaExceededError(
+                    f"Hay demasiadas consultas grandes en curso ({estimate.describe()}). "
+                    "Inténtalo en unos segundos.",
+                    source=estimate.source, status=429
+                )
+        try:
+            yield
+        finally:
+            self._heavy.release()
+
+    def stats(self) -> Dict[str, Any]:
+        remaining_hour, remaining_day = self.model.remaining_quota()
+        with self._lock:
+            return {
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'downgraded': self.downgraded,
+                'rejected': self.rejected,
+                'tokens_remaining_hour': remaining_hour,
+                'tokens_remaining_day': remaining_day
+            }
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def get_admission(source: str, property_id: Any) -> AdmissionController:
+    # La cuota es por propiedad: un controlador compartido por todas las sesiones
+    key = (source, str(property_id))
+    with _controllers_lock:
+        if key not in _controllers:
+            _controllers[key] = AdmissionController()
+        return _controllers[key]
@@ -0,0 +1,216 @@
+import os
+import threading
+from datetime import date, timedelta
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional
+import numpy as np
+import pandas as pd
+
+# Días equivalentes de la media móvil exponencial: alpha = 2 / (span + 1)
+ANOMALY_SPAN_DAYS = int(os.getenv('DASHBOARD_ANOMALY_SPAN_DAYS', 14))
+# Desvíos respecto de la propia línea base a partir de los cuales se marca una serie
+ANOMALY_THRESHOLD = float(os.getenv('DASHBOARD_ANOMALY_THRESHOLD', 3.0))
+# Días que se cargan la primera vez y días con datos antes de evaluar una serie
+ANOMALY_HISTORY_DAYS = int(os.getenv('DASHBOARD_ANOMALY_HISTORY_DAYS', 56))
+MIN_HISTORY_DAYS = 7
+# Días por consulta al sincronizar
+ANOMALY_WINDOW_DAYS = 14
+
+TRACKED_METRICS = ['clicks', 'impressions', 'ctr', 'position']
+ANOMALY_METRICS = ['clicks', 'ctr', 'position']
+# Métricas sin valor los días sin impresiones (la serie no se actualiza ese día)
+RATE_METRICS = ['ctr', 'position']
+# Desvío mínimo por métrica: evita marcar series casi constantes por ruido mínimo
+MIN_STD = {'clicks': 1.0, 'impressions': 5.0, 'ctr': 0.01, 'position': 0.5}
+# En posición un valor más alto es peor
+INVERTED_METRICS = {'position'}
+
+
+class SeriesState:
+    # Media y varianza EWMA por serie y métrica en arrays (series, métricas).
+    # Crece por duplicación para agregar series nuevas sin copiar en cada día
+    def __init__(self, metrics: List[str], capacity: int = 1024):
+        self.metrics = list(metrics)
+        self.keys = pd.Index([], dtype=object)
+        self.size = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        shape = (capacity, len(self.metrics))
+        previous = getattr(self, 'mean', None)
+        arrays = {
+            'mean': np.zeros(shape, dtype=np.float32),
+            'var': np.zeros(shape, dtype=np.float32),
+            'count': np.zeros(shape, dtype=np.int32),
+            # Último día: valor observado, línea base previa y desvío en sigmas
+            'value': np.full(shape, np.nan, dtype=np.float32),
+            'expected': np.zeros(shape, dtype=np.float32),
+            'score': np.zeros(shape, dtype=np.float32)
+        }
+        if previous is not None:
+            for name, array in arrays.items():
+                array[:self.size] = getattr(self, name)[:self.size]
+        for name, array in arrays.items():
+            setattr(self, name, array)
+
+    def rows(self, keys: pd.Index) -> np.ndarray:
+        positions = self.keys.get_indexer(keys)
+        new = positions < 0
+        if new.any():
+            added = keys[new].unique()
+            if self.size + len(added) > len(self.mean):
+                self._allocate(max(2 * len(self.mean), self.size + len(added)))
+            self.keys = self.keys.append(added)
+            self.size += len(added)
+            positions = self.keys.get_indexer(keys)
+        return positions
+
+
+class AnomalyDetector:
+    # Línea base propia de cada keyword o página, actualizada día a día sin recalcular
+    # la historia: cada día sincronizado es una pasada vectorizada sobre todas las series
+    def __init__(self, dimension: str, metrics: List[str] = None, span: int = ANOMALY_SPAN_DAYS):
+        self.dimension = dimension
+        self.alpha = 2.0 / (span + 1)
+        self.state = SeriesState(metrics or TRACKED_METRICS)
+        self.min_std = np.array([MIN_STD.get(m, 0.0) for m in self.state.metrics], dtype=np.float32)
+        self.rate_columns = np.array([m in RATE_METRICS for m in self.state.metrics])
+        self.watermark = None
+        # Día que corresponde a los desvíos actuales
+        self.scored_day = None
+        self.days = 0
+        # _lock protege el estado; _sync_lock marca una sincronización en curso
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._background = None
+
+    @property
+    def ready(self) -> bool:
+        # False hasta que termina la carga inicial de la historia
+        return self.watermark is not None
+
+    def update(self, df: pd.DataFrame):
+        # df: filas date × dimensión con las métricas; días anteriores al watermark se ignoran.
+        # df.attrs['partial_days']: días cortados por el tope de filas
+        if df.empty:
+            return
+        partial_days = df.attrs.get('partial_days', ())
+        with self._lock:
+            for day, rows in df.groupby(df['date'].dt.date, sort=True):
+                if self.watermark is None or day > self.watermark:
+                    self._update_day(rows, complete=day not in partial_days)
+                    self.watermark = day
+                    self.scored_day = day
+
+    def _update_day(self, rows: pd.DataFrame, complete: bool = True):
+        state = self.state
+        keys = pd.Index(rows[self.dimension].to_numpy(dtype=object))
+        positions = state.rows(keys)
+        n = state.size
+
+        # Las series conocidas sin filas ese día tuvieron 0 clicks e impresiones; si el
+        # día llegó cortado por el tope de filas, faltar no dice nada y no se observan
+        values = np.zeros((n, len(state.metrics)), dtype=np.float32) if complete \
+            else np.full((n, len(state.metrics)), np.nan, dtype=np.float32)
+        values[:, self.rate_columns] = np.nan
+        values[positions] = rows[state.metrics].to_numpy(dtype=np.float32)
+        observed = ~np.isnan(values)
+
+        mean, var, count = state.mean[:n], state.var[:n], state.count[:n]
+        std = np.maximum(np.sqrt(var), self.min_std)
+        ready = observed & (count >= MIN_HISTORY_DAYS)
+        state.score[:n] = np.where(ready, (np.nan_to_num(values) - mean) / std, 0.0)
+        state.value[:n] = values
+        state.expected[:n] = mean
+
+        # EWMA incremental: media y varianza se actualizan con el día nuevo
+        delta = np.where(observed, np.nan_to_num(values) - mean, 0.0)
+        increment = self.alpha * delta
+        first = observed & (count == 0)
+        mean += np.where(first, delta, increment)
+        var[:] = np.where(first, 0.0, np.where(observed, (1 - self.alpha) * (var + delta * increment), var))
+        count += observed
+        self.days += 1
+
+    def sync(self, fetch: Callable[[date, date], Optional[pd.DataFrame]], through: date,
+             history_days: int = ANOMALY_HISTORY_DAYS) -> bool:
+        # Pide solo los días posteriores al watermark. Si otra sesión (o la carga inicial)
+        # ya está sincronizando no se espera: se usa el estado actual y devuelve False.
+        # fetch devuelve None si hubo un error
+        if not self._sync_lock.acquire(blocking=False):
+            return False
+        try:
+            start = through - timedelta(days=history_days - 1) if self.watermark is None \
+                else self.watermark + timedelta(days=1)
+            while start <= through:
+                end = min(start + timedelta(days=ANOMALY_WINDOW_DAYS - 1), through)
+                df = fetch(start, end)
+                if df is None:
+                    return False
+                # El watermark avanza solo hasta el último día con filas: los días que
+                # todavía no tienen datos se vuelven a pedir en la próxima sincronización
+                self.update(df)
+                start = end + timedelta(days=1)
+            return True
+        finally:
+            self._sync_lock.release()
+
+    def sync_in_background(self, submit: Callable[..., Future],
+                           fetch: Callable[[date, date], Optional[pd.DataFrame]], through: date):
+        # Carga inicial fuera del hilo del script; submit encola en el scheduler.
+        # Una sola tarea a la vez: si falla, el próximo llamado la vuelve a lanzar
+        with self._lock:
+            if self._background is not None and not self._background.done():
+                return
+            self._background = submit(self.sync, fetch, through)
+
+    def anomalies(self, threshold: float = ANOMALY_THRESHOLD, metrics: List[str] = None,
+                  min_impressions: float = 0, limit: int = 50) -> pd.DataFrame:
+        # Una pasada sobre todas las series y métricas: las que más se desvían del último día
+        metrics = [m for m in (metrics or ANOMALY_METRICS) if m in self.state.metrics]
+        with self._lock:
+            state = self.state
+            n = state.size
+            columns = [state.metrics.index(m) for m in metrics]
+            scores = state.score[:n, columns]
+            expected = state.expected[:n, columns]
+            values = state.value[:n, columns]
+            keys = state.keys
+            scored_day = self.scored_day
+            volume = state.mean[:n, state.metrics.index('impressions')] \
+                if 'impressions' in state.metrics else np.full(n, np.inf)
+
+        flagged = (np.abs(scores) >= threshold) & (volume >= min_impressions)[:, None]
+        series, metric = np.nonzero(flagged)
+        if not len(series):
+            return pd.DataFrame(columns=['date', self.dimension, 'metric', 'value', 'expected', 'score', 'direction'])
+
+        score = scores[series, metric]
+        inverted = np.array([m in INVERTED_METRICS for m in metrics])[metric]
+        df = pd.DataFrame({
+            'date': scored_day,
+            self.dimension: keys[series].to_numpy(dtype=object),
+            'metric': np.array(metrics, dtype=object)[metric],
+            'value': values[series, metric],
+            'expected': expected[series, metric],
+            'score': score,
+            'direction': np.where((score > 0) != inverted, 'mejora', 'caída')
+        })
+        order = np.argsort(-np.abs(score), kind='stable')[:limit]
+        return df.iloc[order].reset_index(drop=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'series': self.state.size, 'days': self.days, 'watermark': self.watermark}
+
+
+_detectors = {}
+_detectors_lock = threading.Lock()
+
+
+def get_detector(key: Hashable, dimension: str) -> AnomalyDetector:
+    # Uno por propiedad, superficie y dimensión, compartido por todas las sesiones
+    with _detectors_lock:
+        if key not in _detectors:
+            _detectors[key] = AnomalyDetector(dimension)
+        return _detectors[key]
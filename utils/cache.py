@@ -0,0 +1,319 @@
+import functools
+import hashlib
+import inspect
+import itertools
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Presupuesto global de memoria para resultados de los conectores
+DEFAULT_MAX_BYTES = int(os.getenv('DASHBOARD_CACHE_MB', 512)) * 1024 * 1024
+DEFAULT_TTL = 3600
+
+
+def estimate_size(value: Any) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, pd.Index):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    # Objetos de índice (árbol de secciones, índice de keywords): se suman sus atributos
+    if hasattr(value, '__dict__') and not isinstance(value, type):
+        return sys.getsizeof(value) + estimate_size(vars(value))
+    return sys.getsizeof(value)
+
+
+class _Entry:
+    __slots__ = ('value', 'size', 'expires_at', 'hits')
+
+    def __init__(self, value: Any, size: int, expires_at: float):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.hits = 0
+
+
+class CacheBackend:
+    # Interfaz de caché de los conectores: cualquier implementación con get/set/clear
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        raise NotImplementedError
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key)[0]
+
+
+class NullCache(CacheBackend):
+    # Para jobs batch que leen cada dato una sola vez
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        return False, None
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        return False
+
+    def clear(self):
+        pass
+
+
+class BoundedCache(CacheBackend):
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL, policy: str = 'lru'):
+        if policy not in ('lru', 'lfu'):
+            raise ValueError(f"Política de caché no soportada: {policy}")
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.policy = policy
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejections = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry.expires_at > time.monotonic()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            entry.hits += 1
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            # Un resultado más grande que todo el presupuesto no se guarda
+            if size > self.max_bytes:
+                self.rejections += 1
+                return False
+            while self._bytes + size > self.max_bytes and self._entries:
+                self._evict_one()
+            self._entries[key] = _Entry(value, size, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._bytes += size
+            return True
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _evict_one(self):
+        # Primero se descartan las entradas vencidas
+        now = time.monotonic()
+        expired = [k for k, e in self._entries.items() if e.expires_at <= now]
+        if expired:
+            for key in expired:
+                self._remove(key)
+                self.expirations += 1
+            return
+
+        if self.policy == 'lfu':
+            # Menos usada; ante empate, la más antigua (orden del OrderedDict)
+            key = min(self._entries, key=lambda k: self._entries[k].hits)
+        else:
+            key = next(iter(self._entries))
+        self._remove(key)
+        self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / requests, 3) if requests else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'rejections': self.rejections
+            }
+
+
+def content_hash(df: pd.DataFrame) -> str:
+    # Sensible al orden de las filas, al índice y a los nombres de columnas
+    hashed = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    digest = hashlib.blake2b(hashed.tobytes(), digest_size=16)
+    digest.update('|'.join(map(str, df.columns)).encode())
+    return f"{digest.hexdigest()}-{len(df)}"
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, pd.DataFrame):
+        return ('DataFrame', content_hash(value))
+    # Mensajes proto (FilterExpression de GA4): se usa su serialización binaria
+    serialize = getattr(type(value), 'serialize', None)
+    if serialize is not None and hasattr(type(value), 'pb'):
+        return (type(value).__name__, serialize(value))
+    # Objetos con hash por identidad (ej. expresiones de filtros) cambiarían de clave
+    # en cada rerun: se usa su repr
+    if type(value).__hash__ is object.__hash__ and type(value).__repr__ is not object.__repr__:
+        return (type(value).__name__, repr(value))
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> BoundedCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = BoundedCache()
+        return _cache
+
+
+# Frame compartido -> token del dataset del que proviene (por identidad, sin hashear datos)
+_tokens = {}
+_tokens_lock = threading.Lock()
+_generations = itertools.count()
+
+
+def _forget(frame_id: int, ref):
+    with _tokens_lock:
+        if _tokens.get(frame_id, (None,))[0] is ref:
+            del _tokens[frame_id]
+
+
+def share(df: pd.DataFrame, token: Hashable) -> pd.DataFrame:
+    # Copia superficial: cada sesión recibe su propio objeto sin copiar los datos.
+    # El resultado se trata como de solo lectura: las transformaciones van por derive()
+    view = df.copy(deep=False)
+    ref = weakref.ref(view, lambda r, frame_id=id(view): _forget(frame_id, r))
+    with _tokens_lock:
+        _tokens[id(view)] = (ref, token)
+    return view
+
+
+def dataset_token(df: pd.DataFrame) -> Optional[Hashable]:
+    with _tokens_lock:
+        entry = _tokens.get(id(df))
+    if entry is None or entry[0]() is not df:
+        return None
+    return entry[1]
+
+
+def derive(df: pd.DataFrame, transform: Callable, *args, cache: Optional[CacheBackend] = None) -> pd.DataFrame:
+    # Vista derivada memoizada por (dataset, transformación); transform debe ser pura
+    token = dataset_token(df)
+    if token is None:
+        return transform(df, *args)
+
+    key = ('view', token, transform.__module__, transform.__qualname__, _freeze(args))
+    store = cache if cache is not None else get_cache()
+    found, value = store.get(key)
+    if not found:
+        value = transform(df, *args)
+        store.set(key, value)
+    return share(value, key) if isinstance(value, pd.DataFrame) else value
+
+
+class Uncached:
+    # Resultado que un método @cached devuelve sin guardarlo (p. ej. una consulta
+    # que terminó con error): el próximo llamado vuelve a consultar la API
+    def __init__(self, value: Any):
+        self.value = value
+
+
+def cached(ttl: Optional[float] = None, cache: Optional[CacheBackend] = None) -> Callable:
+    # Para métodos de conectores: la clave incluye la propiedad (cache_namespace)
+    # y todos los argumentos, también los filtros proto que st.cache_data ignoraba
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        def make_key(self, args, kwargs) -> Hashable:
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = list(bound.arguments.items())[1:]
+            return (
+                func.__qualname__,
+                getattr(self, 'cache_namespace', None),
+                tuple((name, _freeze(value)) for name, value in arguments)
+            )
+
+        def store_for(self) -> CacheBackend:
+            # Prioridad: caché del decorador > caché de la instancia > caché global
+            # (se compara con None: una caché vacía tiene len 0)
+            store = cache if cache is not None else getattr(self, 'cache', None)
+            return store if store is not None else get_cache()
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            key = make_key(self, args, kwargs)
+            store = store_for(self)
+            found, entry = store.get(key)
+            if not found:
+                result = func(self, *args, **kwargs)
+                if isinstance(result, Uncached):
+                    return result.value
+                # La generación distingue un resultado refrescado de uno anterior
+                # con la misma clave, así no se reutilizan vistas derivadas viejas
+                entry = (result, (key, next(_generations)))
+                store.set(key, entry, ttl)
+
+            value, token = entry
+            if isinstance(value, pd.DataFrame):
+                return share(value, token)
+            return value
+
+        def is_cached(self, *args, **kwargs) -> bool:
+            # Consulta si el resultado ya está en caché sin ejecutar la función
+            return make_key(self, args, kwargs) in store_for(self)
+
+        wrapper.is_cached = is_cached
+        return wrapper
+
+    return decorator
@@ -0,0 +1,186 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from typing import Optional, Dict, List
+
+# Por encima de este número de puntos se usa WebGL (scattergl) en lugar de SVG
+WEBGL_THRESHOLD = 1000
+# Por encima de este número de puntos se pre-agrupan en una grilla 2D
+BINNING_THRESHOLD = 20000
+# Tamaño máximo del JSON de cada figura enviado al navegador
+FIGURE_BYTES_BUDGET = 1_500_000
+# Bytes por valor numérico en el JSON: plotly los serializa como arrays binarios en base64
+NUMERIC_VALUE_BYTES = 11
+# Cantidad de celdas por eje en el modo agrupado
+DENSITY_BINS = 60
+# Puntos destacados que se dibujan encima de la grilla de densidad
+HIGHLIGHT_POINTS = 300
+# Más categorías que esto en `color` saturan la leyenda
+MAX_COLOR_CATEGORIES = 20
+
+
+def estimate_points_bytes(df: pd.DataFrame, columns: List[Optional[str]]) -> int:
+    # Tamaño aproximado del JSON de los puntos sin serializar la figura: los números
+    # como base64 y los textos por su largo más comillas y separador
+    total = 0
+    for column in dict.fromkeys(c for c in columns if c):
+        values = df[column]
+        if pd.api.types.is_numeric_dtype(values):
+            total += NUMERIC_VALUE_BYTES * len(values)
+        else:
+            total += int(values.astype(str).str.len().sum()) + 3 * len(values)
+    return total
+
+
+def build_scatter(df: pd.DataFrame, x: str, y: str,
+                  size: Optional[str] = None,
+                  color: Optional[str] = None,
+                  hover_name: Optional[str] = None,
+                  hover_data: Optional[List[str]] = None,
+                  title: Optional[str] = None,
+                  labels: Optional[Dict[str, str]] = None,
+                  reverse_x: bool = False,
+                  height: int = 350,
+                  webgl_threshold: int = WEBGL_THRESHOLD,
+                  binning_threshold: int = BINNING_THRESHOLD,
+                  max_bytes: int = FIGURE_BYTES_BUDGET) -> go.Figure:
+    labels = labels or {}
+    n_points = len(df)
+
+    # Demasiadas categorías: se muestran en el hover en lugar de la leyenda
+    if color and not pd.api.types.is_numeric_dtype(df[color]) and df[color].nunique() > MAX_COLOR_CATEGORIES:
+        hover_name = hover_name or color
+        color = None
+
+    # Si los puntos superan el presupuesto, se dejan como puntos solo los
+    # más relevantes y el resto pasa a la grilla de densidad
+    points_bytes = estimate_points_bytes(df, [x, y, size, color, hover_name] + list(hover_data or []))
+
+    if n_points > binning_threshold:
+        fig = _density_figure(df, x, y, weight=size, hover_name=hover_name,
+                              title=title, labels=labels)
+    elif points_bytes > max_bytes:
+        bytes_per_point = points_bytes / max(n_points, 1)
+        highlight = max(int(max_bytes * 0.5 / bytes_per_point), 1)
+        fig = _density_figure(df, x, y, weight=size, hover_name=hover_name,
+                              title=title, labels=labels, highlight=highlight)
+    else:
+        fig = px.scatter(
+            df,
+            x=x,
+            y=y,
+            size=size,
+            color=color,
+            hover_name=hover_name,
+            hover_data=hover_data,
+            title=title,
+            labels=labels,
+            render_mode='webgl' if n_points > webgl_threshold else 'svg'
+        )
+
+    fig.update_layout(height=height)
+    if reverse_x:
+        fig.update_layout(xaxis=dict(autorange="reversed"))
+
+    return fig
+
+
+def _density_figure(df: pd.DataFrame, x: str, y: str,
+                    weight: Optional[str] = None,
+                    hover_name: Optional[str] = None,
+                    title: Optional[str] = None,
+                    labels: Optional[Dict[str, str]] = None,
+                    bins: int = DENSITY_BINS,
+                    highlight: int = HIGHLIGHT_POINTS) -> go.Figure:
+    labels = labels or {}
+    x_values = df[x].to_numpy(dtype=float)
+    y_values = df[y].to_numpy(dtype=float)
+
+    # histogram2d no acepta NaN ni infinitos: esos puntos no se pueden ubicar en la grilla
+    finite = np.isfinite(x_values) & np.isfinite(y_values)
+    if not finite.all():
+        df = df[finite]
+        x_values, y_values = x_values[finite], y_values[finite]
+
+    # Con peso, cada celda suma la métrica de tamaño (clicks, impresiones) y no solo
+    # cuenta puntos, igual que el tamaño de los marcadores en el modo disperso
+    weights = np.nan_to_num(df[weight].to_numpy(dtype=float), nan=0.0, posinf=0.0, neginf=0.0) \
+        if weight else None
+    measure = labels.get(weight, weight) if weight else 'Keywords'
+
+    # La grilla se calcula en el servidor: al navegador solo viaja la matriz
+    counts, x_edges, y_edges = np.histogram2d(x_values, y_values, bins=bins, weights=weights)
+    x_centers = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centers = (y_edges[:-1] + y_edges[1:]) / 2
+
+    fig = go.Figure()
+    fig.add_trace(go.Heatmap(
+        x=np.round(x_centers, 4),
+        y=np.round(y_centers, 4),
+        z=counts.T,
+        colorscale='Blues',
+        zmin=0,
+        name='Densidad',
+        hovertemplate=f'%{{x}}, %{{y}}<br>{measure}: %{{z}}<extra></extra>',
+        colorbar=dict(title=measure if weight else 'Cantidad')
+    ))
+
+    # Encima de la densidad se dibujan los puntos con más peso
+    if highlight > 0:
+        if weight:
+            top = df.nlargest(highlight, weight)
+        else:
+            top = df.head(highlight)
+        fig.add_trace(go.Scattergl(
+            x=top[x],
+            y=top[y],
+            mode='markers',
+            name=labels.get(weight, weight) if weight else 'Top',
+            text=top[hover_name] if hover_name else None,
+            marker=dict(color='orange', size=6, line=dict(width=0.5, color='white'))
+        ))
+
+    fig.update_layout(
+        title=title,
+        xaxis_title=labels.get(x, x),
+        yaxis_title=labels.get(y, y),
+        showlegend=False
+    )
+    return fig
+
+
+def build_dual_axis(df: pd.DataFrame, x: str, y: str, y2: str,
+                    names: Optional[Dict[str, str]] = None,
+                    colors: Optional[Dict[str, str]] = None,
+                    mode: str = 'lines',
+                    title: Optional[str] = None,
+                    reverse_y2: bool = False,
+                    height: int = 400) -> go.Figure:
+    # Dos series sobre el mismo eje X, la segunda en un eje Y a la derecha
+    names = names or {}
+    colors = colors or {}
+
+    fig = go.Figure()
+    for column, axis in [(y, 'y'), (y2, 'y2')]:
+        fig.add_trace(go.Scatter(
+            x=df[x],
+            y=df[column],
+            mode=mode,
+            name=names.get(column, column),
+            line=dict(color=colors.get(column), width=2),
+            yaxis=axis
+        ))
+
+    yaxis2 = dict(title=names.get(y2, y2), overlaying='y', side='right')
+    if reverse_y2:
+        yaxis2['autorange'] = 'reversed'
+
+    fig.update_layout(
+        title=title,
+        yaxis=dict(title=names.get(y, y), side='left'),
+        yaxis2=yaxis2,
+        hovermode='x unified',
+        height=height
+    )
+    return fig
@@ -0,0 +1,258 @@
+import itertools
+import os
+import threading
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+from .cache import CacheBackend, get_cache
+from .comparison import aggregate_gsc
+from .sketches import hash_keys
+
+# Bandas x filas por banda del LSH: dos keywords son candidatas si coinciden en
+# todos los minhashes de alguna banda. Umbral de la curva ≈ (1/20)^(1/3) = 0.37
+LSH_BANDS = 20
+LSH_ROWS = 3
+MINHASH_PERMUTATIONS = LSH_BANDS * LSH_ROWS
+# Jaccard mínimo entre palabras para unir dos keywords ("flokzu bpm" ~ "flokzu bpm software")
+CLUSTER_THRESHOLD = float(os.getenv('DASHBOARD_CLUSTER_THRESHOLD', 0.6))
+# Palabras por keyword que se comparan al verificar candidatos
+MAX_QUERY_TOKENS = 10
+# Pares candidatos verificados por bloque (acota la memoria de la comparación)
+VERIFY_CHUNK = 100000
+# Vida del clusterer en la caché: las asignaciones se mantienen entre períodos
+CLUSTERER_TTL = 24 * 3600
+
+# Permutaciones fijas (a·x + b, a impar): las keywords de cargas distintas deben
+# tener firmas comparables
+_rng = np.random.default_rng(20240601)
+_MULTIPLIERS = _rng.integers(1, 2 ** 63, size=MINHASH_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_OFFSETS = _rng.integers(0, 2 ** 63, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_BAND_MIX = _rng.integers(1, 2 ** 63, size=LSH_ROWS + 1, dtype=np.uint64) | np.uint64(1)
+
+
+def tokenize(queries: pd.Series) -> pd.Series:
+    # Minúsculas y sin tildes: "gestión" y "gestion" son la misma palabra
+    text = queries.astype(str).str.lower().str.normalize('NFKD').str.replace('[\u0300-\u036f]', '', regex=True)
+    tokens = text.str.findall(r'\w+')
+    # Una keyword sin palabras (solo símbolos) se compara completa
+    empty = tokens.str.len() == 0
+    return tokens.where(~empty, text.map(lambda value: [value]))
+
+
+def _token_matrix(tokens: pd.Series) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    exploded = tokens.explode()
+    pairs = pd.DataFrame({
+        'row': np.repeat(np.arange(len(tokens)), tokens.str.len().to_numpy()),
+        'hash': hash_keys(exploded.to_numpy(dtype=object))
+    }).drop_duplicates()
+    rows = pairs['row'].to_numpy()
+    hashes = pairs['hash'].to_numpy(dtype=np.uint64)
+
+    # Matriz rellenada con 0 (palabras únicas por keyword) para verificar pares
+    position = pairs.groupby('row', sort=False).cumcount().to_numpy()
+    keep = position < MAX_QUERY_TOKENS
+    matrix = np.zeros((len(tokens), MAX_QUERY_TOKENS), dtype=np.uint64)
+    matrix[rows[keep], position[keep]] = hashes[keep]
+    lengths = np.bincount(rows[keep], minlength=len(tokens))
+    return rows, hashes, matrix, lengths
+
+
+def minhash(rows: np.ndarray, hashes: np.ndarray, n: int) -> np.ndarray:
+    # Firma (n, permutaciones): mínimo de cada permutación sobre las palabras de la fila.
+    # rows llega agrupado por fila, así reduceat recorre cada keyword en un solo paso
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    signatures = np.empty((n, MINHASH_PERMUTATIONS), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for k in range(MINHASH_PERMUTATIONS):
+            signatures[:, k] = np.minimum.reduceat(hashes * _MULTIPLIERS[k] + _OFFSETS[k], starts)
+    return signatures
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    # Una clave por (keyword, banda); la banda entra en el hash para no mezclar buckets
+    bands = signatures.reshape(len(signatures), LSH_BANDS, LSH_ROWS)
+    with np.errstate(over='ignore'):
+        keys = (bands * _BAND_MIX[:LSH_ROWS]).sum(axis=2, dtype=np.uint64)
+        keys += np.arange(LSH_BANDS, dtype=np.uint64) * _BAND_MIX[LSH_ROWS]
+    return keys
+
+
+def jaccard(matrix: np.ndarray, lengths: np.ndarray, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    # Jaccard exacto entre conjuntos de palabras de los pares candidatos
+    result = np.empty(len(left), dtype=np.float64)
+    for start in range(0, len(left), VERIFY_CHUNK):
+        a = matrix[left[start:start + VERIFY_CHUNK]]
+        b = matrix[right[start:start + VERIFY_CHUNK]]
+        shared = ((a[:, :, None] == b[:, None, :]) & (a[:, :, None] != 0)).sum(axis=(1, 2))
+        union = lengths[left[start:start + VERIFY_CHUNK]] + lengths[right[start:start + VERIFY_CHUNK]] - shared
+        result[start:start + VERIFY_CHUNK] = shared / np.maximum(union, 1)
+    return result
+
+
+def connected_components(n: int, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    # Union-find vectorizado: cada nodo apunta a la menor etiqueta de su componente
+    labels = np.arange(n)
+    while len(left):
+        left_labels, right_labels = labels[left], labels[right]
+        if np.array_equal(left_labels, right_labels):
+            break
+        lowest = np.minimum(left_labels, right_labels)
+        np.minimum.at(labels, left_labels, lowest)
+        np.minimum.at(labels, right_labels, lowest)
+        # Compresión de caminos hasta que cada nodo apunte a su raíz
+        while True:
+            parents = labels[labels]
+            if np.array_equal(parents, labels):
+                break
+            labels = parents
+    return labels
+
+
+class KeywordClusterer:
+    # Agrupa keywords casi duplicadas ("flokzu bpm", "bpm flokzu", "flokzu bpm software")
+    # con MinHash/LSH sobre sus palabras. Es incremental: las keywords ya vistas conservan
+    # su cluster y las nuevas se asignan contra los buckets existentes
+    def __init__(self, threshold: float = CLUSTER_THRESHOLD):
+        self.threshold = threshold
+        self.queries = pd.Index([], dtype=object)
+        self.labels = np.empty(0, dtype=np.int64)
+        self.matrix = np.empty((0, MAX_QUERY_TOKENS), dtype=np.uint64)
+        self.lengths = np.empty(0, dtype=np.int64)
+        # Clave de banda -> primera keyword que cayó en ese bucket
+        self.buckets = pd.Series([], dtype=np.int64, index=pd.Index([], dtype=np.uint64))
+        self.n_clusters = 0
+        self.merges = 0
+        # Identifica esta instancia: uno nuevo (tras desalojarse de la caché) etiqueta distinto
+        self.epoch = next(_epochs)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.queries)
+
+    @property
+    def generation(self) -> Tuple[int, int]:
+        # Cambia cuando una fusión reetiqueta keywords ya asignadas; las nuevas sin
+        # fusión no cambian las etiquetas anteriores
+        return self.epoch, self.merges
+
+    def assign(self, queries: Iterable[str]) -> np.ndarray:
+        queries = pd.Index(queries, dtype=object)
+        with self._lock:
+            new = queries.unique().difference(self.queries, sort=False)
+            if len(new):
+                self._add(new)
+            return self.labels[self.queries.get_indexer(queries)]
+
+    def _add(self, new: pd.Index):
+        offset = len(self.queries)
+        count = len(new)
+        rows, hashes, matrix, lengths = _token_matrix(tokenize(pd.Series(new.to_numpy(dtype=object))))
+        keys = band_keys(minhash(rows, hashes, count))
+
+        flat_keys = keys.ravel()
+        flat_rows = np.repeat(np.arange(count), LSH_BANDS)
+
+        # Candidatas contra keywords ya conocidas: el primer miembro de cada bucket
+        known = self.buckets.index.get_indexer(flat_keys)
+        hit = known >= 0
+        old_left = self.buckets.to_numpy()[known[hit]]
+        old_right = flat_rows[hit]
+
+        # Candidatas entre keywords nuevas: cada una con la primera de su bucket
+        # (factorize numera los buckets en orden de aparición: sin ordenar las claves)
+        codes, _ = pd.factorize(flat_keys)
+        first = codes > np.maximum.accumulate(np.r_[-1, codes[:-1]])
+        leaders = flat_rows[first][codes]
+        # Un par puede repetirse en varias bandas; se verifica una sola vez
+        pairs = np.unique(leaders[~first].astype(np.int64) * count + flat_rows[~first])
+        new_left, new_right = pairs // count, pairs % count
+
+        all_matrix = np.vstack([self.matrix, matrix])
+        all_lengths = np.concatenate([self.lengths, lengths])
+        old_ok = jaccard(all_matrix, all_lengths, old_left, old_right + offset) >= self.threshold
+        new_ok = jaccard(all_matrix, all_lengths, new_left + offset, new_right + offset) >= self.threshold
+
+        # Grafo sobre clusters existentes (0..C-1) y keywords nuevas (C..C+n-1)
+        clusters = self.n_clusters
+        components = connected_components(
+            clusters + count,
+            np.concatenate([self.labels[old_left[old_ok]], new_left[new_ok] + clusters]),
+            np.concatenate([old_right[old_ok] + clusters, new_right[new_ok] + clusters])
+        )
+
+        # Una keyword nueva que une dos clusters existentes los fusiona en el de menor id
+        remap = components[:clusters]
+        merged = int(np.count_nonzero(remap != np.arange(clusters)))
+        if merged:
+            self.labels = remap[self.labels]
+            self.merges += merged
+
+        # Componentes sin cluster previo reciben ids nuevos
+        assigned = components[clusters:]
+        fresh = assigned >= clusters
+        roots, codes = np.unique(assigned[fresh], return_inverse=True)
+        assigned = assigned.copy()
+        assigned[fresh] = clusters + codes
+        self.n_clusters = clusters + len(roots)
+
+        self.queries = self.queries.append(new)
+        self.labels = np.concatenate([self.labels, assigned])
+        self.matrix = all_matrix
+        self.lengths = all_lengths
+
+        bucket_rows = pd.Series(flat_rows + offset, index=pd.Index(flat_keys, dtype=np.uint64))
+        bucket_rows = bucket_rows[~bucket_rows.index.duplicated()]
+        bucket_rows = bucket_rows[~bucket_rows.index.isin(self.buckets.index)]
+        self.buckets = pd.concat([self.buckets, bucket_rows])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'queries': len(self.queries),
+                'clusters': int(len(np.unique(self.labels))),
+                'merges': self.merges
+            }
+
+
+def aggregate_clusters(df: pd.DataFrame) -> pd.DataFrame:
+    # df: una fila por keyword con columna 'cluster'. El nombre del cluster es su
+    # keyword con más clicks
+    grouped = aggregate_gsc(df, ['cluster'])
+    leaders = df.sort_values(['clicks', 'impressions'], ascending=False).drop_duplicates('cluster')
+    grouped['keyword'] = grouped['cluster'].map(leaders.set_index('cluster')['query'])
+    grouped['queries'] = grouped['cluster'].map(df['cluster'].value_counts())
+    return grouped[['cluster', 'keyword', 'queries', 'clicks', 'impressions', 'ctr', 'position']]
+
+
+_epochs = itertools.count()
+_clusterers_lock = threading.Lock()
+
+
+def get_clusterer(key: Hashable, cache: Optional[CacheBackend] = None) -> KeywordClusterer:
+    # Uno por propiedad y superficie, compartido entre períodos y sesiones. Vive en la
+    # caché para contar en su presupuesto de memoria: si se desaloja, el próximo empieza
+    # de cero con otra generación
+    store = cache if cache is not None else get_cache()
+    with _clusterers_lock:
+        found, clusterer = store.get(('clusterer', key))
+        if not found:
+            clusterer = KeywordClusterer()
+            store.set(('clusterer', key), clusterer, ttl=CLUSTERER_TTL)
+        return clusterer
+
+
+def assign_clusters(key: Hashable, queries: pd.Series,
+                    cache: Optional[CacheBackend] = None) -> Tuple[np.ndarray, KeywordClusterer]:
+    clusterer = get_clusterer(key, cache)
+    known = len(clusterer)
+    labels = clusterer.assign(queries)
+    # Creció: se vuelve a guardar para que la caché mida su tamaño actual (y lo
+    # desaloje si ya no entra en el presupuesto)
+    if len(clusterer) != known:
+        store = cache if cache is not None else get_cache()
+        with _clusterers_lock:
+            found, current = store.get(('clusterer', key))
+            if found and current is clusterer:
+                store.set(('clusterer', key), clusterer, ttl=CLUSTERER_TTL)
+    return labels, clusterer
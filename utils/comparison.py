@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+CURRENT = 'current'
+PREVIOUS = 'previous'
+
+GSC_METRICS = ['clicks', 'impressions', 'ctr', 'position']
+
+
+def union_range(current_start: str, current_end: str,
+                previous_start: str, previous_end: str) -> List[str]:
+    # Un solo rango que cubre ambos períodos (contiguos en el dashboard)
+    return [min(current_start, previous_start), max(current_end, previous_end)]
+
+
+def label_periods(df: pd.DataFrame, current_start: str, current_end: str,
+                  previous_start: str, previous_end: str,
+                  date_column: str = 'date') -> pd.DataFrame:
+    dates = df[date_column]
+    period = np.select(
+        [
+            (dates >= current_start) & (dates <= current_end),
+            (dates >= previous_start) & (dates <= previous_end)
+        ],
+        [CURRENT, PREVIOUS],
+        default=''
+    )
+    labeled = df.assign(period=period)
+    return labeled[labeled['period'] != '']
+
+
+def aggregate_gsc(df: pd.DataFrame, by: List[str]) -> pd.DataFrame:
+    # CTR = clicks / impresiones y posición ponderada por impresiones,
+    # no el promedio simple de las filas diarias
+    work = df.assign(_weighted_position=df['position'] * df['impressions'])
+    if by:
+        grouped = work.groupby(by, observed=True, sort=False).agg(
+            clicks=('clicks', 'sum'),
+            impressions=('impressions', 'sum'),
+            _weighted_position=('_weighted_position', 'sum')
+        ).reset_index()
+    else:
+        grouped = pd.DataFrame({
+            'clicks': [work['clicks'].sum()],
+            'impressions': [work['impressions'].sum()],
+            '_weighted_position': [work['_weighted_position'].sum()]
+        })
+
+    impressions = grouped['impressions'].replace(0, np.nan)
+    grouped['ctr'] = (grouped['clicks'] / impressions).fillna(0)
+    grouped['position'] = (grouped['_weighted_position'] / impressions).fillna(0)
+    return grouped.drop(columns='_weighted_position')
+
+
+def compare_frames(current: pd.DataFrame, previous: pd.DataFrame,
+                   keys: List[str], metrics: List[str]) -> pd.DataFrame:
+    if keys:
+        merged = current[keys + metrics].merge(
+            previous[keys + metrics], on=keys, how='outer',
+            suffixes=(f'_{CURRENT}', f'_{PREVIOUS}')
+        )
+    else:
+        merged = pd.concat([
+            current[metrics].add_suffix(f'_{CURRENT}').reset_index(drop=True),
+            previous[metrics].add_suffix(f'_{PREVIOUS}').reset_index(drop=True)
+        ], axis=1)
+
+    for metric in metrics:
+        cur = merged[f'{metric}_{CURRENT}'].fillna(0)
+        prev = merged[f'{metric}_{PREVIOUS}'].fillna(0)
+        merged[f'{metric}_{CURRENT}'] = cur
+        merged[f'{metric}_{PREVIOUS}'] = prev
+        merged[f'{metric}_change'] = cur - prev
+        merged[f'{metric}_change_pct'] = np.where(
+            prev > 0,
+            (cur - prev) / prev.where(prev > 0, 1) * 100,
+            np.where(cur > 0, 100.0, 0.0)
+        ).round(2)
+
+    return merged
+
+
+def compare_summaries(current_metrics: Dict, previous_metrics: Dict) -> Dict[str, Dict]:
+    comparison = {}
+    for metric in current_metrics:
+        current_val = current_metrics[metric]
+        previous_val = previous_metrics[metric]
+
+        if previous_val > 0:
+            change_pct = ((current_val - previous_val) / previous_val) * 100
+        else:
+            change_pct = 100 if current_val > 0 else 0
+
+        comparison[metric] = {
+            'current': current_val,
+            'previous': previous_val,
+            'change': current_val - previous_val,
+            'change_pct': round(change_pct, 2)
+        }
+
+    return comparison
+
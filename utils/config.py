@@ -0,0 +1,76 @@
+import base64
+import json
+import os
+from google.oauth2 import service_account
+from typing import Any, Dict, Mapping, Optional
+
+from .errors import ConfigurationError
+
+GSC_SCOPES = ['https://www.googleapis.com/auth/webmasters.readonly']
+GA4_SCOPES = ['https://www.googleapis.com/auth/analytics.readonly']
+
+
+def _service_account_info(values: Mapping, base64_key: str, section_key: str) -> Optional[Dict[str, Any]]:
+    # Mismo orden que los secrets: JSON en Base64 primero, luego la sección TOML
+    if values.get(base64_key):
+        try:
+            return json.loads(base64.b64decode(values[base64_key]).decode())
+        except (ValueError, TypeError) as e:
+            raise ConfigurationError(f"{base64_key} no es un JSON en Base64 válido: {str(e)}") from e
+    if values.get(section_key):
+        return dict(values[section_key])
+    return None
+
+
+def load_credentials(info: Optional[Dict[str, Any]], path: Optional[str], scopes) -> Optional[service_account.Credentials]:
+    try:
+        if info:
+            return service_account.Credentials.from_service_account_info(info, scopes=scopes)
+        if path and os.path.exists(path):
+            return service_account.Credentials.from_service_account_file(path, scopes=scopes)
+    except (ValueError, KeyError) as e:
+        raise ConfigurationError(f"Credenciales de cuenta de servicio inválidas: {str(e)}") from e
+    return None
+
+
+class ConnectorConfig:
+    # Configuración sin dependencias de Streamlit: se puede enviar a procesos worker
+    # y construir desde variables de entorno en jobs batch
+    def __init__(self, gsc_property_url: Optional[str] = None,
+                 gsc_credentials_info: Optional[Dict[str, Any]] = None,
+                 gsc_credentials_path: Optional[str] = None,
+                 ga4_property_id: Optional[str] = None,
+                 ga4_credentials_info: Optional[Dict[str, Any]] = None,
+                 ga4_credentials_path: Optional[str] = None):
+        self.gsc_property_url = gsc_property_url
+        self.gsc_credentials_info = gsc_credentials_info
+        self.gsc_credentials_path = gsc_credentials_path
+        self.ga4_property_id = ga4_property_id
+        self.ga4_credentials_info = ga4_credentials_info
+        self.ga4_credentials_path = ga4_credentials_path
+
+    @classmethod
+    def from_mapping(cls, values: Mapping, **overrides) -> 'ConnectorConfig':
+        config = cls(
+            gsc_property_url=values.get('GSC_PROPERTY_URL'),
+            gsc_credentials_info=_service_account_info(values, 'GSC_SERVICE_ACCOUNT_BASE64', 'gsc_service_account'),
+            gsc_credentials_path=values.get('GSC_SERVICE_ACCOUNT_FILE'),
+            ga4_property_id=values.get('GA4_PROPERTY_ID'),
+            ga4_credentials_info=_service_account_info(values, 'GA4_SERVICE_ACCOUNT_BASE64', 'ga4_service_account'),
+            ga4_credentials_path=values.get('GA4_SERVICE_ACCOUNT_FILE')
+        )
+        # Los parámetros explícitos tienen prioridad sobre secrets y entorno
+        for name, value in overrides.items():
+            if value is not None:
+                setattr(config, name, value)
+        return config
+
+    @classmethod
+    def from_env(cls, **overrides) -> 'ConnectorConfig':
+        return cls.from_mapping(os.environ, **overrides)
+
+    def gsc_credentials(self) -> Optional[service_account.Credentials]:
+        return load_credentials(self.gsc_credentials_info, self.gsc_credentials_path, GSC_SCOPES)
+
+    def ga4_credentials(self) -> Optional[service_account.Credentials]:
+        return load_credentials(self.ga4_credentials_info, self.ga4_credentials_path, GA4_SCOPES)
@@ -0,0 +1,57 @@
+from typing import Optional
+
+
+class ConnectorError(Exception):
+    # Base de los errores de los conectores; source es 'gsc' o 'ga4'
+    def __init__(self, message: str, source: Optional[str] = None, status: Optional[int] = None):
+        super().__init__(message)
+        self.source = source
+        self.status = status
+
+
+class ConfigurationError(ConnectorError):
+    pass
+
+
+class AuthenticationError(ConnectorError):
+    pass
+
+
+class PermissionDeniedError(ConnectorError):
+    pass
+
+
+class NotFoundError(ConnectorError):
+    pass
+
+
+class QuotaExceededError(ConnectorError):
+    pass
+
+
+class QueryError(ConnectorError):
+    pass
+
+
+_BY_STATUS = {
+    400: QueryError,
+    401: AuthenticationError,
+    403: PermissionDeniedError,
+    404: NotFoundError,
+    429: QuotaExceededError
+}
+
+
+def error_for_status(status: Optional[int], message: str, source: Optional[str] = None) -> ConnectorError:
+    return _BY_STATUS.get(status, ConnectorError)(message, source=source, status=status)
+
+
+def status_of(e: Exception) -> Optional[int]:
+    # HttpError (googleapiclient) trae resp.status; GoogleAPICallError (GA4) trae code
+    resp = getattr(e, 'resp', None)
+    if resp is not None and getattr(resp, 'status', None) is not None:
+        return int(resp.status)
+    code = getattr(e, 'code', None)
+    if isinstance(code, int):
+        return code
+    return None
@@ -0,0 +1,181 @@
+import os
+import threading
+import multiprocessing as mp
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+import pandas as pd
+import pyarrow as pa
+from typing import Any, Callable, Dict, List, Optional
+
+# Cantidad de procesos worker; 0 ejecuta todo en el hilo actual
+DEFAULT_WORKERS = int(os.getenv('DASHBOARD_WORKERS', max((os.cpu_count() or 2) // 2, 1)))
+# Por debajo de estas filas el costo de enviar datos a otro proceso no compensa
+MIN_ROWS = int(os.getenv('DASHBOARD_WORKER_MIN_ROWS', 50000))
+
+
+class SharedFrame:
+    # Referencia a un DataFrame serializado en Arrow IPC dentro de memoria compartida
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+
+
+def _write_table(table: pa.Table, sink):
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _read_frame(block: shared_memory.SharedMemory, size: int) -> pd.DataFrame:
+    # Una sola copia (memcpy) fuera del bloque: to_pandas puede devolver vistas
+    # sobre el buffer de Arrow y el bloque se cierra al terminar
+    view = block.buf[:size]
+    try:
+        data = pa.py_buffer(view.tobytes())
+    finally:
+        view.release()
+    return pa.ipc.open_stream(data).read_all().to_pandas()
+
+
+def _to_shared(df: pd.DataFrame) -> SharedFrame:
+    table = pa.Table.from_pandas(df)
+
+    # Primero se mide el tamaño y luego se escribe directo en el bloque compartido
+    mock = pa.MockOutputStream()
+    _write_table(table, mock)
+    size = mock.size()
+
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        _write_table(table, pa.FixedSizeBufferWriter(pa.py_buffer(block.buf)))
+    except Exception:
+        block.close()
+        block.unlink()
+        raise
+
+    block.close()
+    return SharedFrame(block.name, size)
+
+
+def _from_shared(shared: SharedFrame, unlink: bool) -> pd.DataFrame:
+    block = shared_memory.SharedMemory(name=shared.name)
+    try:
+        return _read_frame(block, shared.size)
+    finally:
+        block.close()
+        if unlink:
+            block.unlink()
+
+
+def _pack(value: Any) -> Any:
+    if isinstance(value, pd.DataFrame):
+        return _to_shared(value)
+    if isinstance(value, dict) and value and all(isinstance(v, pd.DataFrame) for v in value.values()):
+        return {k: _to_shared(v) for k, v in value.items()}
+    return value
+
+
+def _unpack(value: Any, unlink: bool) -> Any:
+    if isinstance(value, SharedFrame):
+        return _from_shared(value, unlink)
+    if isinstance(value, dict) and value and all(isinstance(v, SharedFrame) for v in value.values()):
+        return {k: _from_shared(v, unlink) for k, v in value.items()}
+    return value
+
+
+def _release(value: Any):
+    shared = [value] if isinstance(value, SharedFrame) else (
+        list(value.values()) if isinstance(value, dict) else []
+    )
+    for item in shared:
+        if isinstance(item, SharedFrame):
+            try:
+                block = shared_memory.SharedMemory(name=item.name)
+                block.close()
+                block.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _run_in_worker(fn: Callable, args: List[Any], kwargs: Dict[str, Any]) -> Any:
+    # Los bloques de entrada los libera el proceso principal
+    args = [_unpack(a, unlink=False) for a in args]
+    kwargs = {k: _unpack(v, unlink=False) for k, v in kwargs.items()}
+    return _pack(fn(*args, **kwargs))
+
+
+def _count_rows(values) -> int:
+    return sum(len(v) for v in values if isinstance(v, pd.DataFrame))
+
+
+class ExecutionBackend:
+    def __init__(self, max_workers: Optional[int] = None, min_rows: int = MIN_ROWS):
+        self.max_workers = DEFAULT_WORKERS if max_workers is None else max_workers
+        self.min_rows = min_rows
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: no se hace fork de los hilos del servidor de Streamlit
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=mp.get_context('spawn')
+                )
+            return self._pool
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        # fn debe ser una función de módulo (se envía por referencia)
+        rows = _count_rows(args) + _count_rows(kwargs.values())
+
+        if self.max_workers == 0 or rows < self.min_rows:
+            future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        packed_args = [_pack(a) for a in args]
+        packed_kwargs = {k: _pack(v) for k, v in kwargs.items()}
+        inputs = packed_args + list(packed_kwargs.values())
+
+        result = Future()
+
+        def on_done(worker_future: Future):
+            for item in inputs:
+                _release(item)
+            try:
+                result.set_result(_unpack(worker_future.result(), unlink=True))
+            except Exception as e:
+                result.set_exception(e)
+
+        try:
+            self._get_pool().submit(_run_in_worker, fn, packed_args, packed_kwargs).add_done_callback(on_done)
+        except Exception:
+            for item in inputs:
+                _release(item)
+            raise
+
+        return result
+
+    def run(self, fn: Callable, *args, **kwargs) -> Any:
+        return self.submit(fn, *args, **kwargs).result()
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> ExecutionBackend:
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = ExecutionBackend()
+        return _backend
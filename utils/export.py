@@ -0,0 +1,114 @@
+import io
+import json
+import os
+import tempfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from typing import Any, Dict, List, Optional
+
+EXPORT_FORMATS = ('arrow', 'parquet')
+
+_SUFFIXES = {
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+    '.parquet': 'parquet',
+    '.pq': 'parquet'
+}
+
+# Clave de metadatos del esquema con el origen y los parámetros de la consulta
+METADATA_KEY = b'dashboard.query'
+
+
+def _resolve_format(path: str, format: Optional[str]) -> str:
+    if format is None:
+        format = _SUFFIXES.get(os.path.splitext(path)[1].lower())
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportación no soportado: {format}")
+    return format
+
+
+def to_arrow(df: pd.DataFrame, metadata: Optional[Dict[str, Any]] = None) -> pa.Table:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    # Las dimensiones (query, page, país...) se repiten mucho: se guardan como diccionario
+    columns = [
+        column.dictionary_encode() if pa.types.is_string(column.type) or pa.types.is_large_string(column.type)
+        else column
+        for column in table.columns
+    ]
+    table = pa.Table.from_arrays(columns, names=table.column_names)
+
+    if metadata:
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            METADATA_KEY: json.dumps(metadata, default=str).encode()
+        })
+    return table
+
+
+def _write_table(table: pa.Table, sink, format: str):
+    if format == 'parquet':
+        pq.write_table(table, sink, use_dictionary=True, compression='zstd')
+    else:
+        # Formato de archivo IPC (no stream) para poder leerlo con memory map
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def write_dataset(df: pd.DataFrame, path: str, format: Optional[str] = None,
+                  metadata: Optional[Dict[str, Any]] = None) -> str:
+    format = _resolve_format(path, format)
+    table = to_arrow(df, metadata)
+
+    # Se escribe en un temporal y se renombra: un lector nunca ve un archivo a medias
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    try:
+        _write_table(table, tmp_path, format)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+def export_bytes(df: pd.DataFrame, format: str = 'parquet',
+                 metadata: Optional[Dict[str, Any]] = None) -> bytes:
+    format = _resolve_format('', format)
+    sink = io.BytesIO()
+    _write_table(to_arrow(df, metadata), sink, format)
+    return sink.getvalue()
+
+
+def read_dataset(path: str, columns: Optional[List[str]] = None,
+                 format: Optional[str] = None) -> pa.Table:
+    format = _resolve_format(path, format)
+
+    if format == 'parquet':
+        return pq.read_table(path, columns=columns, memory_map=True)
+
+    # Los buffers de la tabla apuntan al archivo mapeado: no se copia a memoria
+    source = pa.memory_map(path, 'r')
+    table = ipc.open_file(source).read_all()
+    return table.select(columns) if columns else table
+
+
+def read_frame(path: str, columns: Optional[List[str]] = None,
+               format: Optional[str] = None) -> pd.DataFrame:
+    # Los diccionarios de Arrow se convierten en columnas categóricas de pandas
+    return read_dataset(path, columns=columns, format=format).to_pandas()
+
+
+def read_metadata(path: str, format: Optional[str] = None) -> Dict[str, Any]:
+    format = _resolve_format(path, format)
+    if format == 'parquet':
+        schema = pq.read_schema(path, memory_map=True)
+    else:
+        schema = ipc.open_file(pa.memory_map(path, 'r')).schema
+    raw = (schema.metadata or {}).get(METADATA_KEY)
+    return json.loads(raw) if raw else {}
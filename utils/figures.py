@@ -0,0 +1,49 @@
+import json
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+from typing import Any, Callable, Dict, Optional
+
+from .cache import CacheBackend, content_hash, dataset_token, get_cache, _freeze
+
+
+def figure_key(df: pd.DataFrame, builder: Callable, params: Dict[str, Any]) -> tuple:
+    # Los resultados compartidos de los conectores se identifican por su token;
+    # cualquier otro frame (head, merge, pivot) por el hash de su contenido
+    token = dataset_token(df)
+    data_key = ('token', token) if token is not None else ('hash', content_hash(df))
+    return ('figure', builder.__module__, builder.__qualname__, data_key, _freeze(params))
+
+
+class FigureSpec:
+    # Figura ya serializada: el JSON llega tal cual al frontend (render_figure)
+    def __init__(self, spec: str, height: Optional[int] = None):
+        self.spec = spec
+        self.height = height
+
+    def figure(self) -> go.Figure:
+        # Solo para quien necesite editarla: el JSON salió de una figura ya validada
+        return go.Figure(json.loads(self.spec), _validate=False)
+
+
+def cached_figure(df: pd.DataFrame, builder: Callable,
+                  layout: Optional[Dict[str, Any]] = None,
+                  traces: Optional[Dict[str, Any]] = None,
+                  cache: Optional[CacheBackend] = None,
+                  **params) -> FigureSpec:
+    # builder: función de plotly express (px.bar, px.pie...) o un helper de charts
+    # con la forma builder(df, **params)
+    key = figure_key(df, builder, dict(params, _layout=layout, _traces=traces))
+    store = cache if cache is not None else get_cache()
+
+    found, spec = store.get(key)
+    if not found:
+        fig = builder(df, **params)
+        if traces:
+            fig.update_traces(**traces)
+        if layout:
+            fig.update_layout(**layout)
+        spec = FigureSpec(pio.to_json(fig, validate=False), fig.layout.height)
+        store.set(key, spec)
+
+    return spec
@@ -0,0 +1,235 @@
+import re
+import numpy as np
+import pandas as pd
+from typing import Optional, Dict, List, Any
+
+# Dimensiones que la API de GSC acepta en dimensionFilterGroups
+PUSHDOWN_DIMENSIONS = ['query', 'page', 'country', 'device', 'searchAppearance']
+
+# Operadores locales -> operadores de la API
+API_OPERATORS = {
+    'equals': 'equals',
+    'not_equals': 'notEquals',
+    'contains': 'contains',
+    'not_contains': 'notContains',
+    'regex': 'includingRegex',
+    'not_regex': 'excludingRegex'
+}
+
+
+class Expression:
+    def __and__(self, other: 'Expression') -> 'Expression':
+        return And([self, other])
+
+    def __or__(self, other: 'Expression') -> 'Expression':
+        return Or([self, other])
+
+
+class Condition(Expression):
+    def __init__(self, field: str, operator: str, value: Any):
+        self.field = field
+        self.operator = operator
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f"Condition({self.field!r}, {self.operator!r}, {self.value!r})"
+
+
+class And(Expression):
+    def __init__(self, parts: List[Expression]):
+        # Se aplanan los AND anidados
+        self.parts = []
+        for part in parts:
+            self.parts.extend(part.parts if isinstance(part, And) else [part])
+
+    def __repr__(self) -> str:
+        return f"And({self.parts!r})"
+
+
+class Or(Expression):
+    def __init__(self, parts: List[Expression]):
+        self.parts = []
+        for part in parts:
+            self.parts.extend(part.parts if isinstance(part, Or) else [part])
+
+    def __repr__(self) -> str:
+        return f"Or({self.parts!r})"
+
+
+class Field:
+    def __init__(self, name: str):
+        self.name = name
+
+    def equals(self, value: str) -> Condition:
+        return Condition(self.name, 'equals', value)
+
+    def not_equals(self, value: str) -> Condition:
+        return Condition(self.name, 'not_equals', value)
+
+    def contains(self, value: str) -> Condition:
+        return Condition(self.name, 'contains', value)
+
+    def not_contains(self, value: str) -> Condition:
+        return Condition(self.name, 'not_contains', value)
+
+    def regex(self, pattern: str) -> Condition:
+        return Condition(self.name, 'regex', pattern)
+
+    def not_regex(self, pattern: str) -> Condition:
+        return Condition(self.name, 'not_regex', pattern)
+
+    def isin(self, values: List[str]) -> Condition:
+        return Condition(self.name, 'isin', list(values))
+
+    def __gt__(self, value: float) -> Condition:
+        return Condition(self.name, 'gt', value)
+
+    def __ge__(self, value: float) -> Condition:
+        return Condition(self.name, 'ge', value)
+
+    def __lt__(self, value: float) -> Condition:
+        return Condition(self.name, 'lt', value)
+
+    def __le__(self, value: float) -> Condition:
+        return Condition(self.name, 'le', value)
+
+
+def field(name: str) -> Field:
+    return Field(name)
+
+
+class FilterPlan:
+    def __init__(self, groups: List[Dict], residual: Optional[Expression]):
+        # groups: lo que se envía a la API; residual: lo que se evalúa en pandas
+        self.groups = groups
+        self.residual = residual
+
+    def __repr__(self) -> str:
+        return f"FilterPlan(groups={self.groups!r}, residual={self.residual!r})"
+
+
+def _as_regex(condition: Condition) -> Optional[str]:
+    if condition.operator == 'equals':
+        return '^' + re.escape(condition.value) + '$'
+    if condition.operator == 'contains':
+        # contains no distingue mayúsculas en la API; el regex sí (salvo con (?i:...))
+        return '(?i:' + re.escape(condition.value) + ')'
+    if condition.operator == 'regex':
+        return f"(?:{condition.value})"
+    if condition.operator == 'isin':
+        return '^(?:' + '|'.join(re.escape(v) for v in condition.value) + ')$'
+    return None
+
+
+def _pushdown(expression: Expression) -> Optional[Dict]:
+    if isinstance(expression, Condition):
+        if expression.field not in PUSHDOWN_DIMENSIONS:
+            return None
+        if expression.operator in API_OPERATORS:
+            return {
+                'dimension': expression.field,
+                'operator': API_OPERATORS[expression.operator],
+                'expression': expression.value
+            }
+        if expression.operator == 'isin':
+            return {
+                'dimension': expression.field,
+                'operator': 'includingRegex',
+                'expression': _as_regex(expression)
+            }
+        return None
+
+    # Un OR sobre una misma dimensión se convierte en una alternancia de regex
+    if isinstance(expression, Or):
+        if not all(isinstance(p, Condition) for p in expression.parts):
+            return None
+        fields = {p.field for p in expression.parts}
+        if len(fields) != 1 or not fields <= set(PUSHDOWN_DIMENSIONS):
+            return None
+        patterns = [_as_regex(p) for p in expression.parts]
+        if any(p is None for p in patterns):
+            return None
+        return {
+            'dimension': fields.pop(),
+            'operator': 'includingRegex',
+            'expression': '|'.join(patterns)
+        }
+
+    return None
+
+
+def plan_filters(expression: Optional[Expression]) -> FilterPlan:
+    if expression is None:
+        return FilterPlan([], None)
+
+    parts = expression.parts if isinstance(expression, And) else [expression]
+
+    pushed = {}
+    residual = []
+    for part in parts:
+        api_filter = _pushdown(part)
+        if api_filter:
+            pushed.setdefault(api_filter['dimension'], []).append(api_filter)
+        else:
+            residual.append(part)
+
+    # Un grupo por dimensión (country, device, page, ...); la API combina los grupos con AND
+    groups = [{'groupType': 'and', 'filters': filters} for filters in pushed.values()]
+
+    if not residual:
+        return FilterPlan(groups, None)
+    return FilterPlan(groups, residual[0] if len(residual) == 1 else And(residual))
+
+
+def referenced_fields(expression: Optional[Expression]) -> List[str]:
+    if expression is None:
+        return []
+    if isinstance(expression, Condition):
+        return [expression.field]
+    fields = []
+    for part in expression.parts:
+        fields.extend(f for f in referenced_fields(part) if f not in fields)
+    return fields
+
+
+def evaluate(expression: Expression, df: pd.DataFrame) -> np.ndarray:
+    if isinstance(expression, And):
+        mask = np.ones(len(df), dtype=bool)
+        for part in expression.parts:
+            mask &= evaluate(part, df)
+        return mask
+
+    if isinstance(expression, Or):
+        mask = np.zeros(len(df), dtype=bool)
+        for part in expression.parts:
+            mask |= evaluate(part, df)
+        return mask
+
+    values = df[expression.field]
+    op = expression.operator
+    if op == 'equals':
+        result = values == expression.value
+    elif op == 'not_equals':
+        result = values != expression.value
+    elif op == 'contains':
+        result = values.str.contains(expression.value, case=False, regex=False)
+    elif op == 'not_contains':
+        result = ~values.str.contains(expression.value, case=False, regex=False)
+    elif op == 'regex':
+        result = values.str.contains(expression.value, regex=True)
+    elif op == 'not_regex':
+        result = ~values.str.contains(expression.value, regex=True)
+    elif op == 'isin':
+        result = values.isin(expression.value)
+    elif op == 'gt':
+        result = values > expression.value
+    elif op == 'ge':
+        result = values >= expression.value
+    elif op == 'lt':
+        result = values < expression.value
+    elif op == 'le':
+        result = values <= expression.value
+    else:
+        raise ValueError(f"Operador no soportado: {op}")
+
+    return result.to_numpy(dtype=bool)
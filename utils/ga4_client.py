@@ -0,0 +1,760 @@
+import math
+import pandas as pd
+from google.analytics.data_v1beta import BetaAnalyticsDataClient
+from google.analytics.data_v1beta.types import (
+    DateRange,
+    Dimension,
+    Metric,
+    MetricAggregation,
+    OrderBy,
+    Pivot,
+    RunPivotReportRequest,
+    RunRealtimeReportRequest,
+    RunReportRequest,
+    FilterExpression,
+    Filter
+)
+from datetime import date, timedelta
+from typing import Optional, Dict, List, Any, Iterator
+
+from .config import ConnectorConfig
+from .errors import ConfigurationError, ConnectorError, QuotaExceededError, error_for_status, status_of
+from .comparison import CURRENT, PREVIOUS, union_range, compare_frames, compare_summaries
+from .path_tree import PathRollupTree
+from .cache import CacheBackend, Uncached, cached
+from .pagination import PageStream, rechunk
+from .export import write_dataset
+from .views import sorted_view, stripped_view
+from .scheduler import checkpoint
+from .admission import CostEstimate, get_admission, days_between, LARGE_PULL_TOKENS
+from .live import LivePoller, get_poller, LIVE_BUFFER_HOURS
+
+# Máximo de filas por página que acepta run_report
+API_PAGE_SIZE = 250000
+
+# Cubo de tráfico: cada pivot aporta una dimensión y su límite de filas
+# (los valores con más sesiones; device y canal no llegan a su límite)
+TRAFFIC_CUBE_PIVOTS = {
+    'deviceCategory': 10,
+    'sessionDefaultChannelGroup': 25,
+    'country': 30
+}
+# Límite de filas de una dimensión que no está en el cubo
+DEFAULT_PIVOT_LIMIT = 50
+
+# Métricas que alimentan las tarjetas de KPI
+SUMMARY_METRICS = ['sessions', 'totalUsers', 'newUsers', 'bounceRate',
+                   'averageSessionDuration', 'screenPageViews']
+
+# Métricas aditivas de la vista en vivo (por hora, datos intradía)
+LIVE_METRICS = ['sessions', 'screenPageViews', 'activeUsers']
+
+class GA4Client:
+    # Núcleo sin Streamlit: el cliente gRPC de GA4 se puede compartir entre hilos.
+    # Los errores se levantan como ConnectorError; el adaptador decide cómo mostrarlos
+    def __init__(self, config: ConnectorConfig, cache: Optional[CacheBackend] = None):
+        self.config = config
+        self.property_id = config.ga4_property_id
+        self.cache = cache
+        self.client = self._build_client(config.ga4_credentials())
+        # Los tokens de GA4 son por propiedad: el controlador se comparte entre sesiones
+        self.admission = get_admission('ga4', self.property_id)
+    
+    def _build_client(self, credentials) -> Optional[BetaAnalyticsDataClient]:
+        if credentials is None:
+            return None
+        try:
+            return BetaAnalyticsDataClient(credentials=credentials)
+        except Exception as e:
+            raise ConfigurationError(f"No se pudo crear el cliente de GA4: {str(e)}", source='ga4') from e
+    
+    def handle_error(self, error: ConnectorError):
+        raise error
+    
+    @property
+    def cache_namespace(self) -> str:
+        return str(self.property_id)
+    
+    @cached(ttl=3600)
+    def run_report(_self, start_date: str, end_date: str,
+                  dimensions: List[str], metrics: List[str],
+                  _dimension_filter: Optional[FilterExpression] = None,
+                  limit: int = 10000) -> pd.DataFrame:
+        
+        stream = _self.iter_report(
+            start_date, end_date,
+            dimensions=dimensions,
+            metrics=metrics,
+            _dimension_filter=_dimension_filter,
+            limit=limit
+        )
+        batches = list(stream)
+        
+        # Un error a mitad de la paginación no deja un resultado parcial en caché
+        if stream.error is not None:
+            return Uncached(pd.DataFrame())
+        
+        if not batches:
+            return pd.DataFrame()
+        
+        df = pd.concat(batches, ignore_index=True)
+        
+        if _dimension_filter is None:
+            _self.admission.model.observe_rows(
+                dimensions, days_between(start_date, end_date), len(df), truncated=len(df) >= limit
+            )
+        
+        return df
+    
+    def _estimate(self, start_date: str, end_date: str,
+                  dimensions: List[str], metrics: List[str], limit: int = 10000) -> CostEstimate:
+        model = self.admission.model
+        rows, rows_observed = model.expected_rows(dimensions, days_between(start_date, end_date), limit)
+        tokens, tokens_observed = model.expected_tokens(dimensions, metrics, rows)
+        return CostEstimate(
+            'ga4', rows, max(math.ceil(rows / API_PAGE_SIZE), 1), tokens,
+            observed=rows_observed and tokens_observed,
+            expensive=tokens > LARGE_PULL_TOKENS
+        )
+    
+    def estimate_report(self, start_date: str, end_date: str,
+                        dimensions: List[str], metrics: List[str],
+                        _dimension_filter: Optional[FilterExpression] = None,
+                        limit: int = 10000) -> CostEstimate:
+        # Costo estimado de run_report con los mismos argumentos, sin llamar a la API
+        estimate = self._estimate(start_date, end_date, dimensions, metrics, limit)
+        estimate.cached = GA4Client.run_report.is_cached(
+            self, start_date, end_date, dimensions, metrics,
+            _dimension_filter=_dimension_filter, limit=limit
+        )
+        return estimate
+    
+    def _observe_quota(self, response, dimensions: List[str], metrics: List[str]):
+        # GA4 devuelve el consumo real de tokens cuando se pide return_property_quota
+        if 'property_quota' not in response:
+            return
+        quota = response.property_quota
+        model = self.admission.model
+        model.observe_quota(quota.tokens_per_hour.remaining, quota.tokens_per_day.remaining)
+        model.observe_tokens(dimensions, metrics, len(response.rows), quota.tokens_per_hour.consumed)
+    
+    def iter_report(self, start_date: str, end_date: str,
+                    dimensions: List[str], metrics: List[str],
+                    _dimension_filter: Optional[FilterExpression] = None,
+                    limit: int = 10000,
+                    batch_size: int = API_PAGE_SIZE) -> PageStream:
+        # Al terminar de recorrerlo, stream.error / stream.truncated indican si está completo
+        return PageStream(lambda stream: self._report_pages(
+            stream, start_date, end_date, dimensions, metrics, _dimension_filter, limit, batch_size
+        ))
+    
+    def iter_comparison_report(self, current_start: str, current_end: str,
+                               previous_start: str, previous_end: str,
+                               dimensions: List[str], metrics: List[str],
+                               _dimension_filter: Optional[FilterExpression] = None,
+                               limit: int = 10000,
+                               batch_size: int = API_PAGE_SIZE) -> PageStream:
+        # Ambos períodos en un solo reporte; GA4 agrega la dimensión dateRange
+        date_ranges = [
+            DateRange(start_date=current_start, end_date=current_end, name=CURRENT),
+            DateRange(start_date=previous_start, end_date=previous_end, name=PREVIOUS)
+        ]
+        start_date, end_date = union_range(current_start, current_end, previous_start, previous_end)
+        return PageStream(lambda stream: self._report_pages(
+            stream, start_date, end_date, dimensions, metrics, _dimension_filter, limit, batch_size,
+            date_ranges=date_ranges
+        ))
+    
+    def _report_pages(self, stream: PageStream, start_date: str, end_date: str,
+                      dimensions: List[str], metrics: List[str],
+                      _dimension_filter: Optional[FilterExpression],
+                      limit: int, batch_size: int,
+                      date_ranges: Optional[List[DateRange]] = None) -> Iterator[pd.DataFrame]:
+        
+        if not self.client or not self.property_id:
+            return
+        
+        dimension_objects = [Dimension(name=d) for d in dimensions]
+        metric_objects = [Metric(name=m) for m in metrics]
+        # Con varios rangos la respuesta trae dateRange como última dimensión
+        if date_ranges is None:
+            date_ranges = [DateRange(start_date=start_date, end_date=end_date)]
+        columns = dimensions + ['dateRange'] if len(date_ranges) > 1 else dimensions
+        
+        # Se rechaza antes de gastar tokens si la cuota horaria no alcanza
+        estimate = self._estimate(start_date, end_date, columns, metrics, limit)
+        try:
+            self.admission.admit(estimate)
+        except QuotaExceededError as e:
+            stream.error = e
+            self.handle_error(e)
+            return
+        
+        fetched = 0
+        while fetched < limit:
+            checkpoint()
+            # Siempre páginas completas; batch_size solo reparte el resultado en lotes
+            page_size = min(API_PAGE_SIZE, limit - fetched)
+            
+            try:
+                request = RunReportRequest(
+                    property=f"properties/{self.property_id}",
+                    dimensions=dimension_objects,
+                    metrics=metric_objects,
+                    date_ranges=date_ranges,
+                    limit=page_size,
+                    offset=fetched,
+                    return_property_quota=True
+                )
+            
+                if _dimension_filter:
+                    request.dimension_filter = _dimension_filter
+            
+                # Las consultas pesadas esperan turno solo durante la llamada a la API
+                with self.admission.slot(estimate):
+                    response = self.client.run_report(request)
+            except QuotaExceededError as e:
+                stream.error = e
+                self.handle_error(e)
+                return
+            except Exception as e:
+                stream.error = self._as_connector_error(e)
+                self.handle_error(stream.error)
+                return
+            
+            if not response.rows:
+                return
+            
+            self._observe_quota(response, columns, metrics)
+            yield from rechunk(_rows_to_frame(response.rows, columns, metrics), batch_size)
+            
+            fetched += len(response.rows)
+            # row_count es el total del reporte: se corta sin pedir una página vacía
+            if fetched >= response.row_count or len(response.rows) < page_size:
+                return
+        
+        # Se alcanzó limit y el reporte tiene más filas
+        stream.truncated = True
+    
+    @cached(ttl=3600)
+    def run_pivot_report(_self, start_date: str, end_date: str,
+                         pivots: Dict[str, int], metrics: List[str],
+                         _dimension_filter: Optional[FilterExpression] = None) -> pd.DataFrame:
+        
+        if not _self.client or not _self.property_id:
+            return pd.DataFrame()
+        
+        checkpoint()
+        try:
+            # Un pivot por dimensión: la respuesta trae el producto cruzado en una sola llamada
+            request = RunPivotReportRequest(
+                property=f"properties/{_self.property_id}",
+                dimensions=[Dimension(name=d) for d in pivots],
+                metrics=[Metric(name=m) for m in metrics],
+                date_ranges=[DateRange(start_date=start_date, end_date=end_date)],
+                # Orden por la primera métrica: el límite conserva los valores con más volumen
+                pivots=[
+                    Pivot(
+                        field_names=[d], limit=limit,
+                        order_bys=[OrderBy(metric=OrderBy.MetricOrderBy(metric_name=metrics[0]), desc=True)]
+                    )
+                    for d, limit in pivots.items()
+                ],
+                return_property_quota=True
+            )
+            
+            if _dimension_filter:
+                request.dimension_filter = _dimension_filter
+            
+            response = _self.client.run_pivot_report(request)
+            _self._observe_quota(response, list(pivots), metrics)
+            
+            return decode_pivot_response(response)
+            
+        except Exception as e:
+            _self._report_error(e)
+            return pd.DataFrame()
+    
+    @cached(ttl=3600)
+    def run_totals_report(_self, start_date: str, end_date: str,
+                          metrics: List[str],
+                          _dimension_filter: Optional[FilterExpression] = None) -> pd.DataFrame:
+        
+        if not _self.client or not _self.property_id:
+            return pd.DataFrame()
+        
+        checkpoint()
+        try:
+            # Sin dimensiones: GA4 calcula los totales del rango (usuarios únicos,
+            # tasas ponderadas) y la respuesta es una sola fila
+            request = RunReportRequest(
+                property=f"properties/{_self.property_id}",
+                metrics=[Metric(name=m) for m in metrics],
+                date_ranges=[DateRange(start_date=start_date, end_date=end_date)],
+                metric_aggregations=[MetricAggregation.TOTAL],
+                return_property_quota=True
+            )
+            
+            if _dimension_filter:
+                request.dimension_filter = _dimension_filter
+            
+            response = _self.client.run_report(request)
+            _self._observe_quota(response, [], metrics)
+            
+            if response.totals:
+                totals_row = response.totals[0]
+            elif response.rows:
+                totals_row = response.rows[0]
+            else:
+                return pd.DataFrame()
+            
+            return pd.DataFrame([{
+                metrics[i]: float(metric_value.value) if metric_value.value else 0
+                for i, metric_value in enumerate(totals_row.metric_values)
+            }])
+            
+        except Exception as e:
+            _self._report_error(e)
+            return pd.DataFrame()
+    
+    @cached(ttl=3600)
+    def run_comparison_report(_self, current_start: str, current_end: str,
+                              previous_start: str, previous_end: str,
+                              dimensions: List[str], metrics: List[str],
+                              _dimension_filter: Optional[FilterExpression] = None,
+                              limit: int = 10000) -> pd.DataFrame:
+        
+        stream = _self.iter_comparison_report(
+            current_start, current_end, previous_start, previous_end,
+            dimensions=dimensions,
+            metrics=metrics,
+            _dimension_filter=_dimension_filter,
+            limit=limit
+        )
+        batches = list(stream)
+        
+        # Un error a mitad de la paginación no deja un resultado parcial en caché
+        if stream.error is not None:
+            return Uncached(pd.DataFrame())
+        
+        if not batches:
+            return pd.DataFrame()
+        
+        df = pd.concat(batches, ignore_index=True).rename(columns={'dateRange': 'period'})
+        # Con el corte por limit faltan filas de alguno de los períodos
+        df.attrs['truncated'] = stream.truncated
+        return df
+    
+    def export_report(self, path: str, start_date: str, end_date: str,
+                      dimensions: List[str], metrics: List[str],
+                      _dimension_filter: Optional[FilterExpression] = None,
+                      limit: int = 10000,
+                      format: Optional[str] = None) -> Optional[str]:
+        # Reutiliza el resultado en caché del dashboard; no vuelve a consultar la API
+        df = self.run_report(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=dimensions,
+            metrics=metrics,
+            _dimension_filter=_dimension_filter,
+            limit=limit
+        )
+        
+        if df.empty:
+            return None
+        
+        return write_dataset(df, path, format=format, metadata={
+            'source': 'ga4',
+            'property': self.property_id,
+            'start_date': start_date,
+            'end_date': end_date,
+            'dimensions': dimensions,
+            'metrics': metrics,
+            'filtered': _dimension_filter is not None
+        })
+    
+    def _report_error(self, e: Exception):
+        self.handle_error(self._as_connector_error(e))
+    
+    def _as_connector_error(self, e: Exception) -> ConnectorError:
+        status = status_of(e)
+        error_msg = f"Error al obtener datos de GA4: {str(e)}"
+        if status == 403 or "403" in str(e):
+            status = 403
+            error_msg += "\n\n🔍 **Posibles soluciones:**\n"
+            error_msg += "1. Verificar que la cuenta de servicio tenga permisos en GA4\n"
+            error_msg += "2. Confirmar que GA4_PROPERTY_ID sea correcto\n"
+            error_msg += "3. Verificar que la propiedad GA4 tenga datos"
+        elif status == 404 or "404" in str(e):
+            status = 404
+            error_msg += f"\n\n❌ Property ID '{self.property_id}' no encontrado"
+        
+        return error_for_status(status, error_msg, source='ga4')
+    
+    def get_hourly_report(self, since: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        # Datos intradía por hora (zona horaria de la propiedad) desde el watermark, sin caché
+        today = date.today()
+        start = since.date() if since is not None else today - timedelta(days=1)
+        
+        stream = self.iter_report(
+            start.isoformat(), today.isoformat(),
+            dimensions=['dateHour'],
+            metrics=LIVE_METRICS,
+            limit=LIVE_BUFFER_HOURS
+        )
+        batches = list(stream)
+        
+        # Con un error a mitad de camino no se entregan horas sueltas al buffer
+        if not batches or stream.error is not None:
+            return pd.DataFrame(columns=['hour'] + LIVE_METRICS)
+        
+        df = pd.concat(batches, ignore_index=True)
+        df.insert(0, 'hour', pd.to_datetime(df.pop('dateHour'), format='%Y%m%d%H'))
+        return df[df['hour'] >= since] if since is not None else df
+    
+    @property
+    def live(self) -> LivePoller:
+        return get_poller(('ga4', self.cache_namespace), self.get_hourly_report, LIVE_METRICS)
+    
+    @cached(ttl=60)
+    def get_realtime_users(_self) -> Optional[int]:
+        # Usuarios activos en los últimos 30 minutos (API de tiempo real)
+        if not _self.client or not _self.property_id:
+            return None
+        
+        checkpoint()
+        try:
+            response = _self.client.run_realtime_report(RunRealtimeReportRequest(
+                property=f"properties/{_self.property_id}",
+                metrics=[Metric(name='activeUsers')],
+                return_property_quota=True
+            ))
+            _self._observe_quota(response, [], ['activeUsers'])
+            
+            if not response.rows:
+                return 0
+            return int(response.rows[0].metric_values[0].value or 0)
+            
+        except Exception as e:
+            _self._report_error(e)
+            return None
+    
+    def get_traffic_cube(self, start_date: str, end_date: str) -> pd.DataFrame:
+        return self.run_pivot_report(
+            start_date=start_date,
+            end_date=end_date,
+            pivots=TRAFFIC_CUBE_PIVOTS,
+            metrics=['sessions', 'screenPageViews']
+        )
+    
+    def get_cross_tab(self, start_date: str, end_date: str,
+                      rows: str, columns: str, metric: str = 'sessions') -> pd.DataFrame:
+        # Cada cruce pide solo sus dos dimensiones: como marginal del cubo perdería las
+        # sesiones de los valores que el límite de la tercera dimensión deja afuera
+        cube = self.run_pivot_report(
+            start_date=start_date,
+            end_date=end_date,
+            pivots={
+                dimension: TRAFFIC_CUBE_PIVOTS.get(dimension, DEFAULT_PIVOT_LIMIT)
+                for dimension in (rows, columns)
+            },
+            metrics=[metric]
+        )
+        
+        if cube.empty:
+            return pd.DataFrame()
+        
+        return expand_pivot(cube, rows, columns, metric)
+    
+    def get_organic_traffic(self, start_date: str, end_date: str) -> pd.DataFrame:
+        organic_filter = FilterExpression(
+            filter=Filter(
+                field_name="sessionDefaultChannelGroup",
+                string_filter=Filter.StringFilter(value="Organic Search")
+            )
+        )
+        
+        return self.run_report(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=['date'],
+            metrics=['sessions', 'totalUsers', 'newUsers', 'bounceRate', 
+                    'averageSessionDuration', 'screenPageViews'],
+            _dimension_filter=organic_filter
+        )
+    
+    def get_traffic_sources(self, start_date: str, end_date: str) -> pd.DataFrame:
+        return self.run_report(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=['sessionSource', 'sessionMedium'],
+            metrics=['sessions', 'totalUsers', 'bounceRate']
+        )
+    
+    def get_top_landing_pages(self, start_date: str, end_date: str, limit: int = 20) -> pd.DataFrame:
+        df = self.run_report(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=['landingPagePlusQueryString'],
+            metrics=['sessions', 'totalUsers', 'bounceRate', 'averageSessionDuration'],
+            limit=limit
+        )
+        
+        if not df.empty:
+            df = stripped_view(
+                sorted_view(df, 'sessions'),
+                'landingPagePlusQueryString', r'^https?://[^/]+', regex=True
+            )
+        
+        return df
+    
+    def get_device_metrics(self, start_date: str, end_date: str) -> pd.DataFrame:
+        return self.run_report(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=['deviceCategory'],
+            metrics=['sessions', 'totalUsers', 'bounceRate', 'screenPageViews']
+        )
+    
+    def get_geo_metrics(self, start_date: str, end_date: str, limit: int = 20) -> pd.DataFrame:
+        df = self.run_report(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=['country'],
+            metrics=['sessions', 'totalUsers', 'bounceRate'],
+            limit=limit
+        )
+        
+        if not df.empty:
+            df = sorted_view(df, 'sessions')
+        
+        return df
+    
+    def get_page_metrics(self, start_date: str, end_date: str, limit: int = 20) -> pd.DataFrame:
+        df = self.run_report(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=['pagePath'],
+            metrics=['screenPageViews', 'totalUsers', 'averageSessionDuration', 'bounceRate'],
+            limit=limit
+        )
+        
+        if not df.empty:
+            df = sorted_view(df, 'screenPageViews')
+        
+        return df
+    
+    @cached(ttl=3600)
+    def get_section_tree(_self, start_date: str, end_date: str) -> Optional[PathRollupTree]:
+        df = _self.get_page_metrics(start_date, end_date, limit=10000)
+        
+        if df.empty:
+            return None
+        
+        return PathRollupTree.from_pages(
+            df, 'pagePath',
+            # Los usuarios no se suman entre páginas (uno visita varias): van por get_section_users
+            additive=['screenPageViews'],
+            weighted={'averageSessionDuration': 'screenPageViews', 'bounceRate': 'screenPageViews'}
+        )
+    
+    def get_section_users(self, start_date: str, end_date: str, section: str) -> Optional[int]:
+        # Usuarios únicos de la sección: GA4 los deduplica con un filtro por prefijo de ruta
+        section_filter = None
+        if section != '/':
+            section_filter = FilterExpression(
+                filter=Filter(
+                    field_name="pagePath",
+                    string_filter=Filter.StringFilter(
+                        match_type=Filter.StringFilter.MatchType.BEGINS_WITH,
+                        value=section
+                    )
+                )
+            )
+        
+        df = self.run_totals_report(start_date, end_date, ['totalUsers'], _dimension_filter=section_filter)
+        if df.empty:
+            return None
+        
+        return int(df['totalUsers'].iloc[0])
+    
+    def get_user_engagement(self, start_date: str, end_date: str) -> pd.DataFrame:
+        return self.run_report(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=['date'],
+            metrics=['activeUsers', 'newUsers', 'userEngagementDuration', 
+                    'engagedSessions', 'engagementRate']
+        )
+    
+    def get_conversions(self, start_date: str, end_date: str) -> pd.DataFrame:
+        return self.run_report(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=['eventName'],
+            metrics=['eventCount', 'totalUsers']
+        )
+    
+    def get_metrics_summary(self, start_date: str, end_date: str, totals: bool = True) -> Dict[str, Any]:
+        if totals:
+            df = self.run_totals_report(
+                start_date=start_date,
+                end_date=end_date,
+                metrics=SUMMARY_METRICS
+            )
+            
+            if df.empty:
+                return _empty_summary()
+            
+            return _summary(df.iloc[0])
+        
+        # Modo diario: suma filas por fecha (usuarios contados una vez por día)
+        df = self.run_report(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=['date'],
+            metrics=SUMMARY_METRICS
+        )
+        
+        if df.empty:
+            return _empty_summary()
+        
+        return {
+            'total_sessions': int(df['sessions'].sum()),
+            'total_users': int(df['totalUsers'].sum()),
+            'new_users': int(df['newUsers'].sum()),
+            'avg_bounce_rate': round(df['bounceRate'].mean() * 100, 2),
+            'avg_session_duration': round(df['averageSessionDuration'].mean(), 2),
+            'total_page_views': int(df['screenPageViews'].sum())
+        }
+    
+    def get_organic_keywords(self, start_date: str, end_date: str) -> pd.DataFrame:
+        organic_filter = FilterExpression(
+            filter=Filter(
+                field_name="sessionMedium",
+                string_filter=Filter.StringFilter(value="organic")
+            )
+        )
+        
+        return self.run_report(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=['sessionSourceMedium', 'landingPagePlusQueryString'],
+            metrics=['sessions', 'totalUsers', 'bounceRate'],
+            _dimension_filter=organic_filter
+        )
+    
+    def compare_dimension(self, current_start: str, current_end: str,
+                          previous_start: str, previous_end: str,
+                          dimensions: List[str], metrics: List[str],
+                          limit: int = 10000) -> pd.DataFrame:
+        df = self.run_comparison_report(
+            current_start, current_end, previous_start, previous_end,
+            dimensions=dimensions,
+            metrics=metrics,
+            limit=limit
+        )
+        
+        if df.empty:
+            return pd.DataFrame()
+        
+        # GA4 ya devuelve cada métrica agregada correctamente por período
+        comparison = compare_frames(
+            df[df['period'] == CURRENT],
+            df[df['period'] == PREVIOUS],
+            dimensions,
+            metrics
+        )
+        comparison.attrs['truncated'] = df.attrs.get('truncated', False)
+        return comparison
+    
+    def compare_periods(self, current_start: str, current_end: str,
+                       previous_start: str, previous_end: str) -> Dict[str, Dict]:
+        
+        comparison = self.compare_dimension(
+            current_start, current_end, previous_start, previous_end,
+            dimensions=[],
+            metrics=SUMMARY_METRICS
+        )
+        
+        if comparison.empty:
+            return compare_summaries(_empty_summary(), _empty_summary())
+        
+        row = comparison.iloc[0]
+        current_metrics = _summary({m: row[f'{m}_{CURRENT}'] for m in SUMMARY_METRICS})
+        previous_metrics = _summary({m: row[f'{m}_{PREVIOUS}'] for m in SUMMARY_METRICS})
+        
+        return compare_summaries(current_metrics, previous_metrics)
+
+
+def _rows_to_frame(response_rows, dimensions: List[str], metrics: List[str]) -> pd.DataFrame:
+    rows = []
+    for row in response_rows:
+        data_row = {}
+        
+        for i, dimension_value in enumerate(row.dimension_values):
+            data_row[dimensions[i]] = dimension_value.value
+        
+        for i, metric_value in enumerate(row.metric_values):
+            data_row[metrics[i]] = float(metric_value.value) if metric_value.value else 0
+        
+        rows.append(data_row)
+    
+    df = pd.DataFrame(rows)
+    
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'], format='%Y%m%d')
+    
+    return df
+
+
+def decode_pivot_response(response) -> pd.DataFrame:
+    dimension_names = [h.name for h in response.dimension_headers]
+    metric_names = [h.name for h in response.metric_headers]
+    
+    rows = []
+    for row in response.rows:
+        data_row = {}
+        
+        for i, dimension_value in enumerate(row.dimension_values):
+            data_row[dimension_names[i]] = dimension_value.value
+        
+        for i, metric_value in enumerate(row.metric_values):
+            data_row[metric_names[i]] = float(metric_value.value) if metric_value.value else 0
+        
+        rows.append(data_row)
+    
+    return pd.DataFrame(rows, columns=dimension_names + metric_names)
+
+
+def expand_pivot(df: pd.DataFrame, rows: str, columns: str, metric: str) -> pd.DataFrame:
+    # Formato tidy (una fila por combinación) -> tabla cruzada rows × columns
+    return df.pivot_table(
+        index=rows,
+        columns=columns,
+        values=metric,
+        aggfunc='sum',
+        fill_value=0
+    )
+
+
+def _empty_summary() -> Dict[str, Any]:
+    return {
+        'total_sessions': 0,
+        'total_users': 0,
+        'new_users': 0,
+        'avg_bounce_rate': 0,
+        'avg_session_duration': 0,
+        'total_page_views': 0
+    }
+
+
+def _summary(totals) -> Dict[str, Any]:
+    return {
+        'total_sessions': int(totals['sessions']),
+        'total_users': int(totals['totalUsers']),
+        'new_users': int(totals['newUsers']),
+        'avg_bounce_rate': round(float(totals['bounceRate']) * 100, 2),
+        'avg_session_duration': round(float(totals['averageSessionDuration']), 2),
+        'total_page_views': int(totals['screenPageViews'])
+    }
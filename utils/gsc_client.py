@@ -0,0 +1,883 @@
+import copy
+import functools
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+import pandas as pd
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from typing import Optional, Dict, List, Any, Iterator
+import re
+
+from .config import ConnectorConfig
+from .errors import ConnectorError, QueryError, QuotaExceededError, error_for_status, status_of
+from .search_index import KeywordSearchIndex
+from .filters import Expression, plan_filters, evaluate, referenced_fields
+from .movers import compute_movers
+from .path_tree import PathRollupTree
+from .cache import CacheBackend, Uncached, cached, dataset_token, derive, get_cache, share
+from .pagination import PageStream, rechunk
+from .sketches import DimensionSketch
+from .clusters import aggregate_clusters, assign_clusters, get_clusterer
+from .anomalies import get_detector, ANOMALY_THRESHOLD
+from .live import LivePoller, get_poller, LIVE_BUFFER_HOURS
+from .executor import get_backend
+from .export import write_dataset
+from .views import sorted_view, stripped_view
+from .scheduler import BACKGROUND, checkpoint, get_scheduler, propagate
+from .ratelimit import get_rate_limiter
+from .admission import CostEstimate, get_admission, days_between, LONG_RANGE_DAYS
+from .comparison import (
+    CURRENT, PREVIOUS, GSC_METRICS,
+    union_range, label_periods, aggregate_gsc, compare_frames, compare_summaries
+)
+
+# Máximo de filas por request que acepta la API de Search Analytics
+API_PAGE_SIZE = 25000
+
+# Filas usadas para construir el índice local de keywords
+KEYWORD_INDEX_ROWS = 25000
+# Filas máximas de la comparación date × dimensión (se pagina hasta este límite)
+COMPARE_ROWS = int(os.getenv('DASHBOARD_COMPARE_ROWS', 1000000))
+# Keywords que se agrupan en clusters (todo el dataset del período)
+CLUSTER_ROWS = int(os.getenv('DASHBOARD_CLUSTER_ROWS', 100000))
+
+DEFAULT_DIMENSIONS = ['date', 'query', 'page', 'country', 'device']
+
+# Dimensiones que GSC anonimiza o filtra: agregar sobre ellas no reproduce los totales
+LOSSY_DIMENSIONS = {'query', 'page'}
+
+# Rangos más largos que esto responden el top-K con sketches diarios salvo exact=True
+APPROXIMATE_MIN_DAYS = int(os.getenv('DASHBOARD_APPROXIMATE_MIN_DAYS', 93))
+# Días por consulta al construir sketches y filas máximas por día
+SKETCH_WINDOW_DAYS = 31
+SKETCH_ROWS_PER_DAY = int(os.getenv('DASHBOARD_SKETCH_ROWS_PER_DAY', 50000))
+# GSC sigue ajustando los últimos días; sus sketches vencen antes
+FINAL_DATA_DAYS = 3
+SKETCH_TTL = 24 * 3600
+RECENT_SKETCH_TTL = 3600
+
+# GSC informa fechas y horas en hora del Pacífico
+GSC_TIMEZONE = ZoneInfo('America/Los_Angeles')
+
+# Superficies de búsqueda (parámetro type); Discover no admite la dimensión query
+SEARCH_TYPES = ['web', 'image', 'video', 'news', 'discover']
+QUERY_SEARCH_TYPES = ['web', 'image', 'video', 'news']
+# Hilos para consultar varias superficies en paralelo (compartidos entre sesiones)
+FANOUT_WORKERS = int(os.getenv('DASHBOARD_FANOUT_WORKERS', len(SEARCH_TYPES)))
+
+_fanout_pool = None
+_fanout_lock = threading.Lock()
+
+
+def get_fanout_pool() -> ThreadPoolExecutor:
+    global _fanout_pool
+    with _fanout_lock:
+        if _fanout_pool is None:
+            _fanout_pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix='gsc-fanout')
+        return _fanout_pool
+
+class GSCClient:
+    # Núcleo sin Streamlit: sirve en hilos, procesos worker y jobs batch.
+    # Los errores se levantan como ConnectorError; el adaptador decide cómo mostrarlos
+    def __init__(self, config: ConnectorConfig, cache: Optional[CacheBackend] = None):
+        self.config = config
+        self.property_url = config.gsc_property_url
+        self.cache = cache
+        self._credentials = config.gsc_credentials()
+        self._local = threading.local()
+        self.search_type = 'web'
+        # Compartidos por todas las sesiones de la misma propiedad
+        self.admission = get_admission('gsc', self.property_url)
+        self.rate_limiter = get_rate_limiter(('gsc', self.property_url))
+    
+    def with_search_type(self, search_type: str) -> 'GSCClient':
+        # Copia liviana que consulta otra superficie; comparte servicio, límites y caché
+        if search_type not in SEARCH_TYPES:
+            raise ValueError(f"Tipo de búsqueda no soportado: {search_type}")
+        if search_type == self.search_type:
+            return self
+        client = copy.copy(self)
+        client.search_type = search_type
+        return client
+    
+    def _in_worker(self, fn):
+        # Envuelve lo que corre en hilos del fan-out; el adaptador agrega su contexto
+        return propagate(fn)
+    
+    @property
+    def service(self):
+        # httplib2 no es thread-safe: cada hilo usa su propio cliente de la API
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._build_service()
+            self._local.service = service
+        return service
+    
+    def _build_service(self):
+        if self._credentials is None:
+            return None
+        return build('searchconsole', 'v1', credentials=self._credentials, cache_discovery=False)
+    
+    def handle_error(self, error: ConnectorError):
+        raise error
+    
+    @property
+    def cache_namespace(self) -> str:
+        # Web conserva la clave de siempre; cada otra superficie tiene sus propias entradas
+        if self.search_type == 'web':
+            return str(self.property_url)
+        return f"{self.property_url}|{self.search_type}"
+    
+    @cached(ttl=3600)
+    def get_search_analytics(_self, start_date: str, end_date: str, 
+                           dimensions: List[str] = None,
+                           filters: List[Dict] = None,
+                           row_limit: int = 25000,
+                           filter_groups: List[Dict] = None,
+                           data_state: Optional[str] = None) -> pd.DataFrame:
+        
+        unfiltered = not filters and not filter_groups
+        estimate = _self._estimate(start_date, end_date, dimensions, row_limit)
+        
+        # Consulta pesada: se degrada a un resultado en caché más detallado del mismo período
+        if estimate.heavy and unfiltered and data_state is None:
+            df = _self._from_superset(start_date, end_date, dimensions or DEFAULT_DIMENSIONS)
+            if df is not None:
+                _self.admission.record_downgrade()
+                return df
+        
+        # Más de API_PAGE_SIZE filas se obtienen paginando con startRow
+        stream = _self.iter_search_analytics(
+            start_date, end_date,
+            dimensions=dimensions,
+            filters=filters,
+            row_limit=row_limit,
+            filter_groups=filter_groups,
+            data_state=data_state
+        )
+        batches = list(stream)
+        
+        # Un error a mitad de la paginación no deja un resultado parcial en caché
+        if stream.error is not None:
+            return Uncached(pd.DataFrame())
+        
+        if not batches:
+            return pd.DataFrame()
+        
+        df = pd.concat(batches, ignore_index=True)
+        
+        # Solo las consultas sin filtros reflejan la cardinalidad real de la propiedad
+        if unfiltered and data_state is None:
+            _self.admission.model.observe_rows(
+                dimensions or DEFAULT_DIMENSIONS, days_between(start_date, end_date),
+                len(df), truncated=len(df) >= row_limit
+            )
+            if len(df) < row_limit:
+                _self.admission.record_pull(
+                    start_date, end_date, dimensions or DEFAULT_DIMENSIONS, row_limit, scope=_self.search_type
+                )
+        
+        return df
+    
+    def get_search_analytics_by_type(self, start_date: str, end_date: str,
+                                     dimensions: List[str] = None,
+                                     search_types: List[str] = None,
+                                     filters: List[Dict] = None,
+                                     row_limit: int = 25000) -> pd.DataFrame:
+        dimensions = dimensions or DEFAULT_DIMENSIONS
+        if search_types is None:
+            search_types = QUERY_SEARCH_TYPES if 'query' in dimensions else SEARCH_TYPES
+        
+        # Una consulta por superficie en paralelo; cada una queda en caché por separado
+        pool = get_fanout_pool()
+        futures = [
+            (search_type, pool.submit(
+                self._in_worker(self.with_search_type(search_type).get_search_analytics),
+                start_date, end_date, dimensions=dimensions, filters=filters, row_limit=row_limit
+            ))
+            for search_type in search_types
+        ]
+        
+        frames = []
+        for search_type, future in futures:
+            df = future.result()
+            if not df.empty:
+                frames.append(df.assign(search_type=search_type))
+        
+        if not frames:
+            return pd.DataFrame(columns=dimensions + GSC_METRICS + ['search_type'])
+        
+        df = pd.concat(frames, ignore_index=True)
+        df['search_type'] = pd.Categorical(df['search_type'], categories=list(search_types))
+        return df
+    
+    def _estimate(self, start_date: str, end_date: str,
+                  dimensions: List[str] = None, row_limit: int = 25000) -> CostEstimate:
+        dimensions = dimensions or DEFAULT_DIMENSIONS
+        days = days_between(start_date, end_date)
+        rows, observed = self.admission.model.expected_rows(dimensions, days, row_limit)
+        return CostEstimate(
+            'gsc', rows, max(math.ceil(rows / API_PAGE_SIZE), 1), observed=observed,
+            # GSC documenta como costosos los rangos largos agrupados por query o page
+            expensive=days > LONG_RANGE_DAYS and bool(LOSSY_DIMENSIONS & set(dimensions))
+        )
+    
+    def estimate_search_analytics(self, start_date: str, end_date: str,
+                                  dimensions: List[str] = None,
+                                  filters: List[Dict] = None,
+                                  row_limit: int = 25000,
+                                  filter_groups: List[Dict] = None) -> CostEstimate:
+        # Costo estimado de get_search_analytics con los mismos argumentos, sin llamar a la API
+        estimate = self._estimate(start_date, end_date, dimensions, row_limit)
+        estimate.cached = GSCClient.get_search_analytics.is_cached(
+            self, start_date, end_date, dimensions=dimensions, filters=filters,
+            row_limit=row_limit, filter_groups=filter_groups
+        )
+        return estimate
+    
+    def _from_superset(self, start_date: str, end_date: str, dimensions: List[str]) -> Optional[pd.DataFrame]:
+        for superset, row_limit in self.admission.supersets(start_date, end_date, dimensions, scope=self.search_type):
+            if LOSSY_DIMENSIONS & (set(superset) - set(dimensions)):
+                continue
+            if not GSCClient.get_search_analytics.is_cached(
+                    self, start_date, end_date, dimensions=superset, row_limit=row_limit):
+                continue
+            df = self.get_search_analytics(start_date, end_date, dimensions=superset, row_limit=row_limit)
+            if df.empty:
+                continue
+            return aggregate_gsc(df, dimensions)[dimensions + GSC_METRICS]
+        return None
+    
+    def iter_search_analytics(self, start_date: str, end_date: str,
+                              dimensions: List[str] = None,
+                              filters: List[Dict] = None,
+                              row_limit: int = 25000,
+                              filter_groups: List[Dict] = None,
+                              batch_size: int = API_PAGE_SIZE,
+                              data_state: Optional[str] = None) -> PageStream:
+        # Al terminar de recorrerlo, stream.error / stream.truncated indican si está completo
+        return PageStream(lambda stream: self._search_analytics_pages(
+            stream, start_date, end_date, dimensions, filters, row_limit,
+            filter_groups, batch_size, data_state
+        ))
+    
+    def _search_analytics_pages(self, stream: PageStream, start_date: str, end_date: str,
+                                dimensions: Optional[List[str]], filters: Optional[List[Dict]],
+                                row_limit: int, filter_groups: Optional[List[Dict]],
+                                batch_size: int, data_state: Optional[str]) -> Iterator[pd.DataFrame]:
+        
+        if not self.service:
+            return
+        
+        dimensions = dimensions or DEFAULT_DIMENSIONS
+        
+        request = {
+            'startDate': start_date,
+            'endDate': end_date,
+            'dimensions': dimensions,
+            'startRow': 0
+        }
+        
+        if filters:
+            request['dimensionFilterGroups'] = [{
+                'filters': filters
+            }]
+        
+        if filter_groups:
+            request['dimensionFilterGroups'] = request.get('dimensionFilterGroups', []) + filter_groups
+        
+        # 'ALL' incluye datos frescos aún no finales; 'HOURLY_ALL' es obligatorio con 'hour'
+        if data_state:
+            request['dataState'] = data_state
+        
+        if self.search_type != 'web':
+            request['type'] = self.search_type
+        
+        # Se rechaza antes de la primera página si la cuota no alcanza
+        estimate = self._estimate(start_date, end_date, dimensions, row_limit)
+        try:
+            self.admission.admit(estimate)
+        except QuotaExceededError as e:
+            stream.error = e
+            self.handle_error(e)
+            return
+        
+        fetched = 0
+        while fetched < row_limit:
+            checkpoint()
+            # Siempre páginas completas: lotes más chicos multiplicarían las llamadas
+            page_size = min(API_PAGE_SIZE, row_limit - fetched)
+            self.rate_limiter.acquire()
+            
+            try:
+                # Las consultas pesadas esperan turno solo durante la llamada a la API
+                with self.admission.slot(estimate):
+                    response = self.service.searchanalytics().query(
+                        siteUrl=self.property_url,
+                        body=dict(request, rowLimit=page_size, startRow=fetched)
+                    ).execute()
+            except HttpError as e:
+                stream.error = error_for_status(
+                    status_of(e), f"Error al obtener datos de GSC: {str(e)}", source='gsc'
+                )
+                self.handle_error(stream.error)
+                return
+            except QuotaExceededError as e:
+                stream.error = e
+                self.handle_error(e)
+                return
+            
+            rows = response.get('rows', [])
+            if not rows:
+                return
+            
+            yield from rechunk(_rows_to_frame(rows, dimensions), batch_size)
+            
+            fetched += len(rows)
+            # Una página incompleta indica que no hay más filas
+            if len(rows) < page_size:
+                return
+        
+        # Se alcanzó row_limit con la última página llena: puede haber más filas
+        stream.truncated = True
+    
+    def filter_search_analytics(self, start_date: str, end_date: str,
+                                dimensions: List[str],
+                                where: Optional[Expression] = None,
+                                row_limit: int = 25000) -> pd.DataFrame:
+        plan = plan_filters(where)
+        
+        # Lo que no se puede enviar a la API se evalúa localmente sobre el resultado
+        if plan.residual is not None:
+            available = set(dimensions) | {'clicks', 'impressions', 'ctr', 'position'}
+            missing = [f for f in referenced_fields(plan.residual) if f not in available]
+            if missing:
+                raise ValueError(f"El filtro local usa campos que no están en las dimensiones: {missing}")
+        
+        df = self.get_search_analytics(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=dimensions,
+            row_limit=row_limit,
+            filter_groups=plan.groups or None
+        )
+        
+        if plan.residual is not None and not df.empty:
+            df = derive(df, _apply_filter, plan.residual)
+        
+        return df
+    
+    def export_search_analytics(self, path: str, start_date: str, end_date: str,
+                                dimensions: List[str] = None,
+                                filters: List[Dict] = None,
+                                row_limit: int = 25000,
+                                format: Optional[str] = None) -> Optional[str]:
+        # Reutiliza el resultado en caché del dashboard; no vuelve a consultar la API
+        df = self.get_search_analytics(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=dimensions,
+            filters=filters,
+            row_limit=row_limit
+        )
+        
+        if df.empty:
+            return None
+        
+        return write_dataset(df, path, format=format, metadata={
+            'source': 'gsc',
+            'property': self.property_url,
+            'start_date': start_date,
+            'end_date': end_date,
+            'dimensions': dimensions or DEFAULT_DIMENSIONS,
+            'filters': filters
+        })
+    
+    def get_fresh_hours(self, since: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        # Sin caché: datos por hora aún no finales desde la hora del watermark
+        # (inclusive, porque la última hora puede seguir creciendo)
+        today = datetime.now(GSC_TIMEZONE).date()
+        start = since.tz_convert(GSC_TIMEZONE).date() if since is not None else today - timedelta(days=1)
+        
+        batches = list(self.iter_search_analytics(
+            start.isoformat(), today.isoformat(),
+            dimensions=['hour'],
+            row_limit=LIVE_BUFFER_HOURS,
+            data_state='HOURLY_ALL'
+        ))
+        
+        if not batches:
+            return pd.DataFrame(columns=['hour'] + GSC_METRICS)
+        
+        df = pd.concat(batches, ignore_index=True)
+        return df[df['hour'] >= since] if since is not None else df
+    
+    @property
+    def live(self) -> LivePoller:
+        return get_poller(('gsc', self.cache_namespace), self.get_fresh_hours, GSC_METRICS)
+    
+    def use_sketches(self, start_date: str, end_date: str, exact: Optional[bool] = None) -> bool:
+        # Por defecto los rangos largos son aproximados; exact=True fuerza la consulta completa
+        if exact is None:
+            return days_between(start_date, end_date) > APPROXIMATE_MIN_DAYS
+        return not exact
+    
+    def get_sketch(self, start_date: str, end_date: str, dimension: str = 'query') -> DimensionSketch:
+        # Un sketch por día y dimensión: cualquier rango se arma fusionando días ya calculados
+        store = self.cache if self.cache is not None else get_cache()
+        first = date.fromisoformat(start_date)
+        days = [first + timedelta(days=i) for i in range(days_between(start_date, end_date))]
+        
+        sketches = {}
+        missing = []
+        for day in days:
+            found, sketch = store.get(('sketch', self.cache_namespace, dimension, day.isoformat()))
+            if found:
+                sketches[day] = sketch
+            else:
+                missing.append(day)
+        
+        # Si una ventana de varios días ya superó el tope de filas, se piden días sueltos
+        found, window_days = store.get(('sketch_window', self.cache_namespace, dimension))
+        for window in _contiguous_windows(missing, window_days if found else SKETCH_WINDOW_DAYS):
+            sketches.update(self._build_sketches(window, dimension, store))
+        
+        return DimensionSketch.combine(dimension, (sketches[day] for day in days if day in sketches))
+    
+    def _build_sketches(self, window: List[date], dimension: str, store: CacheBackend) -> Dict[date, DimensionSketch]:
+        built = {day: DimensionSketch(dimension) for day in window}
+        
+        # Se recorre el detalle date × dimensión sin guardarlo: solo quedan los sketches
+        stream = self.iter_search_analytics(
+            window[0].isoformat(), window[-1].isoformat(),
+            dimensions=['date', dimension],
+            row_limit=SKETCH_ROWS_PER_DAY * len(window)
+        )
+        for batch in stream:
+            for day, rows in batch.groupby(batch['date'].dt.date, sort=False):
+                if day in built:
+                    built[day].update(rows)
+        
+        # Un error deja sketches parciales: se usan en esta consulta pero no se guardan
+        if stream.error is not None:
+            return built
+        
+        # La ventana no entra bajo el tope: se recuerda y se arma día por día
+        if stream.truncated and len(window) > 1:
+            store.set(('sketch_window', self.cache_namespace, dimension), 1, ttl=SKETCH_TTL)
+            built = {}
+            for day in window:
+                built.update(self._build_sketches([day], dimension, store))
+            return built
+        
+        # Un día solo que supera el tope ya es el límite de la API: se guarda marcado
+        # como truncado y con vencimiento corto
+        final_until = date.today() - timedelta(days=FINAL_DATA_DAYS)
+        for day, sketch in built.items():
+            sketch.truncated = stream.truncated
+            store.set(
+                ('sketch', self.cache_namespace, dimension, day.isoformat()), sketch,
+                ttl=SKETCH_TTL if day <= final_until and not stream.truncated else RECENT_SKETCH_TTL
+            )
+        return built
+    
+    def get_anomalies(self, dimension: str = 'query', threshold: float = ANOMALY_THRESHOLD,
+                      min_impressions: int = 0, limit: int = 50) -> Optional[pd.DataFrame]:
+        # Desvíos del último día final de cada keyword o página contra su propia línea base.
+        # Solo se sincronizan días finales: un día provisional no se puede quitar del EWMA.
+        # None mientras se prepara la historia inicial
+        detector = get_detector(('gsc', self.cache_namespace, dimension), dimension)
+        fetch = functools.partial(self._fetch_daily_series, dimension)
+        through = date.today() - timedelta(days=FINAL_DATA_DAYS)
+        
+        if not detector.ready:
+            # La carga inicial (ANOMALY_HISTORY_DAYS días) corre en el scheduler, no en el
+            # hilo del script ni bloqueando a las demás sesiones
+            detector.sync_in_background(
+                lambda fn, *args: get_scheduler().submit(fn, *args, priority=BACKGROUND),
+                fetch, through
+            )
+            return None
+        detector.sync(fetch, through)
+        
+        df = detector.anomalies(threshold, min_impressions=min_impressions, limit=limit)
+        if dimension == 'page' and not df.empty:
+            df = stripped_view(df, 'page', self.property_url)
+        return df
+    
+    def _fetch_daily_series(self, dimension: str, start: date, end: date) -> Optional[pd.DataFrame]:
+        # Detalle date × dimensión de una ventana; no se guarda en caché, solo alimenta el
+        # detector. None si hubo un error (ya informado con handle_error). Si la ventana
+        # supera el tope se pide día por día; un día que aun así lo supera queda en
+        # attrs['partial_days'] y sus series faltantes no cuentan como 0
+        stream = self.iter_search_analytics(
+            start.isoformat(), end.isoformat(),
+            dimensions=['date', dimension],
+            row_limit=SKETCH_ROWS_PER_DAY * ((end - start).days + 1)
+        )
+        frames = list(stream)
+        
+        if stream.error is not None:
+            return None
+        
+        if stream.truncated and start < end:
+            frames = []
+            partial_days = set()
+            for offset in range((end - start).days + 1):
+                day = start + timedelta(days=offset)
+                df = self._fetch_daily_series(dimension, day, day)
+                if df is None:
+                    return None
+                frames.append(df)
+                partial_days |= df.attrs['partial_days']
+        else:
+            partial_days = {start} if stream.truncated else set()
+        
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        df.attrs['partial_days'] = partial_days
+        return df
+    
+    def approximate_top(self, start_date: str, end_date: str,
+                        dimension: str = 'query', limit: int = 10) -> pd.DataFrame:
+        return self.get_sketch(start_date, end_date, dimension).top(limit)
+    
+    def count_distinct(self, start_date: str, end_date: str, dimension: str = 'query') -> int:
+        # Keywords (o páginas) con impresiones en el rango, estimadas con HyperLogLog
+        return self.get_sketch(start_date, end_date, dimension).count_distinct()
+    
+    def get_top_queries(self, start_date: str, end_date: str, limit: int = 10,
+                        exact: Optional[bool] = None) -> pd.DataFrame:
+        if self.use_sketches(start_date, end_date, exact):
+            return self.approximate_top(start_date, end_date, 'query', limit)
+        
+        df = self.get_search_analytics(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=['query'],
+            row_limit=limit
+        )
+        
+        if not df.empty:
+            df = sorted_view(df, 'clicks')
+        
+        return df
+    
+    def get_top_pages(self, start_date: str, end_date: str, limit: int = 10,
+                      exact: Optional[bool] = None) -> pd.DataFrame:
+        if self.use_sketches(start_date, end_date, exact):
+            df = self.approximate_top(start_date, end_date, 'page', limit)
+        else:
+            df = self.get_search_analytics(
+                start_date=start_date,
+                end_date=end_date,
+                dimensions=['page'],
+                row_limit=limit
+            )
+        
+        if not df.empty:
+            df = stripped_view(sorted_view(df, 'clicks'), 'page', self.property_url)
+        
+        return df
+    
+    @cached(ttl=3600)
+    def get_section_tree(_self, start_date: str, end_date: str) -> Optional[PathRollupTree]:
+        # El árbol necesita todas las páginas, no solo los heavy hitters
+        df = _self.get_top_pages(start_date, end_date, limit=25000, exact=True)
+        
+        if df.empty:
+            return None
+        
+        # Se construye una vez por período; las consultas de secciones no re-agregan
+        return PathRollupTree.from_pages(
+            df, 'page',
+            additive=['clicks', 'impressions'],
+            weighted={'position': 'impressions'}
+        )
+    
+    def get_performance_by_device(self, start_date: str, end_date: str) -> pd.DataFrame:
+        return self.get_search_analytics(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=['device']
+        )
+    
+    def get_performance_by_country(self, start_date: str, end_date: str, limit: int = 10) -> pd.DataFrame:
+        df = self.get_search_analytics(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=['country'],
+            row_limit=limit
+        )
+        
+        if not df.empty:
+            df = sorted_view(df, 'clicks')
+        
+        return df
+    
+    def get_daily_performance(self, start_date: str, end_date: str) -> pd.DataFrame:
+        return self.get_search_analytics(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=['date']
+        )
+    
+    @cached(ttl=3600)
+    def get_keyword_index(_self, start_date: str, end_date: str) -> Optional[KeywordSearchIndex]:
+        df = _self.get_search_analytics(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=['query'],
+            row_limit=KEYWORD_INDEX_ROWS
+        )
+        
+        if df.empty:
+            return None
+        
+        # Si se alcanzó el límite de filas, puede haber keywords que no están en el índice
+        return KeywordSearchIndex(df, complete=len(df) < KEYWORD_INDEX_ROWS)
+    
+    def get_keyword_clusters(self, start_date: str, end_date: str) -> pd.DataFrame:
+        df = self.get_search_analytics(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=['query'],
+            row_limit=CLUSTER_ROWS
+        )
+        
+        if df.empty:
+            return pd.DataFrame()
+        
+        # Las etiquetas se memoizan por (dataset, generación del clusterer): una fusión
+        # reetiqueta keywords ya vistas y los resultados anteriores dejan de usarse
+        store = self.cache if self.cache is not None else get_cache()
+        clusterer_key = ('gsc', self.cache_namespace)
+        key = ('clusters', dataset_token(df), get_clusterer(clusterer_key, store).generation)
+        found, labeled = store.get(key)
+        if not found:
+            # El clusterer es compartido: solo las keywords nuevas del período se asignan
+            labels, clusterer = assign_clusters(clusterer_key, df['query'], store)
+            labeled = df.assign(cluster=labels)
+            key = ('clusters', key[1], clusterer.generation)
+            store.set(key, labeled)
+        return share(labeled, key)
+    
+    def get_cluster_summary(self, start_date: str, end_date: str,
+                            min_impressions: int = 0) -> pd.DataFrame:
+        df = self.get_keyword_clusters(start_date, end_date)
+        
+        if df.empty:
+            return pd.DataFrame()
+        
+        # Agregado memoizado por dataset: cambiar el mínimo de impresiones no reagrupa
+        summary = derive(df, aggregate_clusters)
+        return sorted_view(summary[summary['impressions'] >= min_impressions], 'clicks')
+    
+    def search_keywords(self, keyword: str, start_date: str, end_date: str,
+                        mode: str = 'substring') -> pd.DataFrame:
+        index = self.get_keyword_index(start_date, end_date)
+        
+        if index is not None and index.complete:
+            try:
+                return index.search(keyword, mode)
+            except re.error as e:
+                self.handle_error(QueryError(f"Expresión regular inválida: {str(e)}", source='gsc'))
+                return pd.DataFrame()
+        
+        # Fallback: el dataset local está incompleto, se filtra en la API.
+        # includingRegex distingue mayúsculas; (?i) iguala la búsqueda local
+        if mode == 'prefix':
+            filters = [{'dimension': 'query', 'operator': 'includingRegex', 'expression': '(?i)^' + re.escape(keyword)}]
+        elif mode == 'regex':
+            filters = [{'dimension': 'query', 'operator': 'includingRegex', 'expression': '(?i)' + keyword}]
+        elif mode == 'tokens':
+            # Palabras completas, como KeywordSearchIndex.tokens (no subcadenas)
+            filters = [{'dimension': 'query', 'operator': 'includingRegex',
+                        'expression': r'(?i)(^|\s)' + re.escape(word) + r'(\s|$)'}
+                       for word in dict.fromkeys(keyword.split())]
+        else:
+            filters = [{'dimension': 'query', 'operator': 'contains', 'expression': keyword}]
+        
+        return self.get_search_analytics(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=['query'],
+            filters=filters
+        )
+    
+    def get_metrics_summary(self, start_date: str, end_date: str) -> Dict[str, Any]:
+        df = self.get_search_analytics(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=['date']
+        )
+        
+        if df.empty:
+            return _empty_summary()
+        
+        return _summary(aggregate_gsc(df, []).iloc[0])
+    
+    def compare_dimension(self, current_start: str, current_end: str,
+                          previous_start: str, previous_end: str,
+                          dimensions: List[str] = None,
+                          row_limit: int = COMPARE_ROWS) -> pd.DataFrame:
+        dimensions = dimensions or []
+        
+        if not dimensions:
+            # Totales: a lo sumo una fila por día, así que se reusan las series de
+            # get_daily_performance (ya en caché por el dashboard y la precarga) en vez
+            # de otra descarga de la unión con COMPARE_ROWS
+            frames = [
+                df.assign(period=period)
+                for df, period in [
+                    (self.get_daily_performance(current_start, current_end), CURRENT),
+                    (self.get_daily_performance(previous_start, previous_end), PREVIOUS)
+                ]
+                if not df.empty
+            ]
+            if not frames:
+                return pd.DataFrame()
+            
+            comparison = get_backend().run(_compare_labeled, pd.concat(frames, ignore_index=True), dimensions)
+            comparison.attrs['truncated'] = False
+            return comparison
+        
+        start_date, end_date = union_range(current_start, current_end, previous_start, previous_end)
+        
+        # Una sola consulta por fecha sobre la unión de ambos períodos; se pagina hasta
+        # traer todas las filas: con un corte, los deltas por dimensión serían incorrectos
+        df = self.get_search_analytics(
+            start_date=start_date,
+            end_date=end_date,
+            dimensions=['date'] + dimensions,
+            row_limit=row_limit
+        )
+        
+        if df.empty:
+            return pd.DataFrame()
+        
+        comparison = get_backend().run(
+            _compare_labeled,
+            label_periods(df, current_start, current_end, previous_start, previous_end),
+            dimensions
+        )
+        # Si aun así se alcanzó el límite, el resultado lo indica para advertirlo en la vista
+        comparison.attrs['truncated'] = len(df) >= row_limit
+        return comparison
+    
+    def get_movers(self, current_start: str, current_end: str,
+                   previous_start: str, previous_end: str,
+                   dimension: str = 'query',
+                   top_n: int = 20,
+                   min_impressions: int = 10,
+                   row_limit: int = 25000) -> Dict[str, pd.DataFrame]:
+        
+        # Dos descargas masivas (una por período) en lugar de una consulta por keyword
+        frames = []
+        complete = []
+        for start_date, end_date in [(current_start, current_end), (previous_start, previous_end)]:
+            df = self.get_search_analytics(
+                start_date=start_date,
+                end_date=end_date,
+                dimensions=[dimension],
+                row_limit=row_limit
+            )
+            complete.append(len(df) < row_limit)
+            if df.empty:
+                df = pd.DataFrame(columns=[dimension] + GSC_METRICS)
+            elif dimension == 'page':
+                df = stripped_view(df, 'page', self.property_url)
+            frames.append(df)
+        
+        return get_backend().run(
+            compute_movers, frames[0], frames[1], dimension,
+            top_n=top_n, min_impressions=min_impressions,
+            current_complete=complete[0], previous_complete=complete[1]
+        )
+    
+    def compare_periods(self, current_start: str, current_end: str,
+                       previous_start: str, previous_end: str) -> Dict[str, Dict]:
+        
+        comparison = self.compare_dimension(current_start, current_end, previous_start, previous_end)
+        
+        if comparison.empty:
+            return compare_summaries(_empty_summary(), _empty_summary())
+        
+        row = comparison.iloc[0]
+        current_metrics = _summary({m: row[f'{m}_{CURRENT}'] for m in GSC_METRICS})
+        previous_metrics = _summary({m: row[f'{m}_{PREVIOUS}'] for m in GSC_METRICS})
+        
+        return compare_summaries(current_metrics, previous_metrics)
+
+
+def _rows_to_frame(rows: List[Dict], dimensions: List[str]) -> pd.DataFrame:
+    data = []
+    for row in rows:
+        data_row = {}
+        for i, dimension in enumerate(dimensions):
+            data_row[dimension] = row['keys'][i]
+        
+        data_row['clicks'] = row.get('clicks', 0)
+        data_row['impressions'] = row.get('impressions', 0)
+        data_row['ctr'] = row.get('ctr', 0)
+        data_row['position'] = row.get('position', 0)
+        
+        data.append(data_row)
+    
+    df = pd.DataFrame(data)
+    
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'])
+    
+    # Las horas traen offset (-07:00 / -08:00 según horario de verano)
+    if 'hour' in df.columns:
+        df['hour'] = pd.to_datetime(df['hour'], utc=True)
+    
+    return df
+
+
+def _contiguous_windows(days: List[date], size: int) -> Iterator[List[date]]:
+    window = []
+    for day in days:
+        if window and (day - window[-1] != timedelta(days=1) or len(window) == size):
+            yield window
+            window = []
+        window.append(day)
+    if window:
+        yield window
+
+
+def _apply_filter(df: pd.DataFrame, expression: Expression) -> pd.DataFrame:
+    return df[evaluate(expression, df)]
+
+
+def _compare_labeled(df: pd.DataFrame, dimensions: List[str]) -> pd.DataFrame:
+    aggregated = aggregate_gsc(df, ['period'] + dimensions)
+    
+    return compare_frames(
+        aggregated[aggregated['period'] == CURRENT],
+        aggregated[aggregated['period'] == PREVIOUS],
+        dimensions,
+        GSC_METRICS
+    )
+
+
+def _empty_summary() -> Dict[str, Any]:
+    return {
+        'total_clicks': 0,
+        'total_impressions': 0,
+        'avg_ctr': 0,
+        'avg_position': 0
+    }
+
+
+def _summary(totals) -> Dict[str, Any]:
+    return {
+        'total_clicks': int(totals['clicks']),
+        'total_impressions': int(totals['impressions']),
+        'avg_ctr': round(float(totals['ctr']) * 100, 2),
+        'avg_position': round(float(totals['position']), 1)
+    }
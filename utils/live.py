@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+# Horas que conserva el buffer en memoria (48: hoy y ayer completos)
+LIVE_BUFFER_HOURS = int(os.getenv('DASHBOARD_LIVE_BUFFER_HOURS', 48))
+# Segundos mínimos entre consultas a la API; antes se sirve el buffer
+LIVE_POLL_SECONDS = float(os.getenv('DASHBOARD_LIVE_POLL_SECONDS', 300))
+
+
+class HourlyRingBuffer:
+    # Serie horaria de tamaño fijo: las horas nuevas pisan a las más antiguas
+    def __init__(self, columns: List[str], capacity: int = LIVE_BUFFER_HOURS):
+        self.columns = list(columns)
+        self.capacity = capacity
+        self.hours = np.zeros(capacity, dtype='int64')
+        self.values = np.zeros((capacity, len(self.columns)), dtype='float64')
+        self.start = 0
+        self.size = 0
+        self.tz = None
+
+    @property
+    def watermark(self) -> Optional[pd.Timestamp]:
+        # Última hora recibida; puede seguir incompleta y se vuelve a pedir
+        if not self.size:
+            return None
+        return pd.Timestamp(int(self.hours[(self.start + self.size - 1) % self.capacity]), tz=self.tz)
+
+    def upsert(self, df: pd.DataFrame) -> int:
+        if df.empty:
+            return 0
+        df = df.sort_values('hour')
+        hours = pd.DatetimeIndex(df['hour'])
+        self.tz = hours.tz
+        stamps = hours.as_unit('ns').asi8
+        values = df.reindex(columns=self.columns, fill_value=0).to_numpy(dtype='float64')
+
+        watermark = self.watermark
+        last = watermark.value if watermark is not None else None
+        added = 0
+        for stamp, row in zip(stamps, values):
+            if last is not None and stamp < last:
+                continue
+            if last is not None and stamp == last:
+                # La hora del watermark se actualiza en su lugar
+                self.values[(self.start + self.size - 1) % self.capacity] = row
+                continue
+            position = (self.start + self.size) % self.capacity
+            if self.size == self.capacity:
+                self.start = (self.start + 1) % self.capacity
+            else:
+                self.size += 1
+            self.hours[position] = stamp
+            self.values[position] = row
+            last = stamp
+            added += 1
+        return added
+
+    def frame(self) -> pd.DataFrame:
+        order = (self.start + np.arange(self.size)) % self.capacity
+        hours = pd.to_datetime(self.hours[order], unit='ns')
+        if self.tz is not None:
+            hours = hours.tz_localize('UTC').tz_convert(self.tz)
+        df = pd.DataFrame(self.values[order], columns=self.columns)
+        df.insert(0, 'hour', hours)
+        return df
+
+    def __len__(self) -> int:
+        return self.size
+
+
+class LivePoller:
+    # Pide a la API solo las horas desde el watermark y las agrega al buffer.
+    # fetch(since) devuelve un DataFrame con columna 'hour' y las métricas
+    def __init__(self, fetch: Callable[[Optional[pd.Timestamp]], pd.DataFrame],
+                 columns: List[str], interval: float = LIVE_POLL_SECONDS,
+                 capacity: int = LIVE_BUFFER_HOURS):
+        self.fetch = fetch
+        self.interval = interval
+        self.buffer = HourlyRingBuffer(columns, capacity)
+        self._lock = threading.Lock()
+        self.polled_at = None
+        self.polls = 0
+        self.fetched_rows = 0
+
+    def poll(self, force: bool = False) -> pd.DataFrame:
+        # El lock evita que varias sesiones consulten la API al mismo tiempo
+        with self._lock:
+            now = time.monotonic()
+            if force or self.polled_at is None or now - self.polled_at >= self.interval:
+                delta = self.fetch(self.buffer.watermark)
+                self.buffer.upsert(delta)
+                self.polled_at = now
+                self.polls += 1
+                self.fetched_rows += len(delta)
+            return self.buffer.frame()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'hours': len(self.buffer),
+                'watermark': self.buffer.watermark,
+                'polls': self.polls,
+                'fetched_rows': self.fetched_rows,
+                'age': None if self.polled_at is None else time.monotonic() - self.polled_at
+            }
+
+
+_pollers = {}
+_pollers_lock = threading.Lock()
+
+
+def get_poller(key: Hashable, fetch: Callable[[Optional[pd.Timestamp]], pd.DataFrame],
+               columns: List[str]) -> LivePoller:
+    # Un poller por propiedad y fuente, compartido por todas las sesiones
+    with _pollers_lock:
+        if key not in _pollers:
+            _pollers[key] = LivePoller(fetch, columns)
+        return _pollers[key]
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+from typing import Dict
+
+# |z| a partir del cual un cambio de clicks se considera significativo (~95%)
+SIGNIFICANCE_Z = 1.96
+
+
+def _scatter(codes: np.ndarray, values: pd.Series, size: int) -> np.ndarray:
+    return np.bincount(codes, weights=values.to_numpy(dtype=float), minlength=size)
+
+
+def _top(order_values: np.ndarray, candidates: np.ndarray, top_n: int) -> np.ndarray:
+    # argpartition evita ordenar todo el conjunto para quedarse con N filas
+    if len(candidates) > top_n:
+        part = np.argpartition(-order_values[candidates], top_n - 1)[:top_n]
+        candidates = candidates[part]
+    return candidates[np.argsort(-order_values[candidates], kind='stable')]
+
+
+def compute_movers(current: pd.DataFrame, previous: pd.DataFrame, key: str,
+                   top_n: int = 20, min_impressions: int = 0,
+                   current_complete: bool = True, previous_complete: bool = True) -> Dict[str, pd.DataFrame]:
+    # *_complete=False: el período se cortó por el límite de filas; una clave ausente
+    # puede no ser nueva (o perdida), solo quedó fuera del corte
+    # Clave categórica común a ambos períodos: el join es un scatter sobre sus códigos
+    codes, categories = pd.factorize(pd.concat([current[key], previous[key]], ignore_index=True))
+    size = len(categories)
+    current_codes = codes[:len(current)]
+    previous_codes = codes[len(current):]
+
+    clicks_cur = _scatter(current_codes, current['clicks'], size)
+    clicks_prev = _scatter(previous_codes, previous['clicks'], size)
+    impr_cur = _scatter(current_codes, current['impressions'], size)
+    impr_prev = _scatter(previous_codes, previous['impressions'], size)
+    wpos_cur = _scatter(current_codes, current['position'] * current['impressions'], size)
+    wpos_prev = _scatter(previous_codes, previous['position'] * previous['impressions'], size)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pos_cur = np.where(impr_cur > 0, wpos_cur / impr_cur, np.nan)
+        pos_prev = np.where(impr_prev > 0, wpos_prev / impr_prev, np.nan)
+        clicks_change_pct = np.where(
+            clicks_prev > 0,
+            (clicks_cur - clicks_prev) / clicks_prev * 100,
+            np.where(clicks_cur > 0, 100.0, 0.0)
+        )
+        # Test de Poisson para la diferencia de conteos
+        z_score = np.where(
+            clicks_cur + clicks_prev > 0,
+            (clicks_cur - clicks_prev) / np.sqrt(clicks_cur + clicks_prev),
+            0.0
+        )
+
+    clicks_change = clicks_cur - clicks_prev
+    # Positivo = mejora (la posición 1 es la mejor)
+    position_change = pos_prev - pos_cur
+
+    eligible = np.maximum(impr_cur, impr_prev) >= min_impressions
+    if not current_complete:
+        eligible &= np.bincount(current_codes, minlength=size) > 0
+    if not previous_complete:
+        eligible &= np.bincount(previous_codes, minlength=size) > 0
+    eligible = np.flatnonzero(eligible)
+    in_both = eligible[~np.isnan(position_change[eligible])]
+
+    def build(rows: np.ndarray) -> pd.DataFrame:
+        return pd.DataFrame({
+            key: categories[rows],
+            'clicks_current': clicks_cur[rows].astype(int),
+            'clicks_previous': clicks_prev[rows].astype(int),
+            'clicks_change': clicks_change[rows].astype(int),
+            'clicks_change_pct': clicks_change_pct[rows].round(2),
+            'impressions_current': impr_cur[rows].astype(int),
+            'impressions_previous': impr_prev[rows].astype(int),
+            'position_current': pos_cur[rows].round(1),
+            'position_previous': pos_prev[rows].round(1),
+            'position_change': position_change[rows].round(1),
+            'z_score': z_score[rows].round(2),
+            'significant': np.abs(z_score[rows]) >= SIGNIFICANCE_Z
+        }, index=pd.RangeIndex(1, len(rows) + 1, name='rank'))
+
+    gainers = eligible[clicks_change[eligible] > 0]
+    losers = eligible[clicks_change[eligible] < 0]
+    position_gainers = in_both[position_change[in_both] > 0]
+    position_losers = in_both[position_change[in_both] < 0]
+
+    return {
+        'gainers': build(_top(clicks_change, gainers, top_n)),
+        'losers': build(_top(-clicks_change, losers, top_n)),
+        'position_gainers': build(_top(position_change, position_gainers, top_n)),
+        'position_losers': build(_top(-position_change, position_losers, top_n))
+    }
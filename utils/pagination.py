@@ -0,0 +1,31 @@
+import pandas as pd
+from typing import Callable, Iterator, Optional
+
+from .errors import ConnectorError
+
+
+class PageStream:
+    # Páginas de una consulta paginada. Después de recorrerla indica si el resultado
+    # está completo: error guarda el ConnectorError que cortó la paginación y truncated
+    # indica que se llegó al límite de filas con la última página llena
+    def __init__(self, pages: Callable[['PageStream'], Iterator[pd.DataFrame]]):
+        self.error: Optional[ConnectorError] = None
+        self.truncated = False
+        self.rows = 0
+        self._pages = pages(self)
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        for page in self._pages:
+            self.rows += len(page)
+            yield page
+
+    @property
+    def complete(self) -> bool:
+        return self.error is None and not self.truncated
+
+
+def rechunk(df: pd.DataFrame, batch_size: int) -> Iterator[pd.DataFrame]:
+    # Las páginas se piden completas a la API (misma cuota); los lotes chicos son
+    # solo para el render progresivo
+    for start in range(0, len(df), batch_size):
+        yield df.iloc[start:start + batch_size]
@@ -0,0 +1,116 @@
+import itertools
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+from .urls import normalize_urls
+from .executor import get_backend
+
+ROOT = '/'
+
+
+def _prefixes(path: str) -> List[str]:
+    # '/blog/bpm' -> ['/', '/blog/', '/blog/bpm/']
+    segments = [s for s in path.split('/') if s]
+    return [ROOT] + ['/' + '/'.join(segments[:i + 1]) + '/' for i in range(len(segments))]
+
+
+def _parent(node: str) -> Optional[str]:
+    if node == ROOT:
+        return None
+    return node[:-1].rsplit('/', 1)[0] + '/'
+
+
+def rollup_sections(df: pd.DataFrame, path_column: str,
+                    additive: List[str],
+                    weighted: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    weighted = weighted or {}
+
+    prefixes = [_prefixes(p) for p in normalize_urls(df[path_column])]
+    lengths = np.fromiter(map(len, prefixes), dtype=np.int64, count=len(prefixes))
+    rows = np.repeat(np.arange(len(prefixes)), lengths)
+    nodes = np.empty(int(lengths.sum()), dtype=object)
+    nodes[:] = list(itertools.chain.from_iterable(prefixes))
+
+    # Cada fila suma en todos sus prefijos: una sola pasada con bincount
+    codes, sections = pd.factorize(nodes)
+    size = len(sections)
+    result = {'section': sections, 'pages': np.bincount(codes, minlength=size)}
+    for column in additive:
+        values = df[column].to_numpy(dtype=float)[rows]
+        result[column] = np.bincount(codes, weights=values, minlength=size)
+    for metric, weight in weighted.items():
+        values = (df[metric] * df[weight]).to_numpy(dtype=float)[rows]
+        result[f'_w_{metric}'] = np.bincount(codes, weights=values, minlength=size)
+    return pd.DataFrame(result)
+
+
+class PathRollupTree:
+    def __init__(self, sections: pd.DataFrame,
+                 additive: List[str],
+                 weighted: Optional[Dict[str, str]] = None):
+        # weighted: métrica -> columna de peso (ej. position ponderada por impressions)
+        self.additive = list(additive)
+        self.weighted = dict(weighted or {})
+
+        self.nodes = sections['section'].to_numpy(dtype=object)
+        self.pages = sections['pages'].to_numpy()
+        self.totals = {
+            column: sections[column].to_numpy(dtype=float)
+            for column in self.additive + [f'_w_{m}' for m in self.weighted]
+        }
+
+        self._node_ids = {node: i for i, node in enumerate(self.nodes)}
+        self._children = {}
+        for node in self.nodes:
+            parent = _parent(node)
+            if parent is not None:
+                self._children.setdefault(parent, []).append(self._node_ids[node])
+        self._top_cache = {}
+
+    @classmethod
+    def from_pages(cls, df: pd.DataFrame, path_column: str,
+                   additive: List[str],
+                   weighted: Optional[Dict[str, str]] = None) -> 'PathRollupTree':
+        # La agregación pesada corre en el pool de procesos; aquí solo se indexa
+        sections = get_backend().run(rollup_sections, df, path_column, additive, weighted)
+        return cls(sections, additive, weighted)
+
+    def __contains__(self, node: str) -> bool:
+        return node in self._node_ids
+
+    def _metrics(self, ids) -> Dict[str, np.ndarray]:
+        result = {column: self.totals[column][ids] for column in self.additive}
+        for metric, weight in self.weighted.items():
+            weights = self.totals[weight][ids]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                result[metric] = np.where(weights > 0, self.totals[f'_w_{metric}'][ids] / weights, 0)
+        return result
+
+    def subtree(self, node: str = ROOT) -> Dict[str, float]:
+        node_id = self._node_ids[node]
+        metrics = {k: float(v) for k, v in self._metrics(node_id).items()}
+        metrics['pages'] = int(self.pages[node_id])
+        return metrics
+
+    def children(self, node: str = ROOT) -> List[str]:
+        return [self.nodes[i] for i in self._children.get(node, [])]
+
+    def top_children(self, node: str = ROOT, n: int = 10, by: str = 'clicks') -> pd.DataFrame:
+        # Solo se recorren los hijos del nodo, nunca todo el árbol
+        key = (node, by)
+        if key not in self._top_cache:
+            ids = np.array(self._children.get(node, []), dtype=np.int64)
+            metrics = self._metrics(ids)
+            order = np.argsort(-metrics[by], kind='stable')
+            frame = pd.DataFrame({'section': self.nodes[ids], **metrics, 'pages': self.pages[ids]})
+            frame['has_children'] = [self.nodes[i] in self._children for i in ids]
+            self._top_cache[key] = frame.iloc[order].reset_index(drop=True)
+        return self._top_cache[key].head(n)
+
+    def breadcrumb(self, node: str) -> List[str]:
+        trail = []
+        while node is not None:
+            trail.append(node)
+            node = _parent(node)
+        return trail[::-1]
@@ -0,0 +1,51 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Hashable
+
+# Search Console admite 1200 consultas por minuto por propiedad
+GSC_QPS = float(os.getenv('DASHBOARD_GSC_QPS', 20))
+GSC_BURST = int(os.getenv('DASHBOARD_GSC_BURST', 10))
+
+
+class RateLimiter:
+    # Token bucket: hasta burst requests seguidos y luego rate por segundo
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+        self.requests = 0
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self.requests += 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+                self.waited += wait
+            # Se espera fuera del lock para no bloquear a quien ya tiene turno
+            time.sleep(wait)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'requests': self.requests, 'waited': self.waited}
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(key: Hashable, rate: float = GSC_QPS, burst: int = GSC_BURST) -> RateLimiter:
+    # La cuota es por propiedad: un limitador compartido por hilos y sesiones
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(rate, burst)
+        return _limiters[key]
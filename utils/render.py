@@ -0,0 +1,48 @@
+import json
+import streamlit as st
+from typing import Optional
+
+from .figures import FigureSpec
+
+try:
+    from streamlit.elements.lib.form_utils import current_form_id
+    from streamlit.elements.lib.layout_utils import LayoutConfig
+    from streamlit.elements.lib.utils import compute_and_register_element_id
+    from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+except ImportError:
+    PlotlyChartProto = None
+
+# Alto por defecto de plotly.js cuando la figura no fija uno
+DEFAULT_HEIGHT = 450
+
+
+def render_figure(figure: FigureSpec, container=None, key: Optional[str] = None):
+    # st.plotly_chart vuelve a armar y validar la figura y la serializa de nuevo;
+    # acá el JSON cacheado se envía directo en el mensaje del gráfico
+    dg = container if container is not None else st._main
+    
+    if PlotlyChartProto is None:
+        # API interna de Streamlit no disponible: camino público
+        return dg.plotly_chart(figure.figure(), use_container_width=True, key=key)
+    
+    proto = PlotlyChartProto()
+    proto.spec = figure.spec
+    proto.config = json.dumps({})
+    proto.theme = 'streamlit'
+    proto.form_id = current_form_id(dg)
+    proto.id = compute_and_register_element_id(
+        'plotly_chart',
+        user_key=key,
+        key_as_main_identity=False,
+        dg=dg,
+        plotly_spec=proto.spec,
+        plotly_config=proto.config,
+        selection_mode=('points', 'box', 'lasso'),
+        is_selection_activated=False,
+        theme='streamlit',
+        width='stretch',
+        height='content'
+    )
+    
+    layout_config = LayoutConfig(width='stretch', height=figure.height or DEFAULT_HEIGHT)
+    return dg._enqueue('plotly_chart', proto, layout_config=layout_config)
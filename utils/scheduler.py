@@ -0,0 +1,206 @@
+import functools
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+HIGH = 0
+# Trabajo de fondo que una vista espera (ej. cargas iniciales): pasa antes que la
+# precarga, pero como ella cede la cuota a las consultas de primer plano
+BACKGROUND = 5
+LOW = 10
+
+# Segundos sin consultas de primer plano antes de retomar el trabajo especulativo
+IDLE_SECONDS = float(os.getenv('DASHBOARD_PREFETCH_IDLE', 1.0))
+PREFETCH_WORKERS = int(os.getenv('DASHBOARD_PREFETCH_WORKERS', 1))
+
+_local = threading.local()
+
+
+class _Task:
+    __slots__ = ('fn', 'args', 'kwargs', 'priority', 'group', 'future', 'cancelled')
+
+    def __init__(self, fn: Callable, args, kwargs, priority: int, group: Optional[Hashable]):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.group = group
+        self.future = Future()
+        self.cancelled = False
+
+
+class QueryScheduler:
+    def __init__(self, workers: int = PREFETCH_WORKERS, idle_seconds: float = IDLE_SECONDS):
+        self.workers = workers
+        self.idle_seconds = idle_seconds
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._last_foreground = 0.0
+        self._pending = {}
+        # Grupo especulativo vigente por sesión: uno nuevo cancela el anterior
+        self._groups = {}
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    def _start(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, daemon=True, name=f"prefetch-{len(self._threads)}")
+                thread.start()
+                self._threads.append(thread)
+
+    def touch(self):
+        # Marca actividad de primer plano (una consulta de la pestaña visible)
+        with self._lock:
+            self._last_foreground = time.monotonic()
+
+    def wait_idle(self, task: _Task):
+        with self._idle:
+            while not task.cancelled:
+                remaining = self._last_foreground + self.idle_seconds - time.monotonic()
+                if remaining <= 0:
+                    return
+                self._idle.wait(remaining)
+        raise CancelledError()
+
+    def submit(self, fn: Callable, *args, priority: int = LOW,
+               group: Optional[Hashable] = None, **kwargs) -> Future:
+        task = _Task(fn, args, kwargs, priority, group)
+        with self._lock:
+            self._pending.setdefault(group, []).append(task)
+        self._queue.put((priority, next(self._sequence), task))
+        self._start()
+        return task.future
+
+    def prefetch(self, session: Hashable, selection: Hashable, tasks: Iterable[Callable]) -> List[Future]:
+        # Misma selección que en el rerun anterior: ya está encolada
+        group = (session, selection)
+        tasks = list(tasks)
+        with self._lock:
+            previous = self._groups.get(session)
+            if previous == group:
+                return []
+            # Sin tareas no hay nada que termine y libere la entrada de la sesión
+            if tasks:
+                self._groups[session] = group
+            else:
+                self._groups.pop(session, None)
+        if previous is not None:
+            self.cancel(previous)
+        return [self.submit(task, priority=LOW, group=group) for task in tasks]
+
+    def cancel(self, group: Hashable):
+        with self._idle:
+            tasks = self._pending.pop(group, [])
+            for task in tasks:
+                task.cancelled = True
+            self._idle.notify_all()
+        cancelled = sum(1 for task in tasks if task.future.cancel())
+        with self._lock:
+            self.cancelled += cancelled
+
+    def _work(self):
+        while True:
+            _, _, task = self._queue.get()
+            try:
+                if task.cancelled or not task.future.set_running_or_notify_cancel():
+                    continue
+                _local.task = task
+                try:
+                    if task.priority > HIGH:
+                        self.wait_idle(task)
+                    result = task.fn(*task.args, **task.kwargs)
+                except CancelledError:
+                    outcome = 'cancelled'
+                    task.future.set_exception(CancelledError())
+                except Exception as e:
+                    outcome = 'failed'
+                    task.future.set_exception(e)
+                else:
+                    outcome = 'completed'
+                    task.future.set_result(result)
+                finally:
+                    _local.task = None
+                    with self._lock:
+                        setattr(self, outcome, getattr(self, outcome) + 1)
+                        self._finish(task)
+            finally:
+                self._queue.task_done()
+
+    def _finish(self, task: _Task):
+        # Con el lock tomado. Un grupo sin tareas pendientes deja de ocupar memoria;
+        # la sesión que lo lanzó también se olvida (una sesión cerrada no vuelve)
+        group_tasks = self._pending.get(task.group)
+        if group_tasks and task in group_tasks:
+            group_tasks.remove(task)
+            if not group_tasks:
+                del self._pending[task.group]
+                if isinstance(task.group, tuple) and self._groups.get(task.group[0]) == task.group:
+                    del self._groups[task.group[0]]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'queued': sum(len(tasks) for tasks in self._pending.values()),
+                'completed': self.completed,
+                'cancelled': self.cancelled,
+                'failed': self.failed
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> QueryScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = QueryScheduler()
+        return _scheduler
+
+
+def checkpoint():
+    # Se llama antes de cada página de la API. En primer plano registra actividad;
+    # una tarea especulativa se corta si fue cancelada y espera mientras haya
+    # consultas de primer plano, así no compite por la cuota
+    task = getattr(_local, 'task', None)
+    scheduler = get_scheduler()
+    if task is None:
+        scheduler.touch()
+        return
+    if task.cancelled:
+        raise CancelledError()
+    if task.priority > HIGH:
+        scheduler.wait_idle(task)
+
+
+def speculative() -> bool:
+    # True en una tarea de precarga (o en un hilo auxiliar lanzado desde ella): no hay
+    # una sesión de Streamlit a la que mostrarle errores
+    task = getattr(_local, 'task', None)
+    return task is not None and task.priority > HIGH
+
+
+def propagate(fn: Callable) -> Callable:
+    # Para hilos auxiliares lanzados desde una tarea: heredan su prioridad y cancelación
+    task = getattr(_local, 'task', None)
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        previous = getattr(_local, 'task', None)
+        _local.task = task
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.task = previous
+
+    return run
@@ -0,0 +1,98 @@
+import itertools
+import re
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+SEARCH_MODES = ['substring', 'prefix', 'regex', 'tokens']
+
+
+def _ngrams(value: str, n: int) -> List[str]:
+    return list({value[i:i + n] for i in range(len(value) - n + 1)})
+
+
+def _build_postings(keys_per_row: List[List[str]]) -> Dict[str, np.ndarray]:
+    # Índice invertido: clave -> posiciones de fila ordenadas
+    lengths = np.fromiter(map(len, keys_per_row), dtype=np.int64, count=len(keys_per_row))
+    if lengths.sum() == 0:
+        return {}
+
+    rows = np.repeat(np.arange(len(keys_per_row), dtype=np.int32), lengths)
+    # Factorizar (hash) es mucho más rápido que ordenar strings
+    keys = np.empty(int(lengths.sum()), dtype=object)
+    keys[:] = list(itertools.chain.from_iterable(keys_per_row))
+    codes, unique_keys = pd.factorize(keys)
+
+    order = np.argsort(codes, kind='stable')
+    boundaries = np.cumsum(np.bincount(codes, minlength=len(unique_keys)))[:-1]
+    return dict(zip(unique_keys, np.split(rows[order], boundaries)))
+
+
+class KeywordSearchIndex:
+    def __init__(self, df: pd.DataFrame, column: str = 'query', complete: bool = True, ngram_size: int = 3):
+        self.frame = df.reset_index(drop=True)
+        self.column = column
+        # Si el dataset está truncado por el límite de filas, la búsqueda local no es confiable
+        self.complete = complete
+        self.ngram_size = ngram_size
+
+        self.values = self.frame[column].astype(str).str.lower().to_numpy(dtype=object)
+
+        # Orden lexicográfico para búsquedas por prefijo
+        self._sorted_rows = np.argsort(self.values, kind='stable')
+        self._sorted_values = self.values[self._sorted_rows]
+
+        self._ngrams = _build_postings([_ngrams(v, ngram_size) for v in self.values])
+        self._tokens = _build_postings([list(set(v.split())) for v in self.values])
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def _intersect(self, postings: Dict[str, np.ndarray], keys: List[str]) -> np.ndarray:
+        lists = []
+        for key in keys:
+            if key not in postings:
+                return np.array([], dtype=np.int32)
+            lists.append(postings[key])
+
+        # Se empieza por la lista más corta para reducir el trabajo
+        lists.sort(key=len)
+        result = lists[0]
+        for rows in lists[1:]:
+            result = np.intersect1d(result, rows, assume_unique=True)
+            if not len(result):
+                break
+        return result
+
+    def substring(self, term: str) -> np.ndarray:
+        term = term.lower()
+        if len(term) < self.ngram_size:
+            mask = pd.Series(self.values).str.contains(term, regex=False).to_numpy()
+            return np.flatnonzero(mask)
+
+        candidates = self._intersect(self._ngrams, _ngrams(term, self.ngram_size))
+        # Los n-gramas dan candidatos; se verifica la subcadena completa
+        return np.array([i for i in candidates if term in self.values[i]], dtype=np.int32)
+
+    def prefix(self, term: str) -> np.ndarray:
+        term = term.lower()
+        start = np.searchsorted(self._sorted_values, term, side='left')
+        end = np.searchsorted(self._sorted_values, term + '\uffff', side='left')
+        return np.sort(self._sorted_rows[start:end])
+
+    def regex(self, pattern: str) -> np.ndarray:
+        compiled = re.compile(pattern, re.IGNORECASE)
+        mask = pd.Series(self.values).str.contains(compiled, regex=True).to_numpy()
+        return np.flatnonzero(mask)
+
+    def tokens(self, text: str) -> np.ndarray:
+        words = list(set(text.lower().split()))
+        if not words:
+            return np.array([], dtype=np.int32)
+        return self._intersect(self._tokens, words)
+
+    def search(self, term: str, mode: str = 'substring') -> pd.DataFrame:
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Modo de búsqueda no soportado: {mode}")
+        rows = getattr(self, mode)(term)
+        return self.frame.iloc[rows]
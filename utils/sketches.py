@@ -0,0 +1,203 @@
+import math
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable
+
+# Ancho y filas del Count-Min: error ≤ e / ancho del total con probabilidad 1 - e^-filas
+CMS_WIDTH = 1024
+CMS_DEPTH = 4
+# Candidatos a heavy hitter que se conservan por día
+HEAVY_HITTERS = 1000
+# CTR y posición se omiten si el error posible de las impresiones supera esta
+# fracción de la estimación (colisiones de claves más grandes dominan el valor)
+MAX_RATE_ERROR = 0.25
+# Registros de HyperLogLog = 2^p; error estándar ≈ 1.04 / sqrt(2^p) (1.6% con p=12)
+HLL_PRECISION = 12
+
+# Constantes fijas (impares) del hashing multiplicativo: los sketches de días
+# distintos deben usar las mismas funciones para poder sumarse
+_SEEDS = np.array([
+    0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93,
+    0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53, 0x2545F4914F6CDD1D, 0x94D049BB133111EB
+], dtype=np.uint64)
+
+
+def hash_keys(keys) -> np.ndarray:
+    return pd.util.hash_array(np.asarray(keys, dtype=object))
+
+
+class CountMinSketch:
+    # Frecuencias aproximadas de cualquier clave; nunca subestima. Las tablas (métricas)
+    # comparten columnas: todas se leen de la misma fila para que sus cocientes sean coherentes
+    def __init__(self, width: int = CMS_WIDTH, depth: int = CMS_DEPTH, tables: int = 1):
+        if width & (width - 1):
+            raise ValueError("El ancho del Count-Min debe ser potencia de 2")
+        self.width = width
+        self.depth = depth
+        self.shift = np.uint64(64 - int(math.log2(width)))
+        self.counts = np.zeros((tables, depth, width), dtype=np.float64)
+
+    def _columns(self, hashes: np.ndarray) -> np.ndarray:
+        # Multiply-shift: una función de hash independiente por fila
+        with np.errstate(over='ignore'):
+            return ((hashes[None, :] * _SEEDS[:self.depth, None]) >> self.shift).astype(np.intp)
+
+    def update(self, hashes: np.ndarray, weights: np.ndarray):
+        # weights: (tablas, n) -- varias métricas comparten las mismas columnas
+        columns = self._columns(hashes)
+        for row in range(self.depth):
+            for table in range(self.counts.shape[0]):
+                np.add.at(self.counts[table, row], columns[row], weights[table])
+
+    def estimate(self, hashes: np.ndarray) -> np.ndarray:
+        # Por clave, la fila con menos colisiones según la primera tabla (desempate por la
+        # segunda); el resto de las tablas se lee de esa misma fila
+        columns = self._columns(hashes)
+        values = self.counts[:, np.arange(self.depth)[:, None], columns]
+        keys = (values[1], values[0]) if len(values) > 1 else (values[0],)
+        best = np.lexsort(keys, axis=0)[0]
+        return values[:, best, np.arange(len(hashes))]
+
+    def merge(self, other: 'CountMinSketch'):
+        self.counts += other.counts
+
+    def error_bound(self) -> np.ndarray:
+        # Sobreestimación máxima esperada por tabla (ε · total)
+        return math.e / self.width * self.counts[:, 0, :].sum(axis=1)
+
+
+class TopCandidates:
+    # Candidatos a heavy hitter: las claves de mayor peso, truncadas a capacity en cada
+    # actualización y fusión. No da cota de error: una clave que nunca entra al corte de
+    # un día puede faltar aunque sume mucho en el rango. Los valores salen del Count-Min
+    def __init__(self, capacity: int = HEAVY_HITTERS):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype='float64')
+
+    def update(self, keys, weights):
+        batch = pd.Series(np.asarray(weights, dtype='float64'), index=pd.Index(keys, dtype=object))
+        self._absorb(batch.groupby(level=0, sort=False).sum())
+
+    def merge(self, other: 'TopCandidates'):
+        self._absorb(other.counts)
+
+    def _absorb(self, counts: pd.Series):
+        merged = self.counts.add(counts, fill_value=0) if len(self.counts) else counts
+        if len(merged) > self.capacity:
+            merged = merged.nlargest(self.capacity, keep='first')
+        self.counts = merged
+
+    def candidates(self) -> pd.Index:
+        return self.counts.index
+
+
+class HyperLogLog:
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, hashes: np.ndarray):
+        p = np.uint64(self.precision)
+        index = (hashes >> (np.uint64(64) - p)).astype(np.intp)
+        rest = (hashes & ((np.uint64(1) << (np.uint64(64) - p)) - np.uint64(1))).astype(np.float64)
+        # Posición del primer bit en 1 de los 64 - p bits restantes (exacto: < 2^53)
+        _, bit_length = np.frexp(rest)
+        rank = (64 - self.precision - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: 'HyperLogLog'):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # Pocos elementos: conteo lineal sobre los registros vacíos
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class DimensionSketch:
+    # Sketch mergeable de una dimensión de GSC (query o page) para un conjunto de días:
+    # clicks, impresiones y posición ponderada en el Count-Min, candidatos por clicks
+    # y claves distintas en HyperLogLog
+    def __init__(self, dimension: str):
+        self.dimension = dimension
+        self.frequencies = CountMinSketch(tables=3)
+        self.heavy = TopCandidates()
+        self.distinct = HyperLogLog()
+        self.rows = 0
+        # Algún día llegó cortado por el tope de filas: faltan las claves de la cola
+        self.truncated = False
+
+    def update(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        keys = df[self.dimension].to_numpy(dtype=object)
+        hashes = hash_keys(keys)
+        impressions = df['impressions'].to_numpy(dtype='float64')
+        self.frequencies.update(hashes, np.vstack([
+            df['clicks'].to_numpy(dtype='float64'),
+            impressions,
+            df['position'].to_numpy(dtype='float64') * impressions
+        ]))
+        self.heavy.update(keys, df['clicks'].to_numpy(dtype='float64'))
+        self.distinct.update(hashes)
+        self.rows += len(df)
+
+    def merge(self, other: 'DimensionSketch'):
+        self.frequencies.merge(other.frequencies)
+        self.heavy.merge(other.heavy)
+        self.distinct.merge(other.distinct)
+        self.rows += other.rows
+        self.truncated = self.truncated or other.truncated
+
+    @classmethod
+    def combine(cls, dimension: str, sketches: Iterable['DimensionSketch']) -> 'DimensionSketch':
+        combined = cls(dimension)
+        counts = []
+        for sketch in sketches:
+            combined.frequencies.merge(sketch.frequencies)
+            combined.distinct.merge(sketch.distinct)
+            combined.rows += sketch.rows
+            combined.truncated = combined.truncated or sketch.truncated
+            counts.append(sketch.heavy.counts)
+        # Unión de candidatos en una sola agregación en lugar de fusionar de a pares
+        if counts:
+            combined.heavy._absorb(pd.concat(counts).groupby(level=0, sort=False).sum())
+        return combined
+
+    def top(self, k: int) -> pd.DataFrame:
+        candidates = self.heavy.candidates()
+        if not len(candidates):
+            return pd.DataFrame(columns=[self.dimension, 'clicks', 'impressions', 'ctr', 'position'])
+        # Los candidatos salen del resumen; los valores, del Count-Min del rango completo
+        clicks, impressions, weighted = self.frequencies.estimate(hash_keys(candidates))
+        df = pd.DataFrame({
+            self.dimension: candidates.to_numpy(dtype=object),
+            'clicks': np.rint(clicks).astype('int64'),
+            'impressions': np.rint(impressions).astype('int64')
+        })
+        safe = np.where(impressions > 0, impressions, np.nan)
+        df['ctr'] = np.nan_to_num(clicks / safe)
+        df['position'] = np.nan_to_num(weighted / safe)
+        # Donde el error de las impresiones pesa frente a la estimación, CTR y posición
+        # mezclan otras claves: se dejan sin valor
+        bounds = self.error_bounds()
+        unreliable = bounds['impressions'] > MAX_RATE_ERROR * impressions
+        df.loc[unreliable, ['ctr', 'position']] = np.nan
+        df = df.nlargest(k, 'clicks', keep='first').reset_index(drop=True)
+        df.attrs['error_bounds'] = bounds
+        df.attrs['truncated'] = self.truncated
+        return df
+
+    def count_distinct(self) -> int:
+        return self.distinct.count()
+
+    def error_bounds(self) -> Dict[str, int]:
+        # Sobreestimación máxima esperada de clicks e impresiones de cualquier clave
+        clicks, impressions, _ = self.frequencies.error_bound()
+        return {'clicks': int(math.ceil(clicks)), 'impressions': int(math.ceil(impressions))}
+
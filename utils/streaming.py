@@ -0,0 +1,80 @@
+import time
+import pandas as pd
+import streamlit as st
+from typing import Any, Callable, Hashable, Iterator, List, Optional
+
+from .cache import get_cache
+
+# Filas por lote en las descargas progresivas
+STREAM_BATCH_SIZE = 5000
+# Mínimo de segundos entre redibujos de la vista parcial
+REDRAW_INTERVAL = 0.5
+
+
+def cached_stream(key: Hashable, batches_fn: Callable[[], Iterator[pd.DataFrame]],
+                  client: Optional[Any] = None) -> Iterator[pd.DataFrame]:
+    # Con client la clave incluye su cache_namespace (propiedad y superficie de búsqueda),
+    # igual que los métodos @cached: cada superficie tiene sus propias entradas
+    if client is not None:
+        key = (client.cache_namespace, key)
+        cache = getattr(client, 'cache', None)
+        cache = cache if cache is not None else get_cache()
+    else:
+        cache = get_cache()
+    found, frame = cache.get(('stream', key))
+    if found:
+        yield frame
+        return
+
+    frames = []
+    batches = batches_fn()
+    for batch in batches:
+        frames.append(batch)
+        yield batch
+
+    # Solo se guarda si el stream terminó (no si el rerun lo interrumpió) y sin error
+    if getattr(batches, 'error', None) is not None:
+        return
+    cache.set(('stream', key), pd.concat(frames, ignore_index=True) if frames else pd.DataFrame())
+
+
+def _combine(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
+
+
+def render_stream(batches: Iterator[pd.DataFrame],
+                  on_update: Optional[Callable[[pd.DataFrame], None]] = None,
+                  expected_rows: Optional[int] = None,
+                  label: str = "Cargando datos") -> pd.DataFrame:
+    progress = st.progress(0.0, text=label)
+    frames = []
+    loaded = 0
+    # Frame acumulado del último redibujo: los lotes nuevos se le agregan a él, no a
+    # la lista completa, y los redibujos se espacian para no concatenar por lote
+    combined = None
+    last_draw = 0.0
+
+    for batch in batches:
+        frames.append(batch)
+        loaded += len(batch)
+
+        if on_update is not None and time.monotonic() - last_draw >= REDRAW_INTERVAL:
+            combined = _combine(frames)
+            frames = [combined]
+            on_update(combined)
+            last_draw = time.monotonic()
+
+        fraction = min(loaded / expected_rows, 1.0) if expected_rows else 0.0
+        progress.progress(fraction, text=f"{label}: {loaded:,} filas")
+
+    progress.empty()
+
+    result = _combine(frames)
+    # Último redibujo con todas las filas si quedaron lotes sin mostrar
+    if on_update is not None and frames and result is not combined:
+        on_update(result)
+    return result
@@ -0,0 +1,19 @@
+import os
+import streamlit as st
+from collections import ChainMap
+from typing import Any, Dict
+
+from .config import ConnectorConfig
+
+
+def streamlit_settings() -> Dict[str, Any]:
+    # st.secrets falla si no hay secrets.toml: en ese caso solo cuenta el entorno
+    try:
+        return {key: st.secrets[key] for key in st.secrets}
+    except Exception:
+        return {}
+
+
+def streamlit_config(**overrides) -> ConnectorConfig:
+    # Prioridad: parámetro > secrets > variables de entorno
+    return ConnectorConfig.from_mapping(ChainMap(streamlit_settings(), os.environ), **overrides)
@@ -0,0 +1,151 @@
+import math
+import threading
+import numpy as np
+import pandas as pd
+import streamlit as st
+from typing import Optional, List, Tuple
+
+from .cache import content_hash, dataset_token
+
+PAGE_SIZES = [25, 50, 100, 250]
+# Combinaciones de orden + búsqueda recordadas por tabla
+MAX_CACHED_QUERIES = 32
+# Máscaras de búsqueda recordadas por tabla
+MAX_CACHED_SEARCHES = 32
+
+
+class PaginatedTable:
+    def __init__(self, df: pd.DataFrame, columns: Optional[List[str]] = None, decimals: int = 2):
+        frame = df[list(columns)] if columns else df
+        # Se redondea una sola vez, no en cada rerun
+        self.frame = frame.round(decimals).reset_index(drop=True)
+        self.text_columns = [
+            c for c in self.frame.columns
+            if not pd.api.types.is_numeric_dtype(self.frame[c])
+        ]
+        self._orders = {}
+        self._masks = {}
+        self._queries = {}
+        # La tabla es un recurso compartido entre sesiones
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def sort_order(self, column: str, ascending: bool = True) -> np.ndarray:
+        # Orden estable en ambos sentidos con los NaN al final (invertir el ascendente
+        # los pondría primero y daría vuelta los empates)
+        key = (column, ascending)
+        with self._lock:
+            order = self._orders.get(key)
+        if order is None:
+            order = self.frame[column].sort_values(
+                ascending=ascending, kind='stable', na_position='last'
+            ).index.to_numpy()
+            with self._lock:
+                self._orders[key] = order
+        return order
+
+    def search_mask(self, search: str) -> np.ndarray:
+        search = search.strip().lower()
+        with self._lock:
+            mask = self._masks.get(search)
+        if mask is None:
+            mask = np.zeros(len(self.frame), dtype=bool)
+            for column in self.text_columns:
+                mask |= self.frame[column].astype(str).str.lower().str.contains(
+                    search, regex=False
+                ).to_numpy()
+            with self._lock:
+                _remember(self._masks, search, mask, MAX_CACHED_SEARCHES)
+        return mask
+
+    def positions(self, sort_by: Optional[str] = None, ascending: bool = True,
+                  search: str = '') -> np.ndarray:
+        key = (sort_by, ascending, search.strip().lower())
+        with self._lock:
+            cached = self._queries.get(key)
+        if cached is not None:
+            return cached
+
+        if sort_by:
+            order = self.sort_order(sort_by, ascending)
+        else:
+            order = np.arange(len(self.frame))
+
+        if key[2]:
+            order = order[self.search_mask(key[2])[order]]
+
+        with self._lock:
+            _remember(self._queries, key, order, MAX_CACHED_QUERIES)
+        return order
+
+    def page(self, page_number: int, page_size: int, sort_by: Optional[str] = None,
+             ascending: bool = True, search: str = '') -> Tuple[pd.DataFrame, int]:
+        positions = self.positions(sort_by, ascending, search)
+        start = max(page_number - 1, 0) * page_size
+        # Solo las filas de la página visible llegan al navegador
+        return self.frame.iloc[positions[start:start + page_size]], len(positions)
+
+
+def _remember(store: dict, key, value, limit: int):
+    # Descarta la entrada más antigua al llegar al límite
+    if key not in store and len(store) >= limit:
+        store.pop(next(iter(store)))
+    store[key] = value
+
+
+@st.cache_resource(max_entries=32)
+def _get_table(_df: pd.DataFrame, fingerprint: str, columns: Optional[Tuple[str, ...]]) -> PaginatedTable:
+    return PaginatedTable(_df, list(columns) if columns else None)
+
+
+def get_paginated_table(df: pd.DataFrame, columns: Optional[List[str]] = None) -> PaginatedTable:
+    frame = df[list(columns)] if columns else df
+    # Los resultados compartidos de los conectores ya traen su identidad: no se hashean.
+    # El resto se identifica por un hash sensible al orden (una tabla reordenada es otra)
+    token = dataset_token(df)
+    fingerprint = repr(token) if token is not None else content_hash(frame)
+    return _get_table(frame, fingerprint, tuple(columns) if columns else None)
+
+
+def render_paginated_table(df: pd.DataFrame, key: str,
+                           columns: Optional[List[str]] = None,
+                           sort_by: Optional[str] = None,
+                           ascending: bool = False,
+                           page_size: int = 50):
+    table = get_paginated_table(df, columns)
+    column_names = list(table.frame.columns)
+
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    with col1:
+        search = st.text_input("Filtrar", key=f"{key}_search", placeholder="Buscar en la tabla...")
+    with col2:
+        sort_column = st.selectbox(
+            "Ordenar por",
+            options=column_names,
+            index=column_names.index(sort_by) if sort_by in column_names else 0,
+            key=f"{key}_sort"
+        )
+    with col3:
+        descending = st.checkbox("Descendente", value=not ascending, key=f"{key}_desc")
+    with col4:
+        size = st.selectbox(
+            "Filas",
+            options=PAGE_SIZES,
+            index=PAGE_SIZES.index(page_size) if page_size in PAGE_SIZES else 1,
+            key=f"{key}_size"
+        )
+
+    total = len(table.positions(sort_column, not descending, search))
+    pages = max(math.ceil(total / size), 1)
+    # Si el filtro reduce el total, la página guardada puede quedar fuera de rango
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page_number = st.number_input("Página", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+
+    page_df, total = table.page(page_number, size, sort_column, not descending, search)
+    st.dataframe(page_df, use_container_width=True)
+
+    first = (page_number - 1) * size + 1 if total else 0
+    st.caption(f"Mostrando {first}-{min(page_number * size, total)} de {total:,} filas · Página {page_number} de {pages}")
@@ -0,0 +1,135 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from typing import List
+
+from .comparison import aggregate_gsc
+
+# URLs crudas recordadas (LRU): las variantes con query string o fragmento no tienen
+# límite, los paths normalizados sí (son las páginas del sitio)
+MAX_RAW_URLS = int(os.getenv('DASHBOARD_MAX_RAW_URLS', 200000))
+
+
+def normalize_urls(urls: pd.Series) -> pd.Series:
+    # Se quita esquema, host, query string, fragmento y barra final
+    paths = (
+        urls.astype(str)
+        .str.strip()
+        .str.replace(r'^[a-zA-Z][a-zA-Z0-9+.-]*://[^/?#]*', '', regex=True)
+        .str.replace(r'[?#].*$', '', regex=True)
+        .str.replace(r'/+$', '', regex=True)
+        .str.lstrip('/')
+    )
+    return '/' + paths
+
+
+class UrlIndex:
+    def __init__(self, max_raw_urls: int = MAX_RAW_URLS):
+        # URL cruda -> ID interno y path normalizado -> ID; se reutiliza entre renders.
+        # Una URL cruda desalojada solo se vuelve a normalizar: su path conserva el ID
+        self.max_raw_urls = max_raw_urls
+        self._raw_to_id = OrderedDict()
+        self._path_to_id = {}
+        self._paths = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def ids(self, urls: pd.Series) -> np.ndarray:
+        codes, uniques = pd.factorize(urls)
+
+        with self._lock:
+            # Solo se normalizan las URLs que no se vieron en renders anteriores
+            new_urls = [u for u in uniques if u not in self._raw_to_id]
+            if new_urls:
+                new_paths = normalize_urls(pd.Series(new_urls, dtype=object))
+                for raw, path in zip(new_urls, new_paths):
+                    url_id = self._path_to_id.get(path)
+                    if url_id is None:
+                        url_id = len(self._paths)
+                        self._path_to_id[path] = url_id
+                        self._paths.append(path)
+                    self._raw_to_id[raw] = url_id
+
+            unique_ids = np.fromiter((self._raw_to_id[u] for u in uniques), dtype=np.int64, count=len(uniques))
+            
+            for raw in uniques:
+                self._raw_to_id.move_to_end(raw)
+            while len(self._raw_to_id) > self.max_raw_urls:
+                self._raw_to_id.popitem(last=False)
+
+        ids = unique_ids[codes]
+        ids[codes < 0] = -1
+        return ids
+
+    def paths(self, ids: np.ndarray) -> np.ndarray:
+        paths = np.asarray(self._paths, dtype=object)
+        return paths[ids]
+
+    def mapping(self) -> pd.DataFrame:
+        with self._lock:
+            return pd.DataFrame({
+                'url': list(self._raw_to_id.keys()),
+                'url_id': list(self._raw_to_id.values())
+            })
+
+
+GSC_PAGE_METRICS = ['clicks', 'impressions', 'ctr', 'position']
+GA4_PAGE_METRICS = ['screenPageViews', 'totalUsers', 'averageSessionDuration', 'bounceRate']
+# Conteos de usuarios distintos: no se pueden sumar entre pagePaths de la misma URL
+DISTINCT_METRICS = ['totalUsers', 'activeUsers', 'newUsers']
+
+
+def _aggregate_ga4(df: pd.DataFrame, weighted: List[str], weight: str) -> pd.DataFrame:
+    # Las tasas y duraciones se ponderan por vistas de página
+    work = df.assign(**{f'_w_{m}': df[m] * df[weight] for m in weighted})
+    numeric = [c for c in df.columns if c not in weighted and c != 'url_id' and pd.api.types.is_numeric_dtype(df[c])]
+    additive = [c for c in numeric if c not in DISTINCT_METRICS]
+    # Un usuario que vio dos variantes de la URL se contaría dos veces: se toma el
+    # máximo, una cota inferior de los usuarios de la URL
+    distinct = [c for c in numeric if c in DISTINCT_METRICS]
+    grouped = work.groupby('url_id', sort=False)
+    grouped = pd.concat([
+        grouped[additive + [f'_w_{m}' for m in weighted]].sum(),
+        grouped[distinct].max()
+    ], axis=1).reset_index()
+    denominator = grouped[weight].replace(0, np.nan)
+    for metric in weighted:
+        grouped[metric] = (grouped.pop(f'_w_{metric}') / denominator).fillna(0)
+    return grouped
+
+
+def join_page_performance(gsc_pages: pd.DataFrame, ga4_pages: pd.DataFrame, index: UrlIndex,
+                          gsc_column: str = 'page', ga4_column: str = 'pagePath') -> pd.DataFrame:
+    frames = []
+    present = []
+
+    if not gsc_pages.empty:
+        gsc = gsc_pages[GSC_PAGE_METRICS].assign(url_id=index.ids(gsc_pages[gsc_column]))
+        frames.append(aggregate_gsc(gsc, ['url_id']))
+        present += GSC_PAGE_METRICS
+
+    if not ga4_pages.empty:
+        ga4 = ga4_pages.drop(columns=[ga4_column]).assign(url_id=index.ids(ga4_pages[ga4_column]))
+        weighted = [m for m in ['averageSessionDuration', 'bounceRate'] if m in ga4.columns]
+        frames.append(_aggregate_ga4(ga4, weighted, 'screenPageViews'))
+        present += [c for c in frames[-1].columns if c != 'url_id']
+
+    columns = ['page', 'url_id'] + GSC_PAGE_METRICS + GA4_PAGE_METRICS
+    if not frames:
+        return pd.DataFrame(columns=columns)
+
+    joined = frames[0]
+    for frame in frames[1:]:
+        # Merge vectorizado sobre el ID entero, no sobre strings
+        joined = joined.merge(frame, on='url_id', how='outer')
+
+    joined = joined[joined['url_id'] >= 0]
+    joined.insert(0, 'page', index.paths(joined['url_id'].to_numpy()))
+    # Siempre las mismas columnas: las de una fuente sin datos (error o sin filas) quedan
+    # en NaN; dentro de una fuente presente, una página ausente cuenta como 0
+    joined = joined.fillna({column: 0 for column in present})
+    return joined.reindex(columns=columns + [c for c in joined.columns if c not in columns]).reset_index(drop=True)
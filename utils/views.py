@@ -0,0 +1,38 @@
+import pandas as pd
+from typing import List, Optional, Tuple
+
+from .cache import derive
+
+# Vistas derivadas de los resultados compartidos de los conectores. Cada una se
+# calcula una vez por (dataset, transformación) y la reutilizan todas las sesiones.
+
+
+def _sorted(df: pd.DataFrame, column: str, ascending: bool) -> pd.DataFrame:
+    return df.sort_values(column, ascending=ascending)
+
+
+def _rounded(df: pd.DataFrame, columns: Optional[Tuple[str, ...]], decimals: int) -> pd.DataFrame:
+    frame = df[list(columns)] if columns else df
+    return frame.round(decimals)
+
+
+def _replaced(df: pd.DataFrame, column: str, pattern: str, regex: bool,
+              target: str, width: Optional[int]) -> pd.DataFrame:
+    values = df[column].str.replace(pattern, '', regex=regex)
+    if width is not None:
+        values = values.str[:width] + '...'
+    return df.assign(**{target: values})
+
+
+def sorted_view(df: pd.DataFrame, column: str, ascending: bool = False) -> pd.DataFrame:
+    return derive(df, _sorted, column, ascending)
+
+
+def rounded_view(df: pd.DataFrame, columns: Optional[List[str]] = None, decimals: int = 2) -> pd.DataFrame:
+    return derive(df, _rounded, tuple(columns) if columns else None, decimals)
+
+
+def stripped_view(df: pd.DataFrame, column: str, pattern: str, regex: bool = False,
+                  target: Optional[str] = None, width: Optional[int] = None) -> pd.DataFrame:
+    # Quita un prefijo (dominio de la propiedad) y opcionalmente trunca para etiquetas
+    return derive(df, _replaced, column, pattern, regex, target or column, width)